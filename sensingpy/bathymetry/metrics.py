@@ -1,61 +1,502 @@
 import numpy as np
 
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Mapping, Self, Tuple
+from functools import cached_property
 from dataclasses import dataclass
+from types import MappingProxyType
+from fractions import Fraction
+from sensingpy.sketch import ExactSum, QuantileSketch
 
 
-@dataclass
-class ValidationSummary():
-    """Class to estimate error and metrics from true and pred values"""
+DEFAULT_BOOTSTRAP_MEMORY : int = 256 * 2 ** 20
+_EMPTY_METRICS : Mapping[str, float] = MappingProxyType({ 'N' : 0, 'MSD' : np.nan, 'MAE' : np.nan, 'MedAE' : np.nan,
+                                                          'RMSE' : np.nan, 'RMedSE' : np.nan, 'Abs_std' : np.nan })
 
-    model : np.ndarray
-    in_situ : np.ndarray
 
+@dataclass
+class BootstrapSummary():
+    """Class to hold bootstrap replicates of a set of statistics"""
+
+    replicates : Dict[str, np.ndarray]
 
     @property
-    def error(self) -> np.ndarray:
-        """error = true - pred"""
-        return self.in_situ - self.model
+    def n(self) -> int:
+        """Number of replicates"""
+        return len(next(iter(self.replicates.values()))) if self.replicates else 0
+
+    def mean(self) -> Dict[str, float]:
+        """Mean of the replicates of each statistic"""
+        return { key : float(np.mean(values)) for key, values in self.replicates.items() }
+
+    def std(self) -> Dict[str, float]:
+        """Bootstrap standard error of each statistic"""
+        return { key : float(np.std(values, ddof = 1)) for key, values in self.replicates.items() }
+
+    def interval(self, confidence : float = 0.95) -> Dict[str, Tuple[float, float]]:
+        """Percentile confidence interval of each statistic
+
+        Args:
+            confidence (float, optional): confidence level of the interval. Defaults to 0.95.
+
+        Returns:
+            Dict[str, Tuple[float, float]]: lower and upper limits for each statistic
+        """
+
+        alpha = (1 - confidence) / 2
+        return { key : tuple(float(limit) for limit in np.quantile(values, [alpha, 1 - alpha]))
+                 for key, values in self.replicates.items() }
+
+    def __getitem__(self, key) -> np.ndarray:
+        return self.replicates[key]
+
+    def __str__(self) -> str:
+        return ' | '.join( f'{key}: [{vmin:.4f}, {vmax:.4f}]' for key, (vmin, vmax) in self.interval().items() )
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def _bootstrap_chunks(size : int, n : int, seed : int | np.random.SeedSequence | None, max_memory : int,
+                      bytes_per_value : int) -> List[Tuple[int, np.random.SeedSequence]]:
+    """Splits n bootstrap replicates of a sample of the given size in chunks that fit in max_memory.
+
+    Args:
+        size (int): number of values in the sample
+        n (int): total number of replicates
+        seed (int | np.random.SeedSequence | None): seed of the replicates
+        max_memory (int): maximum number of bytes used by one chunk
+        bytes_per_value (int): bytes allocated per resampled value
+
+    Returns:
+        List[Tuple[int, np.random.SeedSequence]]: number of replicates and seed of each chunk
+    """
+
+    per_chunk = int(max(1, min(n, max_memory // max(1, size * bytes_per_value))))
+    counts = [per_chunk] * (n // per_chunk) + ([n % per_chunk] if n % per_chunk else [])
+    seeds = seed.spawn(len(counts)) if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed).spawn(len(counts))
+    return list(zip(counts, seeds))
+
+def run_bootstrap(function : Callable, arrays : Tuple[np.ndarray, ...], n : int, seed : int | None = None,
+                  max_memory : int = DEFAULT_BOOTSTRAP_MEMORY, workers : int | None = None,
+                  bytes_per_value : int = 32, **kwargs) -> Dict[str, np.ndarray]:
+    """Runs a vectorized bootstrap in chunks of replicates.
+
+    Each chunk draws a (replicates, size) matrix of resample indexes with its own generator,
+    and ``function`` evaluates the statistics of all those replicates at once. Chunk seeds are
+    spawned from ``seed``, so results only depend on ``seed`` and ``max_memory``, not on ``workers``.
+
+    Args:
+        function (Callable): picklable function(arrays, indexes, **kwargs) -> Dict[str, np.ndarray]
+        arrays (Tuple[np.ndarray, ...]): 1D arrays with the same size to be resampled together
+        n (int): number of replicates
+        seed (int | None, optional): seed of the random generator. Defaults to None.
+        max_memory (int, optional): maximum bytes allocated per chunk. Defaults to 256 MiB.
+        workers (int | None, optional): number of processes, runs in the current process if None. Defaults to None.
+        bytes_per_value (int, optional): bytes allocated by function per resampled value. Defaults to 32.
+
+    Returns:
+        Dict[str, np.ndarray]: replicates of each statistic
+    """
+
+    size = len(arrays[0])
+    if size == 0:
+        raise ValueError('Cannot bootstrap an empty sample')
+
+    chunks = _bootstrap_chunks(size, n, seed, max_memory, bytes_per_value)
+
+    if workers is None or workers <= 1:
+        results = [ _bootstrap_chunk(function, arrays, count, chunk_seed, kwargs) for count, chunk_seed in chunks ]
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            futures = [ executor.submit(_bootstrap_chunk, function, arrays, count, chunk_seed, kwargs)
+                        for count, chunk_seed in chunks ]
+            results = [ future.result() for future in futures ]
+
+    return { key : np.concatenate([ result[key] for result in results ]) for key in results[0] }
+
+def _bootstrap_chunk(function : Callable, arrays : Tuple[np.ndarray, ...], count : int,
+                     seed : np.random.SeedSequence, kwargs : dict) -> Dict[str, np.ndarray]:
+    """Draws the resample indexes of one chunk and evaluates function over them"""
+
+    size = len(arrays[0])
+    indexes = np.random.default_rng(seed).integers(0, size, size = (count, size))
+    return function(arrays, indexes, **kwargs)
+
+def _bootstrap_metrics(arrays : Tuple[np.ndarray], indexes : np.ndarray, metrics : Iterable[str]) -> Dict[str, np.ndarray]:
+    """Computes error metrics for a matrix of resample indexes, one replicate per row"""
+
+    error = arrays[0][indexes]
+    result = {}
+
+    if 'MSD' in metrics:
+        result['MSD'] = -error.mean(axis = 1)
+    if 'RMSE' in metrics:
+        result['RMSE'] = np.sqrt(np.einsum('ij,ij->i', error, error) / error.shape[1])
+    if 'RMedSE' in metrics:
+        result['RMedSE'] = np.sqrt(np.median(error ** 2, axis = 1))
+
+    np.abs(error, out = error)
+    if 'MAE' in metrics:
+        result['MAE'] = error.mean(axis = 1)
+    if 'Abs_std' in metrics:
+        result['Abs_std'] = error.std(axis = 1)
+    if 'MedAE' in metrics:
+        result['MedAE'] = np.median(error, axis = 1, overwrite_input = True)
+
+    return { metric : result[metric] for metric in metrics }
+
+
+def _grouped_metrics(error : np.ndarray, codes : np.ndarray, groups : int, weights : np.ndarray | None = None) -> Dict[str, np.ndarray]:
+    """Computes the error metrics of every group with one sort and bincount based reductions.
+
+    Args:
+        error (np.ndarray): 1D errors, NaN errors are ignored
+        codes (np.ndarray): 1D group code of each error, codes outside [0, groups) are ignored
+        groups (int): number of groups
+        weights (np.ndarray | None, optional): 1D non negative weight of each error. Defaults to None.
+
+    Returns:
+        Dict[str, np.ndarray]: N, MSD, MAE, MedAE, RMSE, RMedSE and Abs_std of every group
+    """
+
+    is_valid = ~np.isnan(error) & (codes >= 0) & (codes < groups)
+    if weights is not None:
+        is_valid &= np.isfinite(weights) & (weights > 0)
+        weights = weights[is_valid].astype(np.float64)
+
+    error, codes = error[is_valid].astype(np.float64), codes[is_valid].astype(np.intp)
+    absolute = np.abs(error)
+
+    N = np.bincount(codes, minlength = groups)
+    W = N.astype(np.float64) if weights is None else np.bincount(codes, weights = weights, minlength = groups)
+    weighted = lambda values: np.bincount(codes, weights = values if weights is None else values * weights, minlength = groups)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = weighted(error) / W
+        mean_absolute = weighted(absolute) / W
+        mean_squared = weighted(error * error) / W
+
+    # One sort groups the errors and orders them by |error| inside each group
+    order = np.lexsort((absolute, codes))
+    absolute = absolute[order]
+    starts = np.cumsum(N) - N
+    medae, rmedse = np.full(groups, np.nan), np.full(groups, np.nan)
+    filled = N > 0
+
+    if weights is None:
+        lower = absolute[(starts + (N - 1) // 2)[filled]]
+        upper = absolute[(starts + N // 2)[filled]]
+        medae[filled] = (lower + upper) / 2
+        rmedse[filled] = np.sqrt((lower ** 2 + upper ** 2) / 2)
+    else:
+        cumulative = np.cumsum(weights[order])
+        before = np.concatenate([[0], cumulative])[starts]
+        position = np.searchsorted(cumulative, before + W / 2, side = 'left')
+        position = np.clip(position, starts, starts + N - 1)
+        medae[filled] = absolute[position[filled]]
+        rmedse[filled] = medae[filled]
+
+    return {
+        'N' : N,
+        'MSD' : -mean,
+        'MAE' : np.round(mean_absolute, 5),
+        'MedAE' : np.round(medae, 5),
+        'RMSE' : np.round(np.sqrt(mean_squared), 5),
+        'RMedSE' : np.round(rmedse, 5),
+        'Abs_std' : np.round(np.sqrt(np.maximum(mean_squared - mean_absolute ** 2, 0)), 5)
+    }
+
+
+class _Metrics(object):
+    """Accessors shared by the objects that expose their error metrics in a _metrics mapping"""
 
     @property
     def MSD(self) -> float:
         """Mean Sample Differences = pred - true"""
-        return np.nanmean(self.model - self.in_situ)
+        return self._metrics['MSD']
 
     @property
     def MAE(self) -> float:
         """Mean Absolute Error"""
-        return round(np.nanmean(np.abs(self.error)), 5)
+        return self._metrics['MAE']
 
     @property
     def MedAE(self) -> float:
         """Median Absolute Error"""
-        return round(np.nanmedian(np.abs(self.error)), 5)
+        return self._metrics['MedAE']
 
     @property
     def RMSE(self) -> float:
         """Root Mean Squared Error"""
-        return round(np.sqrt(np.nanmean(self.error ** 2)), 5)
+        return self._metrics['RMSE']
 
     @property
     def RMedSE(self) -> float:
         """Root Median Squared Error"""
-        return round(np.sqrt(np.nanmedian(self.error ** 2)), 5)
+        return self._metrics['RMedSE']
 
     @property
     def Abs_std(self) -> float:
         """Absolute std error"""
-        return round(np.nanstd(np.abs(self.error)), 5)
-    
+        return self._metrics['Abs_std']
+
     @property
-    def N(self) -> float:
-        """Number of errors"""
-        return len(self.error)
+    def N(self) -> int:
+        """Number of valid errors"""
+        return self._metrics['N']
+
+    def to_dict(self) -> Dict[str, float]:
+        """Returns every metric in a new dictionary"""
+        return dict(self._metrics)
 
     def __getitem__(self, key):
         return getattr(self, key)
 
     def __str__(self) -> str:
         return f"N: {self.N} | MSD: {self.MSD:.4f} | MedAE: {self.MedAE:.4f} | Abs_std: {self.Abs_std}"
-    
+
     def __repr__(self) -> str:
-        return str(self)
\ No newline at end of file
+        return str(self)
+
+
+@dataclass(frozen = True, repr = False)
+class ValidationSummary(_Metrics):
+    """Class to estimate error and metrics from true and pred values
+
+    Every metric is computed in a single pass over a NaN-filtered contiguous copy
+    of the errors the first time any of them is requested, and cached afterwards.
+    """
+
+    model : np.ndarray
+    in_situ : np.ndarray
+
+
+    @cached_property
+    def error(self) -> np.ndarray:
+        """error = true - pred"""
+        error = np.subtract(self.in_situ, self.model)
+        error.setflags(write = False)
+        return error
+
+    @cached_property
+    def _valid_error(self) -> np.ndarray:
+        """Contiguous float64 copy of the errors without NaNs"""
+        error = np.asarray(self.error, dtype = np.float64).ravel()
+        return np.ascontiguousarray(error[~np.isnan(error)])
+
+    @cached_property
+    def _metrics(self) -> Mapping[str, float]:
+        """Read-only mapping with every metric"""
+
+        error = self._valid_error
+        N = error.size
+
+        if N == 0:
+            return _EMPTY_METRICS
+
+        absolute = np.abs(error)
+        mean = error.sum() / N
+        mean_absolute = absolute.sum() / N
+        mean_squared = np.dot(error, error) / N
+
+        # |e| and e ** 2 share their order, so both medians come from the same partition
+        lower, upper = (N - 1) // 2, N // 2
+        absolute.partition([lower, upper])
+        lower, upper = absolute[lower], absolute[upper]
+
+        return MappingProxyType({
+            'N' : N,
+            'MSD' : float(-mean),
+            'MAE' : round(float(mean_absolute), 5),
+            'MedAE' : round(float((lower + upper) / 2), 5),
+            'RMSE' : round(float(np.sqrt(mean_squared)), 5),
+            'RMedSE' : round(float(np.sqrt((lower ** 2 + upper ** 2) / 2)), 5),
+            'Abs_std' : round(float(np.sqrt(max(mean_squared - mean_absolute ** 2, 0))), 5)
+        })
+
+    def by_bins(self, edges : Iterable[float], by : str = 'in_situ', weights : np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Metrics stratified by intervals of depth.
+
+        Args:
+            edges (Iterable[float]): increasing limits of the intervals
+
+                e.g. [0, 2, 5, 10] for [0, 2), [2, 5) and [5, 10)
+            by (str, optional): values to be binned, 'in_situ' or 'model'. Defaults to 'in_situ'.
+            weights (np.ndarray, optional): non negative weight of each point. Defaults to None.
+
+        Returns:
+            Dict[str, np.ndarray]: table with vmin and vmax of each interval plus N, MSD, MAE, MedAE,
+            RMSE, RMedSE and Abs_std. It can be passed directly to pandas.DataFrame.
+        """
+
+        edges = np.asarray(edges, dtype = np.float64)
+        if edges.ndim != 1 or len(edges) < 2 or np.any(np.diff(edges) <= 0):
+            raise ValueError('edges must be an increasing sequence with at least two values')
+
+        if by not in ('in_situ', 'model'):
+            raise ValueError(f"by must be 'in_situ' or 'model', got {by}")
+
+        values = np.asarray(self[by], dtype = np.float64).ravel()
+        codes = np.searchsorted(edges, values, side = 'right') - 1
+
+        table = { 'vmin' : edges[:-1], 'vmax' : edges[1:] }
+        table.update(self.__grouped(codes, len(edges) - 1, weights))
+        return table
+
+    def by_groups(self, labels : np.ndarray, weights : np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Metrics stratified by arbitrary labels, e.g. scene, bottom type or depth bin.
+
+        Args:
+            labels (np.ndarray): group label of each point, NaN labels are ignored
+            weights (np.ndarray, optional): non negative weight of each point. Defaults to None.
+
+        Returns:
+            Dict[str, np.ndarray]: table with the sorted unique labels as group plus N, MSD, MAE, MedAE,
+            RMSE, RMedSE and Abs_std. It can be passed directly to pandas.DataFrame.
+        """
+
+        labels = np.asarray(labels).ravel()
+        groups, codes = np.unique(labels, return_inverse = True)
+
+        if groups.dtype.kind == 'f' and len(groups) and np.isnan(groups[-1]):
+            groups = groups[:-1]
+
+        table = { 'group' : groups }
+        table.update(self.__grouped(codes, len(groups), weights))
+        return table
+
+    def __grouped(self, codes : np.ndarray, groups : int, weights : np.ndarray | None) -> Dict[str, np.ndarray]:
+        """Checks the inputs of by_bins and by_groups and computes the grouped metrics"""
+
+        error = np.asarray(self.error, dtype = np.float64).ravel()
+        if len(codes) != len(error):
+            raise ValueError('Group values must have the same size as model and in_situ')
+
+        if weights is not None:
+            weights = np.asarray(weights, dtype = np.float64).ravel()
+            if len(weights) != len(error):
+                raise ValueError('weights must have the same size as model and in_situ')
+            if np.any(weights < 0):
+                raise ValueError('weights must be non negative')
+
+        return _grouped_metrics(error, codes, groups, weights)
+
+    def bootstrap(self, metrics : Iterable[str] = ('MAE', 'RMSE', 'MedAE'), n : int = 1000, seed : int | None = None,
+                  max_memory : int = DEFAULT_BOOTSTRAP_MEMORY, workers : int | None = None) -> BootstrapSummary:
+        """Bootstrap replicates of the error metrics.
+
+        Resampled errors are drawn in chunks of replicates and every metric is computed
+        for the whole chunk at once. NaN pairs are dropped before resampling.
+
+        Args:
+            metrics (Iterable[str], optional): metrics among MSD, MAE, MedAE, RMSE, RMedSE and Abs_std. Defaults to ('MAE', 'RMSE', 'MedAE').
+            n (int, optional): number of replicates. Defaults to 1000.
+            seed (int | None, optional): seed of the random generator. Defaults to None.
+            max_memory (int, optional): maximum bytes allocated per chunk of replicates. Defaults to 256 MiB.
+            workers (int | None, optional): number of processes to spread the chunks over. Defaults to None.
+
+        Returns:
+            BootstrapSummary: replicates of each metric
+        """
+
+        metrics = tuple(metrics)
+        unknown = set(metrics) - {'MSD', 'MAE', 'MedAE', 'RMSE', 'RMedSE', 'Abs_std'}
+        if unknown:
+            raise ValueError(f'Unknown metrics: {sorted(unknown)}')
+
+        replicates = run_bootstrap(_bootstrap_metrics, (self._valid_error,), n, seed, max_memory, workers,
+                                   bytes_per_value = 24, metrics = metrics)
+        return BootstrapSummary(replicates)
+
+
+class ValidationAccumulator(_Metrics):
+    """Streaming and mergeable accumulator of error metrics.
+
+    Model and in situ pairs are added chunk by chunk, e.g. tile by tile or scene by scene,
+    so validations larger than memory can be summarized. Sums of errors, absolute errors
+    and squared errors are accumulated exactly, so N, MSD, MAE, RMSE and Abs_std do not
+    depend on the chunking or the merge order and match ValidationSummary up to rounding.
+    MedAE and RMedSE come from a QuantileSketch of the absolute errors, which is bounded
+    in size and estimates the median within relative_accuracy of the exact lower median
+    of |error|. RMedSE is reported as that same estimate, since the median of the squared
+    errors is the square of the median of the absolute errors.
+
+    Accumulators built by parallel workers with the same parameters can be merged, and the
+    accumulator exposes the same metrics, to_dict() and string format as ValidationSummary.
+    """
+
+    def __init__(self, relative_accuracy : float = 0.01, max_bins : int = 2048) -> None:
+        """Constructor with the parameters of the quantile sketch of the absolute errors
+
+        Args:
+            relative_accuracy (float, optional): relative error of MedAE and RMedSE. Defaults to 0.01.
+            max_bins (int, optional): maximum size of the quantile sketch. Defaults to 2048.
+        """
+
+        self.count : int = 0
+        self.sum : ExactSum = ExactSum()
+        self.sum_absolute : ExactSum = ExactSum()
+        self.sum_squares : ExactSum = ExactSum()
+        self.sketch : QuantileSketch = QuantileSketch(relative_accuracy, max_bins)
+
+    def update(self, model : np.ndarray, in_situ : np.ndarray) -> Self:
+        """Adds a chunk of model and in situ pairs, NaN pairs are ignored
+
+        Args:
+            model (np.ndarray): predicted values
+            in_situ (np.ndarray): true values
+
+        Returns:
+            Self: the accumulator for method chaining
+        """
+
+        error = np.subtract(in_situ, model, dtype = np.float64).ravel()
+        error = error[~np.isnan(error)]
+        absolute = np.abs(error)
+
+        self.count += len(error)
+        self.sum.update(error)
+        self.sum_absolute.update(absolute)
+        self.sum_squares.update(error * error)
+        self.sketch.update(absolute)
+        return self
+
+    def merge(self, other : 'ValidationAccumulator') -> Self:
+        """Adds the pairs accumulated by other, e.g. by another worker
+
+        Args:
+            other (ValidationAccumulator): accumulator with the same sketch parameters
+
+        Returns:
+            Self: the accumulator for method chaining
+        """
+
+        self.count += other.count
+        self.sum.merge(other.sum)
+        self.sum_absolute.merge(other.sum_absolute)
+        self.sum_squares.merge(other.sum_squares)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def _metrics(self) -> Mapping[str, float]:
+        """Read-only mapping with every metric of the pairs accumulated so far"""
+
+        N = self.count
+        if N == 0:
+            return _EMPTY_METRICS
+
+        mean_absolute = self.sum_absolute.exact() / N
+        mean_squared = self.sum_squares.exact() / N
+        median = self.sketch.quantile(0.5)
+
+        return MappingProxyType({
+            'N' : N,
+            'MSD' : float(-self.sum.exact() / N),
+            'MAE' : round(float(mean_absolute), 5),
+            'MedAE' : round(median, 5),
+            'RMSE' : round(float(np.sqrt(float(mean_squared))), 5),
+            'RMedSE' : round(median, 5),
+            'Abs_std' : round(float(np.sqrt(float(max(mean_squared - mean_absolute ** 2, Fraction(0))))), 5)
+        })
@@ -1,8 +1,8 @@
 import numpy as np
 import scipy
 
-from typing import Self
-from sensingpy.bathymetry.metrics import ValidationSummary
+from typing import Self, Dict, Tuple
+from sensingpy.bathymetry.metrics import ValidationSummary, BootstrapSummary, run_bootstrap, DEFAULT_BOOTSTRAP_MEMORY
 from sensingpy.selector import argcomposite
 
 
@@ -197,6 +197,46 @@ def optical_deep_water_model(model: np.ndarray, blue: np.ndarray, green: np.ndar
     return model
 
 
+def _bootstrap_regression(arrays : Tuple[np.ndarray, np.ndarray], indexes : np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Solve simple linear regressions for a matrix of resample indexes, one replicate per row.
+    
+    Parameters
+    ----------
+    arrays : Tuple[np.ndarray, np.ndarray]
+        Predictor and target values
+    indexes : np.ndarray
+        Resample indexes with shape (replicates, samples)
+        
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Slope, intercept and r_square of every replicate
+    """
+
+    X = arrays[0][indexes]
+    y = arrays[1][indexes]
+
+    X_mean = X.mean(axis = 1, keepdims = True)
+    y_mean = y.mean(axis = 1, keepdims = True)
+    X -= X_mean
+    y -= y_mean
+
+    Sxy = np.einsum('ij,ij->i', X, y)
+    Sxx = np.einsum('ij,ij->i', X, X)
+    Syy = np.einsum('ij,ij->i', y, y)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        slope = Sxy / Sxx
+        r_square = Sxy ** 2 / (Sxx * Syy)
+
+    return {
+        'slope' : slope,
+        'intercept' : y_mean[:, 0] - slope * X_mean[:, 0],
+        'r_square' : r_square
+    }
+
+
 class LinearModel(object):
     """
     Linear regression model for satellite-derived bathymetry.
@@ -316,6 +356,47 @@ class LinearModel(object):
         """
 
         return ValidationSummary(self.predict(pseudomodel), in_situ)
+
+    def bootstrap(self, pseudomodel : np.ndarray, in_situ : np.ndarray, n : int = 1000, seed : int = None,
+                  max_memory : int = DEFAULT_BOOTSTRAP_MEMORY, workers : int = None) -> BootstrapSummary:
+        """
+        Bootstrap replicates of the calibration coefficients.
+        
+        Parameters
+        ----------
+        pseudomodel : np.ndarray
+            Predictor values (typically from ratio transform algorithms)
+        in_situ : np.ndarray
+            Target values (measured water depths)
+        n : int, optional
+            Number of replicates, by default 1000
+        seed : int, optional
+            Seed of the random generator, by default None
+        max_memory : int, optional
+            Maximum bytes allocated per chunk of replicates, by default 256 MiB
+        workers : int, optional
+            Number of processes to spread the chunks over, by default None
+            which runs every chunk in the current process
+            
+        Returns
+        -------
+        BootstrapSummary
+            Replicates of slope, intercept and r_square
+            
+        Notes
+        -----
+        Resample indexes are drawn as a (replicates, samples) matrix per chunk and
+        the least squares coefficients of every replicate are solved at once in
+        closed form. Pairs with NaN values are dropped before resampling.
+        """
+
+        X = np.asarray(pseudomodel, dtype = np.float64).ravel()
+        y = np.asarray(in_situ, dtype = np.float64).ravel()
+        is_valid = ~np.isnan(X) & ~np.isnan(y)
+
+        arrays = (np.ascontiguousarray(X[is_valid]), np.ascontiguousarray(y[is_valid]))
+        replicates = run_bootstrap(_bootstrap_regression, arrays, n, seed, max_memory, workers, bytes_per_value = 40)
+        return BootstrapSummary(replicates)
     
     def __str__(self) -> str:
         """
@@ -0,0 +1,318 @@
+import os
+import threading
+import numpy as np
+import rasterio
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Tuple
+
+
+DEFAULT_MAX_BYTES = 256 * 2**20
+DEFAULT_MAX_HANDLES = 64
+
+
+class BlockCache:
+    """
+    Thread-safe least recently used cache of decoded blocks bounded in bytes.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Largest total size of the cached blocks, by default 256 MiB
+
+    Attributes
+    ----------
+    nbytes : int
+        Total size of the cached blocks
+    hits : int
+        Number of blocks found in the cache
+    misses : int
+        Number of blocks loaded
+
+    Notes
+    -----
+    Cached blocks are read-only, so callers copy them into their own arrays
+    before modifying them. Pickled caches, such as those sent to worker
+    processes, arrive empty.
+    """
+
+    def __init__(self, max_bytes : int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__blocks : OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key : Hashable, load : Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Get a block from the cache, loading it on a miss.
+
+        Parameters
+        ----------
+        key : Hashable
+            Block identifier
+        load : Callable[[], np.ndarray]
+            Function that reads the block when it is not cached
+
+        Returns
+        -------
+        np.ndarray
+            Read-only block
+        """
+
+        with self.__lock:
+            if key in self.__blocks:
+                self.hits += 1
+                self.__blocks.move_to_end(key)
+                return self.__blocks[key]
+            self.misses += 1
+
+        block = load()
+        block.flags.writeable = False
+
+        with self.__lock:
+            if key not in self.__blocks and block.nbytes <= self.max_bytes:
+                self.__blocks[key] = block
+                self.nbytes += block.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, evicted = self.__blocks.popitem(last = False)
+                    self.nbytes -= evicted.nbytes
+        return block
+
+    def clear(self) -> None:
+        """
+        Remove every block from the cache.
+        """
+
+        with self.__lock:
+            self.__blocks.clear()
+            self.nbytes = 0
+
+    def __getstate__(self) -> dict:
+        return { 'max_bytes': self.max_bytes }
+
+    def __setstate__(self, state : dict) -> None:
+        self.__init__(state['max_bytes'])
+
+    def __contains__(self, key : Hashable) -> bool:
+        return key in self.__blocks
+
+    def __len__(self) -> int:
+        return len(self.__blocks)
+
+    def __str__(self) -> str:
+        return f'BlockCache | Blocks: {len(self)} | Bytes: {self.nbytes} / {self.max_bytes} | Hits: {self.hits} | Misses: {self.misses}'
+
+
+class DatasetPool:
+    """
+    Thread-safe least recently used pool of open dataset handles.
+
+    Handles are keyed by path, opener and the modification time and size of the
+    file, so files that are rewritten are opened again. A handle is used by one
+    caller at a time and returned to the pool afterwards, so threads never share
+    a handle and the headers of a file are parsed once.
+
+    Parameters
+    ----------
+    max_handles : int, optional
+        Largest number of idle handles kept open, by default 64. The least
+        recently used ones are closed first
+
+    Attributes
+    ----------
+    hits : int
+        Number of handles reused from the pool
+    misses : int
+        Number of handles opened
+
+    Notes
+    -----
+    Pools are emptied in forked child processes, which open their own handles,
+    and pickled pools arrive empty. Idle handles keep their files open, so the
+    writers of Image discard the handles of the files they overwrite. Call
+    discard or clear before deleting or replacing pooled files otherwise.
+    """
+
+    def __init__(self, max_handles : int = DEFAULT_MAX_HANDLES) -> None:
+        self.max_handles = max_handles
+        self.hits = 0
+        self.misses = 0
+        self.__idle : OrderedDict[Tuple, List[Any]] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__pid = os.getpid()
+
+    @contextmanager
+    def open(self, path : str, opener : Callable[[str], Any] = rasterio.open) -> Iterator[Any]:
+        """
+        Borrow an open handle of a file, opening it on a miss.
+
+        Parameters
+        ----------
+        path : str
+            Path or URL of the file
+        opener : Callable[[str], Any], optional
+            Function that opens the file, by default rasterio.open. Handles
+            must have a close method
+
+        Yields
+        ------
+        Any
+            Open handle, returned to the pool when the block exits
+        """
+
+        key = (opener, _normalize(path), signature(path))
+        src = None
+
+        with self.__lock:
+            self.__check_process()
+            for stale in [ other for other in self.__idle if other[:2] == key[:2] and other != key ]:
+                self.__close(self.__idle.pop(stale))
+
+            handles = self.__idle.get(key)
+            if handles:
+                src = handles.pop()
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if src is None:
+            src = opener(path)
+
+        try:
+            yield src
+        finally:
+            with self.__lock:
+                self.__idle.setdefault(key, []).append(src)
+                self.__idle.move_to_end(key)
+                while len(self) > self.max_handles:
+                    oldest = next(iter(self.__idle))
+                    self.__close([ self.__idle[oldest].pop(0) ])
+                    if not self.__idle[oldest]:
+                        del self.__idle[oldest]
+
+    def discard(self, path : str) -> None:
+        """
+        Close the idle handles of a file, such as before it is overwritten.
+
+        Parameters
+        ----------
+        path : str
+            Path or URL of the file
+        """
+
+        path = _normalize(path)
+        with self.__lock:
+            for key in [ key for key in self.__idle if key[1] == path ]:
+                self.__close(self.__idle.pop(key))
+
+    def clear(self) -> None:
+        """
+        Close every idle handle.
+        """
+
+        with self.__lock:
+            for handles in self.__idle.values():
+                self.__close(handles)
+            self.__idle.clear()
+
+    def __check_process(self) -> None:
+        if os.getpid() != self.__pid:
+            self.__idle = OrderedDict()
+            self.__pid = os.getpid()
+
+    @staticmethod
+    def __close(handles : List[Any]) -> None:
+        for src in handles:
+            src.close()
+
+    def __getstate__(self) -> dict:
+        return { 'max_handles': self.max_handles }
+
+    def __setstate__(self, state : dict) -> None:
+        self.__init__(state['max_handles'])
+
+    def __len__(self) -> int:
+        return sum(len(handles) for handles in self.__idle.values())
+
+    def __str__(self) -> str:
+        return f'DatasetPool | Handles: {len(self)} / {self.max_handles} | Hits: {self.hits} | Misses: {self.misses}'
+
+
+def signature(path : str) -> Tuple[int, int] | None:
+    """
+    Get the modification time and size of a file.
+
+    Parameters
+    ----------
+    path : str
+        Path or URL of the file
+
+    Returns
+    -------
+    Tuple[int, int] or None
+        Modification time in nanoseconds and size in bytes, or None for URLs
+        and other paths that are not local files
+    """
+
+    try:
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _normalize(path : str) -> str:
+    return os.path.abspath(path) if os.path.exists(path) else path
+
+
+DATASET_POOL = DatasetPool()
+BLOCK_CACHE = BlockCache()
+
+
+def configure(max_handles : int = None, max_bytes : int = None) -> None:
+    """
+    Resize the process-wide dataset pool and block cache.
+
+    Parameters
+    ----------
+    max_handles : int, optional
+        Largest number of idle handles kept open, by default None which keeps
+        the current limit
+    max_bytes : int, optional
+        Largest total size of the cached blocks, by default None which keeps
+        the current budget
+
+    Notes
+    -----
+    Smaller limits are enforced when the next handle or block is added.
+    """
+
+    if max_handles is not None:
+        DATASET_POOL.max_handles = max_handles
+    if max_bytes is not None:
+        BLOCK_CACHE.max_bytes = max_bytes
+
+
+def stats() -> Dict[str, int]:
+    """
+    Get the counters of the process-wide dataset pool and block cache.
+
+    Returns
+    -------
+    Dict[str, int]
+        Open idle handles, handle hits and misses, cached blocks and bytes, and
+        block hits and misses
+    """
+
+    return {
+        'handles': len(DATASET_POOL),
+        'handle_hits': DATASET_POOL.hits,
+        'handle_misses': DATASET_POOL.misses,
+        'blocks': len(BLOCK_CACHE),
+        'block_bytes': BLOCK_CACHE.nbytes,
+        'block_hits': BLOCK_CACHE.hits,
+        'block_misses': BLOCK_CACHE.misses,
+    }
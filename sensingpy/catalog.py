@@ -0,0 +1,504 @@
+import os
+import re
+import json
+import sqlite3
+import warnings
+import numpy as np
+import pyproj
+import rasterio
+import rasterio.transform
+import shapely
+import sensingpy.enums as enums
+import sensingpy.reader as reader
+
+from affine import Affine
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from shapely.geometry import Polygon, box
+from shapely.geometry.base import BaseGeometry
+from typing import Dict, Iterable, List, Self, Tuple
+from sensingpy.mosaic import source_band_names
+
+
+ACQUISITION_KEYS = ('ACQUISITION_DATE', 'DATE_ACQUIRED', 'SENSING_TIME', 'PRODUCT_START_TIME', 'time_coverage_start',
+                    'acquisition_time', 'time')
+
+_FILENAME_DATE = re.compile(r'(?<!\d)(\d{8})(?:T?(\d{6}))?(?!\d)')
+_WGS84 = pyproj.CRS.from_epsg(4326)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scenes (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    crs TEXT NOT NULL,
+    transform TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    dtype TEXT NOT NULL,
+    bands TEXT NOT NULL,
+    acquired REAL,
+    footprint BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenes_acquired ON scenes (acquired);
+CREATE TABLE IF NOT EXISTS bands (name TEXT NOT NULL, scene INTEGER NOT NULL, PRIMARY KEY (name, scene)) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS footprints USING rtree(id, min_lon, max_lon, min_lat, max_lat);
+'''
+
+
+@dataclass(frozen = True)
+class Scene:
+    """
+    Header information of an image file.
+
+    Parameters
+    ----------
+    path : str
+        Absolute path of the file
+    crs : pyproj.CRS
+        Coordinate reference system of the image
+    transform : Affine
+        Affine transform of the image
+    width : int
+        Width of the image in pixels
+    height : int
+        Height of the image in pixels
+    dtype : str
+        Data type that holds every band
+    bands : Tuple[str, ...]
+        Band names as reader.open names them
+    acquired : datetime or None
+        Acquisition time in UTC, if found in the metadata or the file name
+    footprint : Polygon
+        Footprint in longitude and latitude
+    """
+
+    path : str
+    crs : pyproj.CRS
+    transform : Affine
+    width : int
+    height : int
+    dtype : str
+    bands : Tuple[str, ...]
+    acquired : datetime | None
+    footprint : Polygon
+
+
+class Catalog:
+    """
+    SQLite catalog of image files with a spatial and temporal index.
+
+    Footprints are indexed in an R-tree in longitude and latitude, and
+    acquisition times and band names in B-tree indices, so searches over tens of
+    thousands of scenes only read the matching rows.
+
+    Parameters
+    ----------
+    database : str
+        SQLite database file, created if it does not exist. ':memory:' keeps the
+        catalog in memory
+
+    Attributes
+    ----------
+    failed : Dict[str, Exception]
+        Files that could not be indexed by the last add or scan, with their errors
+
+    Examples
+    --------
+    >>> with Catalog('scenes.sqlite') as catalog:
+    ...     catalog.scan('/data/sentinel2')
+    ...     paths = catalog.search(aoi, time_range = ('2024-06-01', '2024-09-01'), bands = ['Rrs_B3'])
+    >>> images = [ reader.open(path) for path in paths ]
+    """
+
+    def __init__(self, database : str) -> None:
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.executescript(_SCHEMA)
+        self.failed : Dict[str, Exception] = {}
+
+    def add(self, paths : Iterable[str], workers : int = None) -> int:
+        """
+        Index image files, reading their headers in parallel.
+
+        Files already indexed with the same modification time and size are skipped,
+        and changed files are indexed again. Files that cannot be read, such as
+        corrupt, half-written or removed files, are skipped with a warning and kept
+        in failed with their errors.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Image files readable by reader.open
+        workers : int, optional
+            Threads reading headers, by default None which uses the default of
+            ThreadPoolExecutor
+
+        Returns
+        -------
+        int
+            Number of files indexed
+        """
+
+        known = { path : (mtime, size) for path, mtime, size in self.connection.execute('SELECT path, mtime, size FROM scenes') }
+        changed, self.failed = [], {}
+        for path in map(os.path.abspath, paths):
+            try:
+                stat = os.stat(path)
+            except OSError as error:
+                self.failed[path] = error
+                continue
+            if known.get(path) != (stat.st_mtime, stat.st_size):
+                changed.append((path, stat.st_mtime, stat.st_size))
+
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            scenes = list(executor.map(_try_read_header, (path for path, _, _ in changed)))
+
+        indexed = 0
+        with self.connection:
+            for (path, mtime, size), scene in zip(changed, scenes):
+                if isinstance(scene, Exception):
+                    self.failed[path] = scene
+                    continue
+                self.__delete(path)
+                self.__insert(scene, mtime, size)
+                indexed += 1
+
+        if self.failed:
+            warnings.warn(f'{len(self.failed)} files could not be indexed, see Catalog.failed: {", ".join(list(self.failed)[:3])}'
+                          + (', ...' if len(self.failed) > 3 else ''))
+
+        return indexed
+
+    def scan(self, folder : str, workers : int = None) -> int:
+        """
+        Index every readable image file under a folder.
+
+        Files of the catalog under the folder that no longer exist are removed.
+
+        Parameters
+        ----------
+        folder : str
+            Folder searched recursively for files with the extensions of
+            enums.FILE_EXTENTIONS
+        workers : int, optional
+            Threads reading headers, by default None
+
+        Returns
+        -------
+        int
+            Number of files indexed
+        """
+
+        extensions = { f'.{extension}' for file_type in enums.FILE_EXTENTIONS for extension in file_type.value }
+        paths = []
+        for root, folders, files in os.walk(folder):
+            paths.extend(os.path.join(root, name) for name in folders if Path(name).suffix.lower() in extensions)
+            folders[:] = [ name for name in folders if Path(name).suffix.lower() not in extensions ]
+            paths.extend(os.path.join(root, name) for name in files if Path(name).suffix.lower() in extensions)
+
+        folder, found = os.path.abspath(folder), set(map(os.path.abspath, paths))
+        self.remove(path for (path,) in self.connection.execute('SELECT path FROM scenes').fetchall()
+                    if path not in found and os.path.commonpath([ folder, path ]) == folder)
+
+        return self.add(sorted(paths), workers)
+
+    def remove(self, paths : Iterable[str]) -> None:
+        """
+        Remove files from the catalog.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Indexed files
+        """
+
+        with self.connection:
+            for path in map(os.path.abspath, paths):
+                self.__delete(path)
+
+    def search(self, geometry : BaseGeometry = None, time_range : Tuple[datetime | str | None, datetime | str | None] = None,
+               bands : Iterable[str] = None, crs : pyproj.CRS = _WGS84) -> List[str]:
+        """
+        Find the files that match every given condition.
+
+        Parameters
+        ----------
+        geometry : BaseGeometry, optional
+            Geometry the footprints must intersect, by default None
+        time_range : Tuple[datetime | str | None, datetime | str | None], optional
+            Inclusive (start, end) acquisition times, either of them None for an
+            open range, by default None. Times without time zone are in UTC and
+            files without acquisition time never match
+        bands : Iterable[str], optional
+            Bands the files must have, by default None
+        crs : pyproj.CRS, optional
+            CRS of the geometry, by default EPSG:4326
+
+        Returns
+        -------
+        List[str]
+            Paths ordered by acquisition time, files without it last, ready for
+            reader.open or mosaic
+        """
+
+        query = 'SELECT scenes.path, scenes.footprint FROM scenes'
+        conditions, parameters = [], []
+
+        if geometry is not None:
+            geometry = _to_wgs84(geometry, pyproj.CRS(crs))
+            min_lon, min_lat, max_lon, max_lat = geometry.bounds
+            query += ' JOIN footprints ON footprints.id = scenes.id'
+            conditions.append('footprints.min_lon <= ? AND footprints.max_lon >= ? AND footprints.min_lat <= ? AND footprints.max_lat >= ?')
+            parameters.extend([ max_lon, min_lon, max_lat, min_lat ])
+
+        if time_range is not None:
+            for operator, value in zip(('>=', '<='), time_range):
+                if value is not None:
+                    conditions.append(f'scenes.acquired {operator} ?')
+                    parameters.append(_timestamp(value))
+
+        if bands is not None:
+            bands = list(dict.fromkeys(bands))
+            conditions.append(f'scenes.id IN (SELECT scene FROM bands WHERE name IN ({", ".join("?" * len(bands))}) '
+                              'GROUP BY scene HAVING COUNT(*) = ?)')
+            parameters.extend([ *bands, len(bands) ])
+
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        rows = self.connection.execute(query + ' ORDER BY scenes.acquired IS NULL, scenes.acquired, scenes.path', parameters).fetchall()
+
+        if geometry is None:
+            return [ path for path, _ in rows ]
+
+        shapely.prepare(geometry)
+        return [ path for path, footprint in rows if geometry.intersects(shapely.from_wkb(footprint)) ]
+
+    def scene(self, path : str) -> Scene:
+        """
+        Get the header information of an indexed file.
+
+        Parameters
+        ----------
+        path : str
+            Indexed file
+
+        Returns
+        -------
+        Scene
+            Header information
+
+        Raises
+        ------
+        ValueError
+            If the file is not in the catalog
+        """
+
+        row = self.connection.execute('SELECT path, crs, transform, width, height, dtype, bands, acquired, footprint '
+                                      'FROM scenes WHERE path = ?', (os.path.abspath(path),)).fetchone()
+        if row is None:
+            raise ValueError(f'{path} is not in the catalog')
+
+        path, crs, transform, width, height, dtype, bands, acquired, footprint = row
+        return Scene(path, pyproj.CRS.from_wkt(crs), Affine(*json.loads(transform)), width, height, dtype,
+                     tuple(json.loads(bands)), None if acquired is None else datetime.fromtimestamp(acquired, timezone.utc),
+                     shapely.from_wkb(footprint))
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+
+        self.connection.close()
+
+    def __delete(self, path : str) -> None:
+        """
+        Delete a file from every table.
+
+        Parameters
+        ----------
+        path : str
+            Absolute path of the file
+        """
+
+        for (scene,) in self.connection.execute('SELECT id FROM scenes WHERE path = ?', (path,)).fetchall():
+            self.connection.execute('DELETE FROM footprints WHERE id = ?', (scene,))
+            self.connection.execute('DELETE FROM bands WHERE scene = ?', (scene,))
+            self.connection.execute('DELETE FROM scenes WHERE id = ?', (scene,))
+
+    def __insert(self, scene : Scene, mtime : float, size : int) -> None:
+        """
+        Insert a scene in every table.
+
+        Parameters
+        ----------
+        scene : Scene
+            Header information
+        mtime : float
+            Modification time of the file
+        size : int
+            Size of the file in bytes
+        """
+
+        cursor = self.connection.execute(
+            'INSERT INTO scenes (path, mtime, size, crs, transform, width, height, dtype, bands, acquired, footprint) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (scene.path, mtime, size, scene.crs.to_wkt(), json.dumps(list(scene.transform)[:6]), scene.width, scene.height,
+             scene.dtype, json.dumps(list(scene.bands)), None if scene.acquired is None else scene.acquired.timestamp(),
+             shapely.to_wkb(scene.footprint)))
+
+        min_lon, min_lat, max_lon, max_lat = scene.footprint.bounds
+        self.connection.execute('INSERT INTO footprints VALUES (?, ?, ?, ?, ?)', (cursor.lastrowid, min_lon, max_lon, min_lat, max_lat))
+        self.connection.executemany('INSERT OR IGNORE INTO bands VALUES (?, ?)', ((band, cursor.lastrowid) for band in scene.bands))
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM scenes').fetchone()[0]
+
+    def __str__(self) -> str:
+        return f'Catalog | Database: {self.database} | Scenes: {len(self)}'
+
+
+def read_header(path : str) -> Scene:
+    """
+    Read the header information of an image file without reading its pixels.
+
+    GeoTIFFs are read with rasterio, and other formats with reader.open, which
+    reads their bands lazily.
+
+    Parameters
+    ----------
+    path : str
+        Image file readable by reader.open
+
+    Returns
+    -------
+    Scene
+        Header information
+    """
+
+    path = os.path.abspath(path)
+    extension = path.rstrip('/\\').split('.')[-1].lower()
+
+    if extension in enums.FILE_EXTENTIONS.TIF.value:
+        with rasterio.open(path) as src:
+            crs = pyproj.CRS.from_proj4(src.crs.to_proj4())
+            transform, width, height = src.transform, src.width, src.height
+            dtype = np.result_type(*src.dtypes).name
+            bands = tuple(source_band_names(src))
+            tags = src.tags()
+    else:
+        image = reader.open(path)
+        crs, transform, width, height = image.crs, image.transform, image.width, image.height
+        dtype = np.result_type(*(band.dtype for band in image.data.data_vars.values())).name
+        bands = tuple(image.band_names)
+        tags = image.data.attrs
+
+    footprint = box(*rasterio.transform.array_bounds(height, width, transform))
+    return Scene(path, crs, transform, width, height, dtype, bands, _acquired(path, tags), _to_wgs84(footprint, crs))
+
+def _try_read_header(path : str) -> Scene | Exception:
+    """
+    Read the header information of an image file, returning the error if it fails.
+
+    Parameters
+    ----------
+    path : str
+        Image file readable by reader.open
+
+    Returns
+    -------
+    Scene or Exception
+        Header information, or the error raised while reading it
+    """
+
+    try:
+        return read_header(path)
+    except Exception as error:
+        return error
+
+def _acquired(path : str, tags : Dict[str, object]) -> datetime | None:
+    """
+    Find the acquisition time of a file in its metadata or its name.
+
+    Parameters
+    ----------
+    path : str
+        File path, searched for YYYYMMDD or YYYYMMDDTHHMMSS dates
+    tags : Dict[str, object]
+        Metadata, searched for the keys of ACQUISITION_KEYS first
+
+    Returns
+    -------
+    datetime or None
+        Acquisition time in UTC, None if not found
+    """
+
+    for key in ACQUISITION_KEYS:
+        if key in tags:
+            try:
+                return _utc(datetime.fromisoformat(str(tags[key]).strip()))
+            except ValueError:
+                pass
+
+    match = _FILENAME_DATE.search(os.path.basename(path.rstrip('/\\')))
+    if match is not None:
+        try:
+            return _utc(datetime.strptime(match.group(1) + (match.group(2) or '000000'), '%Y%m%d%H%M%S'))
+        except ValueError:
+            pass
+    return None
+
+def _utc(value : datetime) -> datetime:
+    """
+    Convert a time to UTC, assuming UTC when it has no time zone.
+    """
+
+    return value.replace(tzinfo = timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def _timestamp(value : datetime | str | np.datetime64) -> float:
+    """
+    Convert a time to a POSIX timestamp, assuming UTC when it has no time zone.
+    """
+
+    if isinstance(value, np.datetime64):
+        value = value.astype('datetime64[us]').item()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return _utc(value).timestamp()
+
+def _to_wgs84(geometry : BaseGeometry, crs : pyproj.CRS) -> BaseGeometry:
+    """
+    Reproject a geometry to longitude and latitude, densifying its edges first.
+
+    Parameters
+    ----------
+    geometry : BaseGeometry
+        Geometry in crs
+    crs : pyproj.CRS
+        CRS of the geometry
+
+    Returns
+    -------
+    BaseGeometry
+        Geometry in EPSG:4326
+    """
+
+    if crs.equals(_WGS84):
+        return geometry
+
+    minx, miny, maxx, maxy = geometry.bounds
+    segment = max(maxx - minx, maxy - miny) / 20
+    if segment > 0:
+        geometry = shapely.segmentize(geometry, segment)
+
+    transformer = pyproj.Transformer.from_crs(crs, _WGS84, always_xy = True)
+    return shapely.transform(geometry, lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1])))
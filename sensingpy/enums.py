@@ -32,4 +32,6 @@ class FILE_EXTENTIONS(Enum):
     """Class to hold the file extentions that can be read."""
 
     TIF = ['tiff', 'tif']
-    NETCDF = ['nc']
\ No newline at end of file
+    NETCDF = ['nc']
+    ZARR = ['zarr']
+    NUMPY = ['npy']
\ No newline at end of file
@@ -0,0 +1,813 @@
+import ast
+import os
+import numpy as np
+
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Set, Tuple
+
+
+DEFAULT_BLOCK_SIZE = 2**18
+
+_ARITHMETIC = {
+    '+' : np.add, '-' : np.subtract, '*' : np.multiply,
+    '/' : np.true_divide, '**' : np.power,
+}
+
+_AST_ARITHMETIC = {
+    ast.Add : '+', ast.Sub : '-', ast.Mult : '*',
+    ast.Div : '/', ast.Pow : '**',
+}
+
+_COMPARISONS = {
+    '<' : np.less, '<=' : np.less_equal, '>' : np.greater,
+    '>=' : np.greater_equal, '==' : np.equal, '!=' : np.not_equal,
+}
+
+_AST_COMPARISONS = {
+    ast.Lt : '<', ast.LtE : '<=', ast.Gt : '>',
+    ast.GtE : '>=', ast.Eq : '==', ast.NotEq : '!=',
+}
+
+
+def _inrange(array : np.ndarray, vmin : float, vmax : float) -> np.ndarray:
+    """Values within [vmin, vmax] with a single boolean temporary"""
+
+    result = np.greater_equal(array, vmin)
+    result &= np.less_equal(array, vmax)
+    return result
+
+def _valid(array : np.ndarray) -> np.ndarray:
+    """Values that are not NaN"""
+    return ~np.isnan(array)
+
+
+FUNCTIONS : Dict[str, Tuple[Callable, int]] = {
+    'inrange' : (_inrange, 3),
+    'valid' : (_valid, 1),
+    'log' : (np.log, 1),
+    'log10' : (np.log10, 1),
+    'sqrt' : (np.sqrt, 1),
+    'exp' : (np.exp, 1),
+    'abs' : (np.abs, 1),
+    'where' : (np.where, 3),
+}
+
+CONSTANTS : Dict[str, float] = {
+    'pi' : np.pi,
+    'nan' : np.nan,
+    'inf' : np.inf,
+}
+
+
+class Expression(ABC):
+    """
+    Lazy expression over named bands.
+
+    Expressions are built by parsing a string with ``parse`` or by combining
+    ``band`` objects with arithmetic, comparison and logical operators. Nothing
+    is computed until ``evaluate`` runs the whole expression block by block, so
+    temporaries never exceed one block per operation.
+
+    Notes
+    -----
+    As in numpy, ``&`` and ``|`` bind tighter than comparisons, so comparisons
+    must be parenthesized: ``(ndwi > 0) & (red < 0.2)``.
+    """
+
+    @property
+    def bands(self) -> Set[str]:
+        """
+        Names of the bands used by the expression.
+
+        Returns
+        -------
+        Set[str]
+            Band names
+        """
+
+        return set().union(*(child.bands for child in self.children))
+
+    @property
+    def children(self) -> List['Expression']:
+        """Direct operands of the expression"""
+        return []
+
+    @property
+    def _owned(self) -> bool:
+        """Whether _evaluate returns a new array that can be updated in place"""
+        return True
+
+    @property
+    def _params(self) -> Any:
+        """Parameters of the node besides its children, such as its operator"""
+        return None
+
+    @cached_property
+    def key(self) -> Tuple:
+        """
+        Structural identity of the expression.
+
+        Two expressions with the same key compute the same values, which is used
+        to evaluate common subexpressions only once.
+
+        Returns
+        -------
+        Tuple
+            Hashable description of the expression tree
+        """
+
+        return (self.__class__.__name__, self._params, tuple(child.key for child in self.children))
+
+    def substitute(self, mapping : Mapping[str, 'Expression | float']) -> 'Expression':
+        """
+        Replace bands by other expressions or constants.
+
+        Parameters
+        ----------
+        mapping : Mapping[str, Expression or float]
+            Replacement by band name, bands not in the mapping are kept
+
+        Returns
+        -------
+        Expression
+            New expression with the replacements
+        """
+
+        return self._rebuild([ child.substitute(mapping) for child in self.children ])
+
+    def _rebuild(self, children : List['Expression']) -> 'Expression':
+        """Copy of the node with other children"""
+        return self
+
+    def _value(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        """Evaluate the expression over one block, reusing the values of shared subexpressions"""
+
+        if self.key not in cache.shared:
+            return self._evaluate(block, cache)
+        if self.key not in cache.values:
+            cache.values[self.key] = self._evaluate(block, cache)
+        return cache.values[self.key]
+
+    def _reusable(self, cache : '_Cache') -> bool:
+        """Whether the block value of the expression can be overwritten by its parent"""
+        return self._owned and self.key not in cache.shared
+
+    def evaluate(self, bands : Mapping[str, np.ndarray], out : np.ndarray = None, packed : bool = False,
+                 block_size : int = DEFAULT_BLOCK_SIZE, workers : int = None) -> np.ndarray:
+        """
+        Evaluate the expression in a single blocked pass over the bands.
+
+        Parameters
+        ----------
+        bands : Mapping[str, np.ndarray]
+            Arrays of the same shape by band name, only the bands used are accessed
+        out : np.ndarray, optional
+            Preallocated output, by default None which allocates it
+        packed : bool, optional
+            If True, pack boolean results into bits along the last axis with
+            np.packbits, by default False
+        block_size : int, optional
+            Approximate number of values evaluated at once, by default 2**18.
+            Blocks are made of whole rows along the first axis.
+        workers : int, optional
+            Number of threads evaluating blocks, by default None which uses the
+            number of CPUs
+
+        Returns
+        -------
+        np.ndarray
+            Result of the expression, or its bit-packed form
+        """
+
+        for rows, (value,) in iter_blocks([ self ], bands, block_size, workers):
+            if packed:
+                value = np.packbits(value, axis = -1)
+            if out is None:
+                shape = _shape(bands, self.bands)
+                out_shape = (*shape[:-1], (shape[-1] + 7) // 8) if packed else shape
+                out = np.empty(out_shape, dtype = np.uint8 if packed else np.asarray(value).dtype)
+
+            out[rows] = value
+
+        return out
+
+    @abstractmethod
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        """Evaluate the expression over one block of the bands"""
+
+    def __and__(self, other : 'Expression') -> 'Expression':
+        return Logical('&', [self, _wrap(other)])
+
+    def __rand__(self, other : 'Expression') -> 'Expression':
+        return Logical('&', [_wrap(other), self])
+
+    def __or__(self, other : 'Expression') -> 'Expression':
+        return Logical('|', [self, _wrap(other)])
+
+    def __ror__(self, other : 'Expression') -> 'Expression':
+        return Logical('|', [_wrap(other), self])
+
+    def __invert__(self) -> 'Expression':
+        return Not(self)
+
+    def __add__(self, other) -> 'Expression':
+        return Arithmetic('+', self, _wrap(other))
+
+    def __radd__(self, other) -> 'Expression':
+        return Arithmetic('+', _wrap(other), self)
+
+    def __sub__(self, other) -> 'Expression':
+        return Arithmetic('-', self, _wrap(other))
+
+    def __rsub__(self, other) -> 'Expression':
+        return Arithmetic('-', _wrap(other), self)
+
+    def __mul__(self, other) -> 'Expression':
+        return Arithmetic('*', self, _wrap(other))
+
+    def __rmul__(self, other) -> 'Expression':
+        return Arithmetic('*', _wrap(other), self)
+
+    def __truediv__(self, other) -> 'Expression':
+        return Arithmetic('/', self, _wrap(other))
+
+    def __rtruediv__(self, other) -> 'Expression':
+        return Arithmetic('/', _wrap(other), self)
+
+    def __pow__(self, other) -> 'Expression':
+        return Arithmetic('**', self, _wrap(other))
+
+    def __rpow__(self, other) -> 'Expression':
+        return Arithmetic('**', _wrap(other), self)
+
+    def __neg__(self) -> 'Expression':
+        return Arithmetic('-', Constant(0), self)
+
+    def __abs__(self) -> 'Expression':
+        return Call('abs', [ self ])
+
+    def __lt__(self, other) -> 'Expression':
+        return Compare('<', self, _wrap(other))
+
+    def __le__(self, other) -> 'Expression':
+        return Compare('<=', self, _wrap(other))
+
+    def __gt__(self, other) -> 'Expression':
+        return Compare('>', self, _wrap(other))
+
+    def __ge__(self, other) -> 'Expression':
+        return Compare('>=', self, _wrap(other))
+
+    def __eq__(self, other) -> 'Expression':
+        return Compare('==', self, _wrap(other))
+
+    def __ne__(self, other) -> 'Expression':
+        return Compare('!=', self, _wrap(other))
+
+    __hash__ = object.__hash__
+
+    def __bool__(self) -> bool:
+        raise TypeError('Expressions have no truth value, combine them with & and | instead of and/or')
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class Band(Expression):
+    """
+    Named input band.
+
+    Parameters
+    ----------
+    name : str
+        Band name
+    """
+
+    def __init__(self, name : str) -> None:
+        self.name : str = name
+
+    @property
+    def bands(self) -> Set[str]:
+        return { self.name }
+
+    @property
+    def _owned(self) -> bool:
+        return False
+
+    @property
+    def _params(self) -> str:
+        return self.name
+
+    def substitute(self, mapping : Mapping[str, Expression | float]) -> Expression:
+        return _wrap(mapping[self.name]) if self.name in mapping else self
+
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        return block[self.name]
+
+    def __str__(self) -> str:
+        return self.name if self.name.isidentifier() else f'band({self.name!r})'
+
+
+class Constant(Expression):
+    """
+    Scalar constant.
+
+    Parameters
+    ----------
+    value : float
+        Constant value
+    """
+
+    def __init__(self, value : float) -> None:
+        self.value : float = value
+
+    @property
+    def _owned(self) -> bool:
+        return False
+
+    @property
+    def _params(self) -> float:
+        return self.value
+
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> float:
+        return self.value
+
+    def __str__(self) -> str:
+        return repr(self.value)
+
+
+class Arithmetic(Expression):
+    """
+    Elementwise arithmetic operation.
+
+    Results of inner operations are updated in place, so a chain of operations
+    only allocates one block-sized buffer per branch of the expression.
+
+    Parameters
+    ----------
+    op : str
+        One of '+', '-', '*', '/' or '**'
+    left : Expression
+        Left operand
+    right : Expression
+        Right operand
+    """
+
+    def __init__(self, op : str, left : Expression, right : Expression) -> None:
+        if op not in _ARITHMETIC:
+            raise ValueError(f'Unknown arithmetic operator {op}')
+
+        self.op : str = op
+        self.left : Expression = left
+        self.right : Expression = right
+
+    @property
+    def children(self) -> List[Expression]:
+        return [ self.left, self.right ]
+
+    @property
+    def _params(self) -> str:
+        return self.op
+
+    def _rebuild(self, children : List[Expression]) -> Expression:
+        return self.__class__(self.op, *children)
+
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        left, right = self.left._value(block, cache), self.right._value(block, cache)
+        function = _ARITHMETIC[self.op]
+
+        for operand, array in ((self.left, left), (self.right, right)):
+            if operand._reusable(cache) and isinstance(array, np.ndarray) and array.dtype == np.result_type(left, right) \
+                    and array.shape == np.broadcast_shapes(np.shape(left), np.shape(right)):
+                return function(left, right, out = array)
+
+        return function(left, right)
+
+    def __str__(self) -> str:
+        return f'({self.left} {self.op} {self.right})'
+
+
+class Compare(Expression):
+    """
+    Elementwise comparison.
+
+    Parameters
+    ----------
+    op : str
+        One of '<', '<=', '>', '>=', '==' or '!='
+    left : Expression
+        Left operand
+    right : Expression
+        Right operand
+    """
+
+    def __init__(self, op : str, left : Expression, right : Expression) -> None:
+        if op not in _COMPARISONS:
+            raise ValueError(f'Unknown comparison {op}')
+
+        self.op : str = op
+        self.left : Expression = left
+        self.right : Expression = right
+
+    @property
+    def children(self) -> List[Expression]:
+        return [ self.left, self.right ]
+
+    @property
+    def _params(self) -> str:
+        return self.op
+
+    def _rebuild(self, children : List[Expression]) -> Expression:
+        return self.__class__(self.op, *children)
+
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        return _COMPARISONS[self.op](self.left._value(block, cache), self.right._value(block, cache))
+
+    def __str__(self) -> str:
+        return f'({self.left} {self.op} {self.right})'
+
+
+class Logical(Expression):
+    """
+    Elementwise conjunction or disjunction of boolean operands.
+
+    Parameters
+    ----------
+    op : str
+        '&' or '|'
+    operands : List[Expression]
+        Boolean operands, nested operations of the same kind are flattened
+    """
+
+    def __init__(self, op : str, operands : List[Expression]) -> None:
+        if op not in ('&', '|'):
+            raise ValueError(f'Unknown logical operator {op}')
+
+        self.op : str = op
+        self.operands : List[Expression] = []
+        for operand in operands:
+            self.operands.extend(operand.operands if isinstance(operand, Logical) and operand.op == op else [operand])
+
+    @property
+    def children(self) -> List[Expression]:
+        return self.operands
+
+    @property
+    def _params(self) -> str:
+        return self.op
+
+    def _rebuild(self, children : List[Expression]) -> Expression:
+        return Logical(self.op, children)
+
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        result = np.array(self.operands[0]._value(block, cache), dtype = bool)
+        combine = np.logical_and if self.op == '&' else np.logical_or
+
+        for operand in self.operands[1:]:
+            combine(result, operand._value(block, cache), out = result)
+        return result
+
+    def __str__(self) -> str:
+        return '(' + f' {self.op} '.join(str(operand) for operand in self.operands) + ')'
+
+
+class Not(Expression):
+    """
+    Elementwise negation of a boolean operand.
+
+    Parameters
+    ----------
+    operand : Expression
+        Boolean operand
+    """
+
+    def __init__(self, operand : Expression) -> None:
+        self.operand : Expression = operand
+
+    @property
+    def children(self) -> List[Expression]:
+        return [ self.operand ]
+
+    def _rebuild(self, children : List[Expression]) -> Expression:
+        return Not(children[0])
+
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        return np.logical_not(self.operand._value(block, cache))
+
+    def __str__(self) -> str:
+        return f'~{self.operand}'
+
+
+class Call(Expression):
+    """
+    Call to a function of the FUNCTIONS registry.
+
+    Parameters
+    ----------
+    name : str
+        Function name, such as 'inrange' or 'valid'
+    args : List[Expression]
+        Function arguments
+    """
+
+    def __init__(self, name : str, args : List[Expression]) -> None:
+        if name not in FUNCTIONS:
+            raise ValueError(f'Unknown function {name}, must be one of {", ".join(FUNCTIONS)}')
+        if len(args) != FUNCTIONS[name][1]:
+            raise ValueError(f'{name} takes {FUNCTIONS[name][1]} arguments')
+
+        self.name : str = name
+        self.args : List[Expression] = args
+
+    @property
+    def children(self) -> List[Expression]:
+        return self.args
+
+    @property
+    def _params(self) -> str:
+        return self.name
+
+    def _rebuild(self, children : List[Expression]) -> Expression:
+        return Call(self.name, children)
+
+    def _evaluate(self, block : Dict[str, np.ndarray], cache : '_Cache') -> np.ndarray:
+        return FUNCTIONS[self.name][0](*(arg._value(block, cache) for arg in self.args))
+
+    def __str__(self) -> str:
+        return f'{self.name}(' + ', '.join(str(arg) for arg in self.args) + ')'
+
+
+def band(name : str) -> Band:
+    """
+    Create a band operand to build expressions with operators.
+
+    Parameters
+    ----------
+    name : str
+        Band name
+
+    Returns
+    -------
+    Band
+        Band operand
+
+    Examples
+    --------
+    >>> water = (band('ndwi') > 0) & inrange(band('Rrs_B4'), 0, 0.2)
+    """
+
+    return Band(name)
+
+def inrange(array : Expression, vmin : float, vmax : float) -> Call:
+    """
+    Build a fused [vmin, vmax] range test.
+
+    Parameters
+    ----------
+    array : Expression
+        Tested operand
+    vmin : float
+        Lower limit, included
+    vmax : float
+        Upper limit, included
+
+    Returns
+    -------
+    Call
+        Range test expression
+    """
+
+    return Call('inrange', [ _wrap(array), _wrap(vmin), _wrap(vmax) ])
+
+def valid(array : Expression) -> Call:
+    """
+    Build a not NaN test.
+
+    Parameters
+    ----------
+    array : Expression
+        Tested operand
+
+    Returns
+    -------
+    Call
+        Validity test expression
+    """
+
+    return Call('valid', [ _wrap(array) ])
+
+def parse(text : str) -> Expression:
+    """
+    Parse an expression from a string.
+
+    Band names are Python identifiers, or ``band('name')`` for names that are
+    not. Supported syntax is numbers, the CONSTANTS (pi, nan and inf),
+    ``+``, ``-``, ``*``, ``/``, ``**``, comparisons (chained comparisons
+    included), ``&``, ``|``, ``~``, ``and``, ``or``, ``not`` and calls to the
+    FUNCTIONS registry, such as log, sqrt or inrange.
+
+    Parameters
+    ----------
+    text : str
+        Expression, e.g. ``"(B3 - B8) / (B3 + B8)"`` or ``"(ndwi > 0) & inrange(red, 0, 0.2)"``
+
+    Returns
+    -------
+    Expression
+        Parsed expression
+
+    Raises
+    ------
+    ValueError
+        If the expression uses unsupported syntax
+    """
+
+    try:
+        tree = ast.parse(text.strip(), mode = 'eval')
+    except SyntaxError as error:
+        raise ValueError(f'Invalid expression {text!r}: {error.msg}') from error
+
+    return _from_ast(tree.body)
+
+def iter_blocks(expressions : List[Expression], bands : Mapping[str, np.ndarray], block_size : int = DEFAULT_BLOCK_SIZE,
+                workers : int = None) -> Iterator[Tuple[slice, List[np.ndarray]]]:
+    """
+    Evaluate several expressions block by block in a single pass over the bands.
+
+    Subexpressions shared by several expressions, such as ``log(B2 * n)`` in
+    two Stumpf pseudomodels, are computed once per block. Blocks are evaluated
+    by a pool of threads, numpy releases the GIL in elementwise operations, and
+    yielded in order with at most twice as many blocks in flight as threads,
+    so results can be streamed to disk.
+
+    Parameters
+    ----------
+    expressions : List[Expression]
+        Expressions to evaluate
+    bands : Mapping[str, np.ndarray]
+        Arrays of the same shape by band name, only the bands used are accessed
+    block_size : int, optional
+        Approximate number of values evaluated at once, by default 2**18
+    workers : int, optional
+        Number of threads evaluating blocks, by default None which uses the
+        number of CPUs
+
+    Yields
+    ------
+    Tuple[slice, List[np.ndarray]]
+        Rows of the block along the first axis and the value of each expression
+    """
+
+    names = set().union(*(expression.bands for expression in expressions))
+    if not names:
+        raise ValueError('The expressions do not use any band')
+
+    arrays = { name : bands[name] for name in names }
+    shape = _shape(arrays, names)
+    shared = _shared_keys(expressions)
+    if len(shape) == 0:
+        yield (), [ expression._value(arrays, _Cache(shared)) for expression in expressions ]
+        return
+
+    rows = max(1, block_size // max(int(np.prod(shape[1:])), 1))
+    blocks = [ slice(start, min(start + rows, shape[0])) for start in range(0, shape[0], rows) ]
+
+    def run(block_rows : slice) -> Tuple[slice, List[np.ndarray]]:
+        block = { name : np.broadcast_to(array, shape)[block_rows] for name, array in arrays.items() }
+        block_shape = (block_rows.stop - block_rows.start, *shape[1:])
+
+        cache = _Cache(shared)
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+            return block_rows, [ np.broadcast_to(expression._value(block, cache), block_shape) for expression in expressions ]
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1 or len(blocks) == 1:
+        yield from map(run, blocks)
+        return
+
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for block_rows in blocks:
+            pending.append(executor.submit(run, block_rows))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def evaluate_many(expressions : Mapping[str, Expression], bands : Mapping[str, np.ndarray], dtype : np.dtype = None,
+                  block_size : int = DEFAULT_BLOCK_SIZE, workers : int = None) -> Dict[str, np.ndarray]:
+    """
+    Evaluate several expressions together in a single blocked pass over the bands.
+
+    Parameters
+    ----------
+    expressions : Mapping[str, Expression]
+        Expressions by output name
+    bands : Mapping[str, np.ndarray]
+        Arrays of the same shape by band name, only the bands used are accessed
+    dtype : np.dtype, optional
+        Data type of the outputs, by default None which keeps the type of each result
+    block_size : int, optional
+        Approximate number of values evaluated at once, by default 2**18
+    workers : int, optional
+        Number of threads evaluating blocks, by default None which uses the
+        number of CPUs
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Result of every expression by output name
+    """
+
+    names, exprs = list(expressions), list(expressions.values())
+    shape = _shape(bands, set().union(*(expr.bands for expr in exprs)))
+    outputs = {}
+
+    for rows, values in iter_blocks(exprs, bands, block_size, workers):
+        for name, value in zip(names, values):
+            if name not in outputs:
+                outputs[name] = np.empty(shape, dtype = dtype or np.asarray(value).dtype)
+            outputs[name][rows] = value
+
+    return outputs
+
+
+class _Cache(object):
+    """Block values of the subexpressions shared within or between expressions"""
+
+    def __init__(self, shared : Set[Tuple]) -> None:
+        self.shared : Set[Tuple] = shared
+        self.values : Dict[Tuple, np.ndarray] = {}
+
+
+def _shared_keys(expressions : List[Expression]) -> Set[Tuple]:
+    """Keys of the computed subexpressions that appear more than once"""
+
+    counts, pending = Counter(), list(expressions)
+    while pending:
+        node = pending.pop()
+        if node.children:
+            counts[node.key] += 1
+            pending.extend(node.children)
+
+    return { key for key, count in counts.items() if count > 1 }
+
+def _shape(bands : Mapping[str, np.ndarray], names : Set[str]) -> Tuple[int, ...]:
+    """Common shape of the used bands"""
+    return np.broadcast_shapes(*(np.shape(bands[name]) for name in names))
+
+def _wrap(value) -> Expression:
+    """Wrap scalars as constants"""
+
+    if isinstance(value, Expression):
+        return value
+    if np.isscalar(value) and not isinstance(value, str):
+        return Constant(value)
+    raise TypeError(f'Unsupported operand {value!r}')
+
+def _from_ast(node : ast.AST) -> Expression:
+    """Convert a whitelisted Python syntax tree into an expression"""
+
+    if isinstance(node, ast.Name):
+        return Constant(CONSTANTS[node.id]) if node.id in CONSTANTS else Band(node.id)
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, bool)):
+        return Constant(node.value)
+
+    if isinstance(node, ast.Compare) and all(type(op) in _AST_COMPARISONS for op in node.ops):
+        operands = [ _from_ast(node.left) ] + [ _from_ast(comparator) for comparator in node.comparators ]
+        comparisons = [ Compare(_AST_COMPARISONS[type(op)], left, right)
+                        for op, left, right in zip(node.ops, operands[:-1], operands[1:]) ]
+        return comparisons[0] if len(comparisons) == 1 else Logical('&', comparisons)
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _AST_ARITHMETIC:
+        return Arithmetic(_AST_ARITHMETIC[type(node.op)], _from_ast(node.left), _from_ast(node.right))
+
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+        return Logical('&' if isinstance(node.op, ast.BitAnd) else '|', [ _from_ast(node.left), _from_ast(node.right) ])
+
+    if isinstance(node, ast.BoolOp):
+        return Logical('&' if isinstance(node.op, ast.And) else '|', [ _from_ast(value) for value in node.values ])
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Invert, ast.Not)):
+        return Not(_from_ast(node.operand))
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        operand = _from_ast(node.operand)
+        return Constant(-operand.value) if isinstance(operand, Constant) else -operand
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.UAdd):
+        return _from_ast(node.operand)
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        if node.func.id == 'band' and len(node.args) == 1 and isinstance(node.args[0], ast.Constant) \
+                and isinstance(node.args[0].value, str):
+            return Band(node.args[0].value)
+        if node.func.id in FUNCTIONS:
+            return Call(node.func.id, [ _from_ast(arg) for arg in node.args ])
+
+    raise ValueError(f'Unsupported expression: {ast.unparse(node)}')
@@ -1,21 +1,33 @@
 from __future__ import annotations
 
+import os
+import json
+import tempfile
+import warnings
+import netCDF4
 import rasterio.features
 import xarray as xr
 import numpy as np
 import rasterio
+import rasterio.shutil
 import sensingpy.selector as selector
 import pyproj
 import sensingpy.enums as enums
+import sensingpy.expression as expression
+import sensingpy.indices as indices
+import sensingpy.preprocessing.deglinting as deglinting
 
 
 from rasterio.warp import reproject, Resampling, calculate_default_transform
 from shapely.geometry.base import BaseGeometry
 from rasterio.transform import from_origin
+from rasterio.windows import Window, from_bounds
 from shapely.geometry import Polygon, box
-from typing import Tuple, List, Iterable, Self, Callable
+from typing import Tuple, List, Iterable, Self, Callable, Dict
 from affine import Affine
 from copy import deepcopy
+from datetime import datetime
+from sensingpy.cache import DATASET_POOL
 
 
 
@@ -680,14 +692,15 @@ class Image(object):
         self.data = self.data.isel({'y' : rows, 'x' : cols})
         return self
     
-    def mask(self, condition : np.ndarray, bands : str | List[str] = None) -> Self:     
+    def mask(self, condition : np.ndarray | str | expression.Expression, bands : str | List[str] = None) -> Self:     
         """
         Mask image bands using condition array.
 
         Parameters
         ----------
-        condition : np.ndarray
-            Boolean mask array
+        condition : np.ndarray, str or expression.Expression
+            Boolean mask array, or a mask expression over band names evaluated in a
+            single blocked pass, e.g. "(ndwi > 0) & inrange(Rrs_B4, 0, 0.2)"
         bands : str or List[str], optional
             Band(s) to apply mask to, by default None which applies to all bands
 
@@ -697,6 +710,11 @@ class Image(object):
             Returns the Image object for method chaining
         """
         
+        if isinstance(condition, str):
+            condition = expression.parse(condition)
+        if isinstance(condition, expression.Expression):
+            condition = condition.evaluate(self.__band_arrays(condition.bands))
+
         if bands is not None:
             self.data[bands] = self.data[bands].where( xr.DataArray(data = condition, dims = ('y', 'x')) )
         else:
@@ -852,7 +870,7 @@ class Image(object):
     
         return result
     
-    def add_band(self, band_name : str, data : np.ndarray | xr.DataArray) -> Self:
+    def add_band(self, band_name : str, data : np.ndarray | xr.DataArray | str | expression.Expression) -> Self:
         """
         Add a new band to the image or update an existing band.
 
@@ -860,8 +878,9 @@ class Image(object):
         ----------
         band_name : str
             Name of the band to add or update
-        data : np.ndarray or xr.DataArray
-            Band data to add. Must match the spatial dimensions of existing bands
+        data : np.ndarray, xr.DataArray, str or expression.Expression
+            Band data to add. Must match the spatial dimensions of existing bands.
+            Expressions over band names are evaluated with Image.expr
 
         Returns
         -------
@@ -874,8 +893,13 @@ class Image(object):
         >>> image.add_band('ndvi', ndvi_data)
         >>> # Update existing band
         >>> image.add_band('blue', new_blue_data)
+        >>> # Add band math expression
+        >>> image.add_band('ndwi', '(green - nir) / (green + nir)')
         """
         
+        if isinstance(data, (str, expression.Expression)):
+            data = self.expr(data)
+
         if isinstance(data, np.ndarray):
             if not band_name in self.band_names:
                 self.data[band_name] = (('y', 'x'), data)
@@ -904,6 +928,143 @@ class Image(object):
         return self
 
 
+    def deglint(self, method: str, bands: List[str], nir_band: str, deep_water: np.ndarray | List[BaseGeometry],
+                sample_size: int = None, seed: int = None, block_size: int = deglinting.DEFAULT_BLOCK_SIZE) -> Self:
+        """
+        Remove sun glint from bands in place.
+        
+        Fits the glint correction over the deep water area and updates every band
+        without building an intermediate stack of bands.
+        
+        Parameters
+        ----------
+        method : str
+            Deglinting method, 'hedley', 'lyzenga' or 'joyce'
+        bands : List[str]
+            Bands to correct
+        nir_band : str
+            Near-infrared band used as the glint predictor
+        deep_water : np.ndarray or List[BaseGeometry]
+            Boolean mask of optically deep water or geometries enclosing it, in the
+            image's CRS. Geometries are rasterized only within their bounding window.
+        sample_size : int, optional
+            Number of deep water pixels to fit on, by default None which uses all
+        seed : int, optional
+            Seed of the random generator used for sampling, by default None
+        block_size : int, optional
+            Number of rows corrected at once, by default 1024
+        
+        Returns
+        -------
+        Self
+            Returns the Image object for method chaining
+        
+        Notes
+        -----
+        Floating point bands backed by numpy arrays are modified in place, integer
+        bands are replaced by float32 bands and dask-backed bands stay lazy. Only the
+        window enclosing the deep water area is read to fit the coefficients.
+        
+        Examples
+        --------
+        >>> image.deglint('hedley', ['B2', 'B3', 'B4'], 'B8', deep_water = [deep_polygon])
+        
+        See Also
+        --------
+        preprocessing.deglinting.fit : Fit step used by this method
+        """
+
+        rows, cols, deep_mask = self.__deep_water_window(deep_water)
+        band_windows = [ self.data[band][rows, cols] for band in bands ]
+        model = deglinting.fit(deep_mask, band_windows, self.data[nir_band][rows, cols], method,
+                               sample_size = sample_size, seed = seed)
+
+        nir = self.data[nir_band].data
+        for idx, band in enumerate(bands):
+            band_model = deglinting.GlintModel(method, model.slopes[idx : idx + 1], model.references[idx : idx + 1])
+            values = self.data[band].data
+
+            if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.floating):
+                view = values[np.newaxis]
+                band_model.apply(view, nir, out = view, block_size = block_size)
+            else:
+                self.data[band] = self.data[band].copy(data = band_model.apply(values[np.newaxis], nir, block_size = block_size)[0])
+
+        return self
+
+    def __deep_water_window(self, deep_water: np.ndarray | List[BaseGeometry]) -> Tuple[slice, slice, np.ndarray]:
+        """
+        Find the window enclosing the deep water area and its mask within the window.
+
+        Parameters
+        ----------
+        deep_water : np.ndarray or List[BaseGeometry]
+            Boolean mask of deep water or geometries enclosing it
+
+        Returns
+        -------
+        Tuple[slice, slice, np.ndarray]
+            Row and column slices of the window and the deep water mask inside it
+        """
+
+        if isinstance(deep_water, np.ndarray):
+            rows, cols = self.__find_empty_borders(deep_water)
+            rows, cols = slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1)
+            return rows, cols, deep_water[rows, cols]
+
+        bounds = np.array([ geometry.bounds for geometry in deep_water ])
+        window = from_bounds(bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max(), self.transform)
+        row_start, col_start = max(int(np.floor(window.row_off)), 0), max(int(np.floor(window.col_off)), 0)
+        row_stop = min(int(np.ceil(window.row_off + window.height)), self.height)
+        col_stop = min(int(np.ceil(window.col_off + window.width)), self.width)
+        window = Window(col_start, row_start, max(col_stop - col_start, 0), max(row_stop - row_start, 0))
+        rows, cols = slice(row_start, row_stop), slice(col_start, col_stop)
+
+        deep_mask = rasterio.features.geometry_mask(geometries = deep_water, out_shape = (window.height, window.width),
+                                                    transform = rasterio.windows.transform(window, self.transform), invert = True)
+        return rows, cols, deep_mask
+
+    def remove_outliers(self, method: Callable, bands: str | List[str] = None, **kwargs) -> Self:
+        """
+        Mask outliers of each band independently as NaN.
+
+        Parameters
+        ----------
+        method : Callable
+            Outlier filter from preprocessing.outliers, such as hampel, moving_zscore or IQR
+        bands : str or List[str], optional
+            Band(s) to filter, by default None which filters all bands
+        **kwargs
+            Parameters of the outlier filter, such as window or n_sigmas
+
+        Returns
+        -------
+        Self
+            Returns the Image object for method chaining
+
+        Notes
+        -----
+        Floating point bands backed by numpy arrays are masked in place, other bands
+        are replaced by floating point bands.
+
+        Examples
+        --------
+        >>> image.remove_outliers(outliers.hampel, 'depth', window = 5)
+        """
+
+        bands = self.band_names if bands is None else [bands] if isinstance(bands, str) else bands
+
+        for band in bands:
+            values = self.data[band].data
+
+            if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.floating):
+                method(values, inplace = True, **kwargs)
+            else:
+                self.data[band] = self.data[band].copy(data = method(np.asarray(values), **kwargs))
+
+        return self
+
+
     def normalized_diference(self, band1: str, band2: str) -> np.ndarray:
         """
         Calculate normalized difference between two bands.
@@ -944,10 +1105,194 @@ class Image(object):
         >>> image.add_band('ndwi', ndwi)
         """
         
-        b1 = self.data[band1].values.copy()
-        b2 = self.data[band2].values.copy()
-        
-        return (b1 - b2) / (b1 + b2)
+        b1, b2 = self.band(band1), self.band(band2)
+        return self.expr((b1 - b2) / (b1 + b2))
+
+    def band(self, name: str) -> expression.Band:
+        """
+        Get a lazy band operand to build expressions with operators.
+
+        Parameters
+        ----------
+        name : str
+            Band name
+
+        Returns
+        -------
+        expression.Band
+            Band operand, evaluated with Image.expr
+
+        Examples
+        --------
+        >>> green, nir = image.band('B3'), image.band('B8')
+        >>> ndwi = image.expr((green - nir) / (green + nir))
+        """
+
+        if name not in self.band_names:
+            raise ValueError(f'{name} is not a band of the image')
+        return expression.band(name)
+
+    def expr(self, expr: str | expression.Expression, out: np.ndarray = None, block_size: int = expression.DEFAULT_BLOCK_SIZE,
+             workers: int = None) -> np.ndarray:
+        """
+        Evaluate a band math expression in a single blocked, multithreaded pass.
+
+        Parameters
+        ----------
+        expr : str or expression.Expression
+            Expression over band names, e.g. "(B3 - B8) / (B3 + B8)"
+        out : np.ndarray, optional
+            Preallocated output, by default None which allocates it
+        block_size : int, optional
+            Approximate number of pixels evaluated at once, by default 2**18
+        workers : int, optional
+            Number of threads, by default None which uses the number of CPUs
+
+        Returns
+        -------
+        np.ndarray
+            Result of the expression
+
+        Notes
+        -----
+        Intermediate results only take one block per operation instead of full
+        band copies. Use add_band to store the result or expr_to_tif to stream
+        it to disk.
+
+        Examples
+        --------
+        >>> image.add_band('ndwi', '(B3 - B8) / (B3 + B8)')
+        >>> ratio = image.expr('log(B2 * 1000) / log(B3 * 1000)')
+        """
+
+        expr = expression.parse(expr) if isinstance(expr, str) else expr
+        return expr.evaluate(self.__band_arrays(expr.bands), out = out, block_size = block_size, workers = workers)
+
+    def expr_to_tif(self, filename: str, expressions: Dict[str, str | expression.Expression], dtype: str = 'float32',
+                    block_size: int = expression.DEFAULT_BLOCK_SIZE, workers: int = None) -> None:
+        """
+        Evaluate band math expressions and stream them to a GeoTIFF file.
+
+        All the expressions are evaluated together block by block and every block is
+        written as soon as it is computed, so results never need to fit in memory.
+
+        Parameters
+        ----------
+        filename : str
+            Output filename
+        expressions : Dict[str, str or expression.Expression]
+            Expressions by output band name
+        dtype : str, optional
+            Output data type, by default 'float32'
+        block_size : int, optional
+            Approximate number of pixels evaluated at once, by default 2**18
+        workers : int, optional
+            Number of threads, by default None which uses the number of CPUs
+
+        Examples
+        --------
+        >>> image.expr_to_tif('indices.tif', {'ndwi' : '(B3 - B8) / (B3 + B8)', 'ndvi' : '(B8 - B4) / (B8 + B4)'})
+        """
+
+        names = list(expressions)
+        exprs = [ expression.parse(expr) if isinstance(expr, str) else expr for expr in expressions.values() ]
+        arrays = self.__band_arrays(set().union(*(expr.bands for expr in exprs)))
+
+        meta = {
+            'driver': 'GTiff',
+            'height': self.height,
+            'width': self.width,
+            'count': len(exprs),
+            'dtype': dtype,
+            'crs': self.crs,
+            'transform': self.transform
+        }
+
+        DATASET_POOL.discard(filename)
+        with rasterio.open(filename, 'w', **meta) as dst:
+            for idx, name in enumerate(names, start = 1):
+                dst.set_band_description(idx, name)
+
+            for rows, values in expression.iter_blocks(exprs, arrays, block_size, workers):
+                window = Window(0, rows.start, self.width, rows.stop - rows.start)
+                dst.write(np.stack(values).astype(dtype, copy = False), window = window)
+
+    def compute_indices(self, names: List[str], sensor: enums.Enum = enums.SENTINEL2_BANDS, band_format: str = '{}',
+                        n: float = indices.STUMPF_N, filename: str = None, dtype: str = None,
+                        block_size: int = expression.DEFAULT_BLOCK_SIZE, workers: int = None) -> Self:
+        """
+        Compute several spectral indices together in a single pass over the bands.
+
+        Every needed band block is read once and subexpressions shared by several
+        indices, such as log(blue * n) in the Stumpf pseudomodels, are computed once.
+
+        Parameters
+        ----------
+        names : List[str]
+            Names of indices registered in indices.INDICES, e.g. ['NDWI', 'pSDB_green', 'pSDB_red']
+        sensor : enums.Enum, optional
+            Band enumeration of the sensor, by default enums.SENTINEL2_BANDS
+        band_format : str, optional
+            Format of the image band names from the enum names, by default '{}'.
+            For example 'Rrs_{}' for bands named 'Rrs_B3'
+        n : float, optional
+            Stumpf constant, by default np.pi * 1000
+        filename : str, optional
+            If given, the indices are streamed to this multiband GeoTIFF instead of
+            being added as bands, by default None
+        dtype : str, optional
+            Data type of the indices, by default None which keeps the band type
+            ('float32' when writing to a file)
+        block_size : int, optional
+            Approximate number of pixels evaluated at once, by default 2**18
+        workers : int, optional
+            Number of threads, by default None which uses the number of CPUs
+
+        Returns
+        -------
+        Self
+            Returns the Image object for method chaining
+
+        Examples
+        --------
+        >>> image.rename_by_enum(SENTINEL2_BANDS).compute_indices(['NDWI', 'pSDB_green', 'pSDB_red'])
+
+        See Also
+        --------
+        indices.register : Add custom indices to the registry
+        """
+
+        exprs = indices.build(names, sensor, band_format, n)
+
+        if filename is not None:
+            self.expr_to_tif(filename, exprs, dtype or 'float32', block_size, workers)
+            return self
+
+        arrays = self.__band_arrays(set().union(*(expr.bands for expr in exprs.values())))
+        for name, values in expression.evaluate_many(exprs, arrays, dtype, block_size, workers).items():
+            self.add_band(name, values)
+
+        return self
+
+    def __band_arrays(self, bands: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Get the arrays of the given bands without copying them.
+
+        Parameters
+        ----------
+        bands : Iterable[str]
+            Band names
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            Arrays by band name
+        """
+
+        missing = set(bands) - set(self.band_names)
+        if missing:
+            raise ValueError(f'Unknown bands: {", ".join(sorted(missing))}')
+        return { band : self.data[band].data for band in bands }
 
 
     def extract_values(self, xs: np.ndarray, ys: np.ndarray, bands: List[str] = None, is_1D: bool = False) -> np.ndarray:
@@ -1010,7 +1355,8 @@ class Image(object):
             
         return values
 
-    def interval_choice(self, band: str, size: int, intervals: Iterable, replace: bool = True) -> np.ndarray:
+    def interval_choice(self, band: str, size: int, intervals: Iterable, replace: bool = True,
+                        rng: np.random.Generator | int = None, on_underpopulated: str = 'error') -> np.ndarray:
         """
         Choose random values from intervals in specified band.
 
@@ -1024,6 +1370,11 @@ class Image(object):
             Value intervals to sample from
         replace : bool, optional
             Sample with replacement if True, by default True
+        rng : np.random.Generator or int, optional
+            Random generator or seed for reproducible samples, by default None
+        on_underpopulated : str, optional
+            'error', 'cap' or 'replace' for intervals with fewer values than size,
+            by default 'error'. See selector.interval_choice
 
         Returns
         -------
@@ -1036,9 +1387,10 @@ class Image(object):
 
 
         array = self.select(band).ravel()        
-        return selector.interval_choice(array, size, intervals, replace)
+        return selector.interval_choice(array, size, intervals, replace, rng, on_underpopulated)
 
-    def arginterval_choice(self, band: str, size: int, intervals: Iterable, replace: bool = True) -> np.ndarray:
+    def arginterval_choice(self, band: str, size: int, intervals: Iterable, replace: bool = True,
+                           rng: np.random.Generator | int = None, on_underpopulated: str = 'error') -> np.ndarray:
         """
         Choose random indices from intervals in specified band.
 
@@ -1052,6 +1404,11 @@ class Image(object):
             Value intervals to sample from
         replace : bool, optional
             Sample with replacement if True, by default True
+        rng : np.random.Generator or int, optional
+            Random generator or seed for reproducible samples, by default None
+        on_underpopulated : str, optional
+            'error', 'cap' or 'replace' for intervals with fewer values than size,
+            by default 'error'. See selector.interval_choice
 
         Returns
         -------
@@ -1064,7 +1421,7 @@ class Image(object):
 
 
         array = self.select(band).ravel()        
-        return selector.arginterval_choice(array, size, intervals, replace)
+        return selector.arginterval_choice(array, size, intervals, replace, rng, on_underpopulated)
 
 
     def empty_like(self) -> Image:
@@ -1094,51 +1451,508 @@ class Image(object):
         return deepcopy(self)
     
 
-    def to_netcdf(self, filename):
+    def to_netcdf(self, filename: str, zlib: bool = True, complevel: int = 4, chunks: int | Tuple[int, int] = 512,
+                  pack: str | Dict[str, str] = None, fill_value: float = None, encoding: Dict[str, dict] = None,
+                  time: np.datetime64 | str = None, pack_range: Tuple[float, float] = None) -> None:
         """
         Save image to NetCDF file.
 
+        Every band is written compressed in chunks of the tile grid. The CRS is
+        written as global attributes without modifying the image.
+
         Parameters
         ----------
         filename : str
             Output filename
+        zlib : bool, optional
+            Compress the bands with zlib, by default True
+        complevel : int, optional
+            Compression level from 1 to 9, by default 4
+        chunks : int or Tuple[int, int], optional
+            Chunk size in pixels as size or (rows, columns), by default 512.
+            Chunks are clipped to the image size
+        pack : str or Dict[str, str], optional
+            Output data type for all bands, or by band name, by default None which
+            keeps the band data types. Integer types pack the bands with a
+            scale_factor and add_offset that cover their valid range
+        fill_value : float, optional
+            _FillValue of the bands, by default None which uses NaN for floating
+            point bands and the lowest value of signed (highest of unsigned)
+            integer types for packed bands
+        encoding : Dict[str, dict], optional
+            Encoding by band name such as {'ndwi': {'complevel': 9}}, applied over
+            the other options, by default None
+        time : np.datetime64 or str, optional
+            Time of the image, by default None. When given, the bands are written
+            along an unlimited time dimension so more time steps can be added with
+            append_to_netcdf
+        pack_range : Tuple[float, float], optional
+            (minimum, maximum) covered by the packed integer bands, by default None
+            which uses the range of each band. Give it when later tiles or time
+            steps appended with append_to_netcdf can fall outside this image range
+
+        Examples
+        --------
+        >>> image.to_netcdf('composite.nc', chunks = 256, pack = 'int16')
         """
-        
-        self.data.attrs['proj4_string'] = self.crs.to_proj4()
-        self.data.attrs['crs_wkt'] = self.crs.to_wkt()
-        
-        return self.data.to_netcdf(filename)
+
+        data = self.data.drop_encoding().assign_attrs(proj4_string = self.crs.to_proj4(), crs_wkt = self.crs.to_wkt())
+        if isinstance(chunks, int):
+            chunks = (chunks, chunks)
+        chunksizes = (min(chunks[0], self.height), min(chunks[1], self.width))
+
+        unlimited_dims = None
+        if time is not None:
+            data = data.expand_dims(time = [ np.datetime64(time, 'ns') ])
+            data['time'].encoding.update(units = 'seconds since 1970-01-01 00:00:00', calendar = 'standard', dtype = 'float64')
+            chunksizes = (1, *chunksizes)
+            unlimited_dims = ['time']
+
+        encodings = {}
+        for band_name, band_data in data.data_vars.items():
+            band_encoding = { 'zlib': zlib, 'chunksizes': chunksizes }
+            if zlib:
+                band_encoding.update(complevel = complevel, shuffle = True)
+
+            dtype = pack.get(band_name) if isinstance(pack, dict) else pack
+            if dtype is not None:
+                band_encoding.update(self.__packing(band_data.values, np.dtype(dtype), pack_range))
+            if fill_value is not None:
+                band_encoding['_FillValue'] = fill_value
+
+            encodings[band_name] = band_encoding | (encoding or {}).get(band_name, {})
+
+        DATASET_POOL.discard(filename)
+        data.to_netcdf(filename, encoding = encodings, unlimited_dims = unlimited_dims)
+
+    def append_to_netcdf(self, filename: str, time: np.datetime64 | str = None) -> None:
+        """
+        Write the image into an existing NetCDF file as a tile or time step.
+
+        The image must lie on the grid of the file, for example a tile of the scene
+        written with to_netcdf, and is written block by block into its place using
+        the encoding of the file.
+
+        Parameters
+        ----------
+        filename : str
+            NetCDF file written with to_netcdf
+        time : np.datetime64 or str, optional
+            Time step of the image, required when the file has a time dimension,
+            by default None. New times are appended at the end of the file and
+            existing times are overwritten
+
+        Raises
+        ------
+        ValueError
+            If the image is not on the grid of the file, has bands missing from the
+            file, has values outside the range of packed bands or the time does not
+            match the file
+
+        Examples
+        --------
+        >>> scene.to_netcdf('composite.nc', time = '2024-12-26')
+        >>> for date, image in images:
+        ...     image.append_to_netcdf('composite.nc', time = date)
+        """
+
+        DATASET_POOL.discard(filename)
+        with netCDF4.Dataset(filename, 'a') as dst:
+            rows = self.__grid_slice(np.asarray(dst['y'][:]), self.data.y.values, filename)
+            cols = self.__grid_slice(np.asarray(dst['x'][:]), self.data.x.values, filename)
+
+            missing = [ band_name for band_name in self.band_names if band_name not in dst.variables ]
+            if missing:
+                raise ValueError(f'{filename} has no bands {", ".join(missing)}')
+
+            for band_name, band_data in self.data.data_vars.items():
+                variable = dst[band_name]
+                if not np.issubdtype(variable.dtype, np.integer) or not hasattr(variable, 'scale_factor'):
+                    continue
+
+                _, lowest, highest = self.__packed_limits(variable.dtype)
+                scale, offset = float(variable.scale_factor), float(getattr(variable, 'add_offset', 0.))
+                minimum, maximum = offset + (lowest - .5) * scale, offset + (highest + .5) * scale
+                values = np.asarray(band_data.data)
+                if np.any((values < minimum) | (values > maximum)):
+                    raise ValueError(f'{band_name} has values outside the packed range [{minimum}, {maximum}] of {filename}, '
+                                     'write the file with a wider pack_range')
+
+            index = ()
+            if 'time' in dst.dimensions:
+                if time is None:
+                    raise ValueError(f'{filename} has a time dimension, time must be given')
+                times = dst['time']
+                step = netCDF4.date2num(np.datetime64(time, 'us').astype(datetime), times.units,
+                                        getattr(times, 'calendar', 'standard'))
+                existing = np.flatnonzero(np.asarray(times[:]) == step)
+                index = (int(existing[0]) if existing.size else len(times),)
+                times[index[0]] = step
+            elif time is not None:
+                raise ValueError(f'{filename} has no time dimension')
+
+            for band_name, band_data in self.data.data_vars.items():
+                variable = dst[band_name]
+                chunking = variable.chunking()
+                blocksize = self.height if chunking == 'contiguous' else chunking[-2]
+
+                for row in range(0, self.height, blocksize):
+                    block = np.asarray(band_data.data[row : row + blocksize])
+                    window = slice(rows.start + row, rows.start + row + len(block))
+                    # NaNs are replaced under the mask so packing never casts them to integers
+                    invalid = ~np.isfinite(block)
+                    variable[index + (window, cols)] = np.ma.masked_array(np.where(invalid, 0, block), mask = invalid)
+
+    def to_zarr(self, path: str, chunks: int | Tuple[int, int] = 512, compressor: object = None,
+                region: bool = False, consolidated: bool = True) -> None:
+        """
+        Save image to a Zarr store.
+
+        Parameters
+        ----------
+        path : str
+            Output store path
+        chunks : int or Tuple[int, int], optional
+            Chunk size in pixels as size or (rows, columns), by default 512.
+            Chunks are clipped to the image size
+        compressor : object, optional
+            Zarr codec used to compress the chunks, such as
+            zarr.codecs.BloscCodec(cname = 'zstd', clevel = 5), by default None
+            which uses the zarr default
+        region : bool, optional
+            Write the image into its place of an existing store instead of creating
+            a new one, by default False. Only the bands are written, so workers can
+            fill different tiles of one store concurrently as long as their tiles
+            are aligned to the chunks of the store
+        consolidated : bool, optional
+            Write consolidated metadata so the store is opened with a single read,
+            by default True
+
+        Raises
+        ------
+        ValueError
+            If a region is not on the grid of the store or not aligned to its chunks
+
+        Examples
+        --------
+        >>> scene.to_zarr('composite.zarr', chunks = 256)
+        >>> tile.to_zarr('composite.zarr', region = True)
+        """
+
+        if region:
+            self.__write_zarr_region(path)
+            return
+
+        data = self.data.drop_encoding().assign_attrs(proj4_string = self.crs.to_proj4(), crs_wkt = self.crs.to_wkt())
+        if isinstance(chunks, int):
+            chunks = (chunks, chunks)
+
+        band_encoding = { 'chunks': (min(chunks[0], self.height), min(chunks[1], self.width)) }
+        if compressor is not None:
+            band_encoding['compressors'] = (compressor,)
+
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message = 'Consolidated metadata')
+            data.to_zarr(path, mode = 'w', consolidated = consolidated,
+                         encoding = { band_name: band_encoding for band_name in data.data_vars })
+
+    def __write_zarr_region(self, path: str) -> None:
+        """
+        Write the bands into their place of an existing Zarr store.
+
+        Parameters
+        ----------
+        path : str
+            Zarr store written with to_zarr
+
+        Raises
+        ------
+        ValueError
+            If the image is not on the grid of the store, has bands missing from the
+            store or is not aligned to the chunks of the store
+        """
+
+        with xr.open_zarr(path, chunks = None) as dst:
+            missing = [ band_name for band_name in self.band_names if band_name not in dst.data_vars ]
+            if missing:
+                raise ValueError(f'{path} has no bands {", ".join(missing)}')
+
+            region = {
+                'y': self.__grid_slice(dst.y.values, self.data.y.values, path),
+                'x': self.__grid_slice(dst.x.values, self.data.x.values, path),
+            }
+
+            for band_name in self.band_names:
+                for axis, chunk in zip(('y', 'x'), dst[band_name].encoding['chunks']):
+                    size = dst.sizes[axis]
+                    if region[axis].start % chunk or (region[axis].stop % chunk and region[axis].stop != size):
+                        raise ValueError(f'Image is not aligned to the {chunk} pixel chunks of {path}')
+
+        data = self.data.drop_encoding()
+        data = data.drop_vars([ name for name, variable in data.variables.items() if name in ('y', 'x') or not set(variable.dims) & { 'y', 'x' } ])
+        data.to_zarr(path, mode = 'r+', region = region)
+
+    def to_npy(self, filename: str, dtype: str = None, blocksize: int = 512) -> None:
+        """
+        Save image to a band cube for memory-mapped reads.
+
+        The bands are written block by block into a (bands, height, width) .npy
+        file, and the band names, attributes, CRS and transform into a JSON sidecar
+        with the same name, so reader.open maps every band as a zero-copy view.
+
+        Parameters
+        ----------
+        filename : str
+            Output .npy filename
+        dtype : str, optional
+            Output data type, by default None which uses a type that can hold
+            every band
+        blocksize : int, optional
+            Rows written at once, by default 512
+
+        Examples
+        --------
+        >>> image.to_npy('scene.npy')
+        >>> cached = reader.open('scene.npy')
+        """
+
+        dtype = np.dtype(dtype or np.result_type(*(band.dtype for band in self.data.data_vars.values())))
+        cube = np.lib.format.open_memmap(filename, mode = 'w+', dtype = dtype, shape = (self.count, self.height, self.width))
+
+        for idx, band_data in enumerate(self.data.data_vars.values()):
+            for row in range(0, self.height, blocksize):
+                cube[idx, row : row + blocksize] = band_data.data[row : row + blocksize]
+        cube.flush()
+        del cube
+
+        metadata = {
+            'bands': { band_name: band_data.attrs for band_name, band_data in self.data.data_vars.items() },
+            'attrs': self.data.attrs,
+            'crs_wkt': self.crs.to_wkt(),
+            'transform': list(self.transform)[:6],
+        }
+        with open(os.path.splitext(filename)[0] + '.json', 'w') as file:
+            json.dump(metadata, file, default = lambda value: value.item() if isinstance(value, np.generic) else str(value))
+
+    @staticmethod
+    def __packing(values: np.ndarray, dtype: np.dtype, pack_range: Tuple[float, float] = None) -> dict:
+        """
+        Encoding that packs values into a data type.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Band values
+        dtype : np.dtype
+            Output data type
+        pack_range : Tuple[float, float], optional
+            (minimum, maximum) covered by the packed values, by default None which
+            uses the range of the values
+
+        Returns
+        -------
+        dict
+            dtype, and scale_factor, add_offset and _FillValue for integer types
+        """
+
+        if not np.issubdtype(dtype, np.integer):
+            return { 'dtype': dtype.name }
+
+        fill, lowest, highest = Image.__packed_limits(dtype)
+
+        if pack_range is not None:
+            minimum, maximum = map(float, pack_range)
+        else:
+            valid = values[np.isfinite(values)]
+            minimum, maximum = (float(valid.min()), float(valid.max())) if valid.size else (0., 0.)
+        scale = (maximum - minimum) / (highest - lowest) if maximum > minimum else 1.
+
+        return { 'dtype': dtype.name, 'scale_factor': scale, 'add_offset': minimum - lowest * scale, '_FillValue': fill }
+
+    @staticmethod
+    def __packed_limits(dtype: np.dtype) -> Tuple[int, int, int]:
+        """
+        Fill value and range of the packed values of an integer data type.
+
+        Parameters
+        ----------
+        dtype : np.dtype
+            Integer data type
+
+        Returns
+        -------
+        Tuple[int, int, int]
+            _FillValue, lowest and highest packed values
+        """
+
+        info = np.iinfo(dtype)
+        return (info.min, info.min + 1, info.max) if info.min < 0 else (info.max, info.min, info.max - 1)
+
+    @staticmethod
+    def __grid_slice(grid: np.ndarray, coords: np.ndarray, filename: str) -> slice:
+        """
+        Position of coordinates in the coordinates of a grid.
+
+        Parameters
+        ----------
+        grid : np.ndarray
+            Coordinates of the grid
+        coords : np.ndarray
+            Coordinates to locate
+        filename : str
+            File of the grid, for error messages
+
+        Returns
+        -------
+        slice
+            Indices of the coordinates in the grid
+
+        Raises
+        ------
+        ValueError
+            If the coordinates are not part of the grid
+        """
+
+        tolerance = 1e-3 * abs(grid[1] - grid[0]) if len(grid) > 1 else 1e-6
+        start = int(np.abs(grid - coords[0]).argmin())
+        stop = start + len(coords)
+
+        if stop > len(grid) or not np.allclose(grid[start : stop], coords, rtol = 0, atol = tolerance):
+            raise ValueError(f'Image is not on the grid of {filename}')
+        return slice(start, stop)
     
-    def to_tif(self, filename):
+    def to_tif(self, filename: str, tiled: bool = True, blocksize: int = 512, compress: str | None = 'deflate',
+               predictor: int = None, num_threads: int | str = 'ALL_CPUS', bigtiff: str = 'IF_NEEDED', cog: bool = False,
+               overviews: List[int] = None, overview_resampling: Resampling = Resampling.nearest, nodata: float = None,
+               dtype: str = None) -> None:
         """
         Save image to GeoTIFF file.
 
+        Bands are written together block by block, so lazy or tiled images are
+        only read one block of rows at a time.
+
         Parameters
         ----------
         filename : str
             Output filename
+        tiled : bool, optional
+            Write square tiles instead of strips, by default True
+        blocksize : int, optional
+            Tile size, or rows per strip, in pixels, by default 512. Tiles must
+            be a multiple of 16
+        compress : str or None, optional
+            Compression such as 'deflate', 'zstd' or 'lzw', by default 'deflate'.
+            None writes uncompressed data
+        predictor : int, optional
+            Compression predictor, by default None which uses 3 (floating point)
+            for float bands and 2 (horizontal differencing) for integer bands
+            when compressing. Use 1 for no predictor
+        num_threads : int or str, optional
+            Threads used to compress, by default 'ALL_CPUS'
+        bigtiff : str, optional
+            'YES', 'NO' or 'IF_NEEDED' to write BigTIFF files, by default 'IF_NEEDED'
+        cog : bool, optional
+            Write a Cloud-Optimized GeoTIFF, by default False
+        overviews : List[int], optional
+            Overview decimation factors such as [2, 4, 8], by default None. Cloud-Optimized
+            GeoTIFFs get automatic overviews when None
+        overview_resampling : Resampling, optional
+            Resampling used to build the overviews, by default Resampling.nearest
+        nodata : float, optional
+            Nodata value, by default None which uses NaN for floating point data
+        dtype : str, optional
+            Output data type, by default None which uses a type that can hold
+            every band
+
+        Notes
+        -----
+        GDAL can only write Cloud-Optimized GeoTIFFs by copying a complete file, so
+        with cog=True the image is streamed to a temporary tiled GeoTIFF next to the
+        output and then copied to the final file with the COG driver.
+
+        Examples
+        --------
+        >>> image.to_tif('depth.tif', compress = 'zstd', cog = True, overviews = [2, 4, 8])
         """
-        
-        height, width = self.height, self.width
-        count = self.count
-        
+
+        dtype = np.dtype(dtype or np.result_type(*(band.dtype for band in self.data.data_vars.values())))
+        if nodata is None and np.issubdtype(dtype, np.floating):
+            nodata = np.nan
+        if predictor is None and compress is not None:
+            predictor = 3 if np.issubdtype(dtype, np.floating) else 2
+
+        options = { 'bigtiff': bigtiff, 'num_threads': num_threads }
+        if compress is not None:
+            options.update(compress = compress.upper(), predictor = predictor or 1)
+
         # Prepare the metadata for rasterio
         meta = {
             'driver': 'GTiff',
-            'height': height,
-            'width': width,
-            'count': count,
-            'dtype': next(iter(self.data.data_vars.values())).dtype,
+            'height': self.height,
+            'width': self.width,
+            'count': self.count,
+            'dtype': dtype.name,
+            'nodata': nodata,
             'crs': self.crs,
-            'transform': self.transform
+            'transform': self.transform,
         }
-        
-        with rasterio.open(filename, 'w', **meta) as dst:
-            # Write each band
-            for idx, (band_name, band_data) in enumerate(self.data.data_vars.items(), start=1):
-                dst.write(band_data.values, idx)
+        if tiled or cog:
+            meta.update(tiled = True, blockxsize = blocksize, blockysize = blocksize)
+        else:
+            meta.update(blockysize = min(blocksize, self.height))
+
+        DATASET_POOL.discard(filename)
+        if not cog:
+            self.__write_tif(filename, meta | options, blocksize, overviews, overview_resampling)
+            return
+
+        folder = os.path.dirname(os.path.abspath(filename))
+        with tempfile.TemporaryDirectory(dir = folder) as tmp:
+            tmp_filename = os.path.join(tmp, 'image.tif')
+            self.__write_tif(tmp_filename, meta | { 'bigtiff': bigtiff, 'num_threads': num_threads }, blocksize,
+                             overviews, overview_resampling)
+
+            cog_options = options | {
+                'compress': options.get('compress', 'NONE'),
+                'blocksize': blocksize,
+                'overviews': 'AUTO' if overviews is None else 'FORCE_USE_EXISTING',
+                'overview_resampling': overview_resampling.name.upper(),
+            }
+            rasterio.shutil.copy(tmp_filename, filename, driver = 'COG', **cog_options)
+
+    def __write_tif(self, filename: str, profile: dict, blocksize: int, overviews: List[int] | None,
+                    overview_resampling: Resampling) -> None:
+        """
+        Write all bands block by block and build overviews.
+
+        Parameters
+        ----------
+        filename : str
+            Output filename
+        profile : dict
+            Rasterio profile and creation options
+        blocksize : int
+            Rows written at once
+        overviews : List[int] or None
+            Overview decimation factors
+        overview_resampling : Resampling
+            Resampling used to build the overviews
+        """
+
+        bands = list(self.data.data_vars.items())
+
+        with rasterio.open(filename, 'w', **profile) as dst:
+            for idx, (band_name, _) in enumerate(bands, start = 1):
                 dst.set_band_description(idx, band_name)
 
+            for row in range(0, self.height, blocksize):
+                rows = slice(row, min(row + blocksize, self.height))
+                block = np.stack([ np.asarray(band_data.data[rows]) for _, band_data in bands ])
+                dst.write(block.astype(profile['dtype'], copy = False), window = Window(0, row, self.width, rows.stop - row))
+
+            if overviews:
+                dst.build_overviews(overviews, overview_resampling)
+                dst.update_tags(ns = 'rio_overview', resampling = overview_resampling.name)
 
     def __str__(self) -> str:
         return f'Bands: {self.band_names} | Height: {self.height} | Width: {self.width}'
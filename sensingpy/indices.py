@@ -0,0 +1,167 @@
+import numpy as np
+import sensingpy.enums as enums
+import sensingpy.expression as expression
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Iterable, Type
+
+
+STUMPF_N = np.pi * 1_000
+
+
+@dataclass(frozen = True)
+class SpectralIndex:
+    """
+    Spectral index defined over generic band roles.
+
+    Parameters
+    ----------
+    name : str
+        Index name
+    formula : str
+        Expression over the band roles of BAND_ROLES, such as blue, green,
+        red or nir, and the Stumpf constant n
+    description : str, optional
+        Short description of the index, by default ''
+    """
+
+    name : str
+    formula : str
+    description : str = ''
+
+    def __post_init__(self) -> None:
+        expression.parse(self.formula)
+
+    @property
+    def roles(self) -> set:
+        """
+        Band roles used by the index.
+
+        Returns
+        -------
+        set
+            Role names
+        """
+
+        return expression.parse(self.formula).bands - { 'n' }
+
+    def to_expression(self, sensor : Type[Enum] = enums.SENTINEL2_BANDS, band_format : str = '{}',
+                      n : float = STUMPF_N) -> expression.Expression:
+        """
+        Build the expression of the index over the bands of a sensor.
+
+        Parameters
+        ----------
+        sensor : Type[Enum], optional
+            Band enumeration of the sensor, by default enums.SENTINEL2_BANDS
+        band_format : str, optional
+            Format of the image band names from the enum names, by default '{}'.
+            For example 'Rrs_{}' maps the green band of Sentinel-2 to 'Rrs_B3'.
+        n : float, optional
+            Stumpf constant, by default np.pi * 1000
+
+        Returns
+        -------
+        expression.Expression
+            Expression over the image band names
+
+        Raises
+        ------
+        ValueError
+            If the sensor has no band for one of the roles of the index
+        """
+
+        roles = BAND_ROLES[sensor]
+        missing = self.roles - set(roles)
+        if missing:
+            raise ValueError(f'{self.name} needs {", ".join(sorted(missing))}, not available in {sensor.__name__}')
+
+        mapping = { role : expression.band(band_format.format(band.name)) for role, band in roles.items() }
+        mapping['n'] = n
+        return expression.parse(self.formula).substitute(mapping)
+
+
+BAND_ROLES : Dict[Type[Enum], Dict[str, Enum]] = {
+    enums.SENTINEL2_BANDS : {
+        'coastal' : enums.SENTINEL2_BANDS.B1,
+        'blue' : enums.SENTINEL2_BANDS.B2,
+        'green' : enums.SENTINEL2_BANDS.B3,
+        'red' : enums.SENTINEL2_BANDS.B4,
+        'red_edge' : enums.SENTINEL2_BANDS.B5,
+        'nir' : enums.SENTINEL2_BANDS.B8,
+        'swir1' : enums.SENTINEL2_BANDS.B11,
+        'swir2' : enums.SENTINEL2_BANDS.B12,
+    },
+    enums.MICASENSE_BANDS : {
+        'blue' : enums.MICASENSE_BANDS.BLUE,
+        'green' : enums.MICASENSE_BANDS.GREEN,
+        'red' : enums.MICASENSE_BANDS.RED,
+        'red_edge' : enums.MICASENSE_BANDS.RED_EDGE,
+        'nir' : enums.MICASENSE_BANDS.NIR,
+    },
+}
+
+INDICES : Dict[str, SpectralIndex] = {}
+
+
+def register(name : str, formula : str, description : str = '') -> SpectralIndex:
+    """
+    Add an index to the registry, replacing any index with the same name.
+
+    Parameters
+    ----------
+    name : str
+        Index name
+    formula : str
+        Expression over band roles, e.g. "(green - nir) / (green + nir)"
+    description : str, optional
+        Short description of the index, by default ''
+
+    Returns
+    -------
+    SpectralIndex
+        Registered index
+    """
+
+    index = SpectralIndex(name, formula, description)
+    INDICES[name] = index
+    return index
+
+def build(names : Iterable[str], sensor : Type[Enum] = enums.SENTINEL2_BANDS, band_format : str = '{}',
+          n : float = STUMPF_N) -> Dict[str, expression.Expression]:
+    """
+    Build the expressions of several registered indices.
+
+    Parameters
+    ----------
+    names : Iterable[str]
+        Names of registered indices
+    sensor : Type[Enum], optional
+        Band enumeration of the sensor, by default enums.SENTINEL2_BANDS
+    band_format : str, optional
+        Format of the image band names from the enum names, by default '{}'
+    n : float, optional
+        Stumpf constant, by default np.pi * 1000
+
+    Returns
+    -------
+    Dict[str, expression.Expression]
+        Expression of every index by name, ready for expression.evaluate_many
+    """
+
+    names = list(names)
+    unknown = [ name for name in names if name not in INDICES ]
+    if unknown:
+        raise ValueError(f'Unknown indices: {", ".join(unknown)}, must be one of {", ".join(INDICES)}')
+
+    return { name : INDICES[name].to_expression(sensor, band_format, n) for name in names }
+
+
+register('NDWI', '(green - nir) / (green + nir)', 'Normalized Difference Water Index (McFeeters, 1996)')
+register('MNDWI', '(green - swir1) / (green + swir1)', 'Modified Normalized Difference Water Index (Xu, 2006)')
+register('NDVI', '(nir - red) / (nir + red)', 'Normalized Difference Vegetation Index')
+register('pSDB_green', 'log(blue * n) / log(green * n)', 'Stumpf pseudomodel with the green band (Stumpf et al., 2003)')
+register('pSDB_red', 'log(blue * n) / log(red * n)', 'Stumpf pseudomodel with the red band (Stumpf et al., 2003)')
+register('blue_green', 'blue / green', 'Blue to green band ratio')
+register('green_red', 'green / red', 'Green to red band ratio')
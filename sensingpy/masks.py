@@ -1,5 +1,7 @@
 import numpy as np
 
+from sensingpy.expression import Expression, parse
+
 
 def is_valid(array : np.ndarray) -> np.ndarray:
     """Returns a mask of valid values in the array, excluding NaNs."""
@@ -19,12 +21,18 @@ def is_gt(array : np.ndarray, value : float) -> np.ndarray:
 
 def is_lte(array : np.ndarray, value : float) -> np.ndarray:
     """Returns a mask of values in the array that are less than or equal to the given value."""
-    return is_lt(array, value) | is_eq(array, value)
+    return array <= value
 
 def is_gte(array : np.ndarray, value : float) -> np.ndarray:
     """Returns a mask of values in the array that are greater than or equal to the given value."""
-    return is_gt(array, value) | is_eq(array, value)
+    return array >= value
 
 def is_in_range(array : np.ndarray, vmin : float, vmax : float) -> np.ndarray:
     """"Returns a mask of values in the array that are within the given range [vmin, vmax]."""
-    return is_gte(array, vmin) & is_lte(array, vmax)
\ No newline at end of file
+    result = is_gte(array, vmin)
+    result &= is_lte(array, vmax)
+    return result
+
+def expr(expression : str) -> Expression:
+    """Parses a mask expression such as "(ndwi > 0) & inrange(red, 0, 0.2)", evaluated in a single blocked pass."""
+    return parse(expression)
\ No newline at end of file
@@ -0,0 +1,633 @@
+import itertools
+import os
+import numpy as np
+import pyproj
+import rasterio
+
+from affine import Affine
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from dataclasses import dataclass
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import Resampling, transform_bounds, calculate_default_transform
+from rasterio.windows import Window
+from scipy import ndimage
+from shapely import STRtree
+from shapely.geometry import Polygon, box
+from typing import Dict, Iterable, Iterator, List, Self, Tuple
+from xarray.backends import BackendArray
+from xarray.core import indexing
+from sensingpy.cache import BLOCK_CACHE, DATASET_POOL, BlockCache
+
+
+DEFAULT_BLOCK_SIZE = 512
+
+
+@dataclass(frozen = True)
+class Grid:
+    """
+    Output pixel grid of a mosaic.
+
+    Parameters
+    ----------
+    crs : pyproj.CRS
+        Coordinate reference system of the grid
+    transform : Affine
+        Transform of the upper left corner and resolution of the grid
+    width : int
+        Width of the grid in pixels
+    height : int
+        Height of the grid in pixels
+    """
+
+    crs : pyproj.CRS
+    transform : Affine
+    width : int
+    height : int
+
+    @classmethod
+    def from_bounds(cls, bounds : Tuple[float, float, float, float], crs : pyproj.CRS, resolution : float) -> Self:
+        """
+        Create the grid that covers some bounds with pixels aligned to the resolution.
+
+        Parameters
+        ----------
+        bounds : Tuple[float, float, float, float]
+            (left, bottom, right, top) in the grid CRS
+        crs : pyproj.CRS
+            Coordinate reference system of the grid
+        resolution : float
+            Pixel size in CRS units
+
+        Returns
+        -------
+        Grid
+            Grid whose edges are multiples of the resolution
+        """
+
+        left, bottom, right, top = bounds
+        left, top = np.floor(left / resolution) * resolution, np.ceil(top / resolution) * resolution
+        width = max(int(np.ceil(round((right - left) / resolution, 6))), 1)
+        height = max(int(np.ceil(round((top - bottom) / resolution, 6))), 1)
+
+        return cls(crs, rasterio.transform.from_origin(left, top, resolution, resolution), width, height)
+
+    @classmethod
+    def from_files(cls, paths : Iterable[str], crs : pyproj.CRS = None, resolution : float = None) -> Self:
+        """
+        Create the grid that covers the union of the footprints of raster files.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Raster files readable by rasterio
+        crs : pyproj.CRS, optional
+            CRS of the grid, by default None which uses the CRS of the first file
+        resolution : float, optional
+            Pixel size in CRS units, by default None which uses the finest
+            resolution of the files in the grid CRS
+
+        Returns
+        -------
+        Grid
+            Grid whose edges are multiples of the resolution
+
+        Raises
+        ------
+        ValueError
+            If no file is given
+        """
+
+        paths = list(paths)
+        if not paths:
+            raise ValueError('A grid needs at least one file')
+
+        bounds, resolutions = [], []
+        for path in paths:
+            with DATASET_POOL.open(path) as src:
+                crs = pyproj.CRS(src.crs.to_wkt()) if crs is None else crs
+                bounds.append(transform_bounds(src.crs, crs, *src.bounds, densify_pts = 21))
+                transform, _, _ = calculate_default_transform(src.crs, crs, src.width, src.height, *src.bounds)
+                resolutions.append(min(abs(transform.a), abs(transform.e)))
+
+        bounds = np.array(bounds)
+        return cls.from_bounds((bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()),
+                               crs, resolution or min(resolutions))
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """
+        Get the (left, bottom, right, top) bounds of the grid.
+
+        Returns
+        -------
+        Tuple[float, float, float, float]
+            Bounds in the grid CRS
+        """
+
+        return rasterio.transform.array_bounds(self.height, self.width, self.transform)
+
+    def window_bounds(self, rows : slice, cols : slice) -> Polygon:
+        """
+        Get the footprint of a window of the grid.
+
+        Parameters
+        ----------
+        rows : slice
+            Rows of the window
+        cols : slice
+            Columns of the window
+
+        Returns
+        -------
+        Polygon
+            Footprint in the grid CRS
+        """
+
+        left, top = self.transform * (cols.start, rows.start)
+        right, bottom = self.transform * (cols.stop, rows.stop)
+        return box(min(left, right), min(top, bottom), max(left, right), max(top, bottom))
+
+
+class VirtualMosaic:
+    """
+    Mosaic of raster files on a common grid that is read block by block on demand.
+
+    Sources are indexed by footprint, so every block only opens, reads and warps
+    the sources that intersect it. Where sources overlap, the first source with a
+    valid value is used. Blocks are kept in an LRU cache. Mosaics are read-only,
+    so copies of an image share its mosaic and cache.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Raster files readable by rasterio, in priority order
+    grid : Grid
+        Output grid
+    resampling : Resampling, optional
+        Resampling used to warp the sources, by default Resampling.nearest
+    block_size : int, optional
+        Size in pixels of the cached square blocks, by default 512
+    cache : BlockCache, optional
+        Cache of decoded blocks, by default None which uses the process-wide cache
+
+    Attributes
+    ----------
+    band_names : List[str]
+        Bands found in any source, in order of appearance
+    dtype : np.dtype
+        Floating point data type that holds the bands of every source
+    footprints : List[Polygon]
+        Footprint of every source in the grid CRS
+    """
+
+    __tokens = itertools.count()
+
+    def __init__(self, paths : Iterable[str], grid : Grid, resampling : Resampling = Resampling.nearest,
+                 block_size : int = DEFAULT_BLOCK_SIZE, cache : BlockCache = None) -> None:
+        self.paths = list(paths)
+        self.grid = grid
+        self.resampling = resampling
+        self.block_size = block_size
+        self.cache = BLOCK_CACHE if cache is None else cache
+        self.__token = next(self.__tokens)
+
+        self.footprints, self.__bands, dtypes = _headers(self.paths, grid)
+        self.band_names = list(dict.fromkeys(name for bands in self.__bands for name in bands))
+        self.dtype = np.dtype(np.result_type(np.float32, *dtypes))
+        self.__tree = STRtree(self.footprints)
+
+    @classmethod
+    def from_paths(cls, paths : Iterable[str], crs : pyproj.CRS = None, resolution : float = None, **kwargs) -> Self:
+        """
+        Create the mosaic over the union of the source footprints.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Raster files readable by rasterio, in priority order
+        crs : pyproj.CRS, optional
+            CRS of the mosaic, by default None which uses the CRS of the first source
+        resolution : float, optional
+            Pixel size in CRS units, by default None which uses the finest
+            resolution of the sources in the mosaic CRS
+        **kwargs
+            Other options of VirtualMosaic
+
+        Returns
+        -------
+        VirtualMosaic
+            Mosaic on a grid aligned to the resolution
+        """
+
+        paths = list(paths)
+        return cls(paths, Grid.from_files(paths, crs, resolution), **kwargs)
+
+    def sources(self, rows : slice, cols : slice) -> List[int]:
+        """
+        Get the sources that intersect a window of the grid.
+
+        Parameters
+        ----------
+        rows : slice
+            Rows of the window
+        cols : slice
+            Columns of the window
+
+        Returns
+        -------
+        List[int]
+            Indices of the intersecting sources in priority order
+        """
+
+        window = self.grid.window_bounds(rows, cols)
+        return sorted(idx for idx in self.__tree.query(window) if self.footprints[idx].intersection(window).area > 0)
+
+    def read(self, band : str, rows : slice, cols : slice) -> np.ndarray:
+        """
+        Read a window of a band.
+
+        Parameters
+        ----------
+        band : str
+            Band name
+        rows : slice
+            Rows of the window
+        cols : slice
+            Columns of the window
+
+        Returns
+        -------
+        np.ndarray
+            Band values, NaN where no source has data
+        """
+
+        rows = range(*rows.indices(self.grid.height))
+        cols = range(*cols.indices(self.grid.width))
+        if not len(rows) or not len(cols):
+            return np.empty((len(rows), len(cols)), dtype = self.dtype)
+
+        row_start, row_stop = min(rows), max(rows) + 1
+        col_start, col_stop = min(cols), max(cols) + 1
+        out = np.empty((row_stop - row_start, col_stop - col_start), dtype = self.dtype)
+
+        size = self.block_size
+        for block_row in range(row_start // size, -(-row_stop // size)):
+            for block_col in range(col_start // size, -(-col_stop // size)):
+                block = self.cache.get((self.__token, band, block_row, block_col),
+                                       lambda: self.__read_block(band, block_row, block_col))
+
+                top, left = block_row * size, block_col * size
+                out_rows = slice(max(top, row_start), min(top + block.shape[0], row_stop))
+                out_cols = slice(max(left, col_start), min(left + block.shape[1], col_stop))
+                out[out_rows.start - row_start : out_rows.stop - row_start, out_cols.start - col_start : out_cols.stop - col_start] = \
+                    block[out_rows.start - top : out_rows.stop - top, out_cols.start - left : out_cols.stop - left]
+
+        if rows.step == 1 and cols.step == 1:
+            return out
+        return out[np.ix_(np.asarray(rows) - row_start, np.asarray(cols) - col_start)]
+
+    def array(self, band : str) -> indexing.LazilyIndexedArray:
+        """
+        Get a lazy array of a band for xarray.
+
+        Parameters
+        ----------
+        band : str
+            Band name
+
+        Returns
+        -------
+        indexing.LazilyIndexedArray
+            Array that reads only the indexed windows
+        """
+
+        return indexing.LazilyIndexedArray(_MosaicArray(self, band))
+
+    def __read_block(self, band : str, block_row : int, block_col : int) -> np.ndarray:
+        """
+        Read and merge the sources of a block.
+
+        Parameters
+        ----------
+        band : str
+            Band name
+        block_row : int
+            Row of the block
+        block_col : int
+            Column of the block
+
+        Returns
+        -------
+        np.ndarray
+            Block values, NaN where no source has data
+        """
+
+        rows = slice(block_row * self.block_size, min((block_row + 1) * self.block_size, self.grid.height))
+        cols = slice(block_col * self.block_size, min((block_col + 1) * self.block_size, self.grid.width))
+        window = Window(cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start)
+
+        block = np.full((window.height, window.width), np.nan, dtype = self.dtype)
+        for idx in self.sources(rows, cols):
+            if band not in self.__bands[idx]:
+                continue
+
+            values = _read_warped(self.paths[idx], [ self.__bands[idx][band] ], self.grid, window, self.resampling, self.dtype)[0]
+
+            empty = np.isnan(block)
+            block[empty] = values[empty]
+            if not np.isnan(block).any():
+                break
+        return block
+
+    def __deepcopy__(self, memo : dict) -> Self:
+        return self
+
+    def __str__(self) -> str:
+        return f'Sources: {len(self.paths)} | Bands: {self.band_names} | Height: {self.grid.height} | Width: {self.grid.width}'
+
+
+class _MosaicArray(BackendArray):
+    """
+    Lazy xarray backend array of a band of a VirtualMosaic.
+    """
+
+    def __init__(self, mosaic : VirtualMosaic, band : str) -> None:
+        self.mosaic = mosaic
+        self.band = band
+        self.shape = (mosaic.grid.height, mosaic.grid.width)
+        self.dtype = mosaic.dtype
+
+    def __getitem__(self, key : indexing.ExplicitIndexer) -> np.ndarray:
+        return indexing.explicit_indexing_adapter(key, self.shape, indexing.IndexingSupport.BASIC, self.__read)
+
+    def __read(self, key : Tuple[int | slice, int | slice]) -> np.ndarray:
+        rows, cols = (slice(index, index + 1) if isinstance(index, (int, np.integer)) else index for index in key)
+        values = self.mosaic.read(self.band, rows, cols)
+        return values[tuple(0 if isinstance(index, (int, np.integer)) else slice(None) for index in key)]
+
+
+def mosaic(inputs : Iterable[str], out_path : str, grid : Grid = None, rule : str = 'priority',
+           priority : Iterable[float] = None, feather : int = 32, bands : List[str] = None,
+           tile_size : int = DEFAULT_BLOCK_SIZE, workers : int = None, resampling : Resampling = Resampling.nearest,
+           dtype : str = 'float32', compress : str = 'deflate') -> None:
+    """
+    Merge raster files into one GeoTIFF, processing the output grid tile by tile.
+
+    Input footprints are indexed in an STRtree, so every tile only reads and warps
+    the windows of the inputs that overlap it, and memory stays bounded by the
+    tile size times the number of overlapping inputs. Tiles are computed in a
+    process pool and written as they finish.
+
+    Parameters
+    ----------
+    inputs : Iterable[str]
+        Raster files readable by rasterio
+    out_path : str
+        Output GeoTIFF filename
+    grid : Grid, optional
+        Output grid, by default None which covers all the inputs with the CRS of
+        the first one and the finest input resolution
+    rule : str, optional
+        How overlaps are resolved, by default 'priority':
+        - 'priority': the valid value of the input with the lowest priority
+        - 'feather': average of the valid values weighted by their distance in
+          pixels to the edge of the valid data of each input, up to feather
+    priority : Iterable[float], optional
+        Priority of every input where lower values win, such as the RMSE of the
+        ValidationSummary of each scene, or negative timestamps to prefer the
+        latest date, by default None which uses the input order
+    feather : int, optional
+        Distance in pixels over which the 'feather' rule blends inputs, by default 32
+    bands : List[str], optional
+        Bands to merge, by default None which merges every band found in the inputs
+    tile_size : int, optional
+        Size in pixels of the square output tiles, multiple of 16, by default 512
+    workers : int, optional
+        Worker processes, by default None which uses one per CPU. With 1 the tiles
+        are computed in the calling process
+    resampling : Resampling, optional
+        Resampling used to warp the inputs, by default Resampling.nearest
+    dtype : str, optional
+        Floating point output data type, by default 'float32'
+    compress : str, optional
+        GeoTIFF compression, by default 'deflate'
+
+    Raises
+    ------
+    ValueError
+        If the rule is unknown, feather is lower than 1 with the 'feather' rule,
+        tile_size is not a positive multiple of 16 or there is not a priority for
+        every input
+
+    Examples
+    --------
+    >>> grid = Grid.from_files(scenes, resolution = 10)
+    >>> mosaic(scenes, 'bathymetry.tif', grid, priority = [ summary.RMSE for summary in summaries ])
+    """
+
+    if rule not in ('priority', 'feather'):
+        raise ValueError(f'Unknown rule {rule}, must be priority or feather')
+    if rule == 'feather' and feather < 1:
+        raise ValueError('feather must be at least 1 pixel')
+    if tile_size < 16 or tile_size % 16 != 0:
+        raise ValueError(f'tile_size must be a positive multiple of 16, got {tile_size}')
+
+    inputs = list(inputs)
+    if priority is not None:
+        priority = list(priority)
+        if len(priority) != len(inputs):
+            raise ValueError(f'Expected {len(inputs)} priorities, got {len(priority)}')
+        inputs = [ inputs[idx] for idx in np.argsort(priority, kind = 'stable') ]
+
+    grid = Grid.from_files(inputs) if grid is None else grid
+    footprints, input_bands, _ = _headers(inputs, grid)
+    bands = list(dict.fromkeys(name for names in input_bands for name in names)) if bands is None else list(bands)
+    tree = STRtree(footprints)
+
+    def tasks():
+        for row in range(0, grid.height, tile_size):
+            for col in range(0, grid.width, tile_size):
+                rows = slice(row, min(row + tile_size, grid.height))
+                cols = slice(col, min(col + tile_size, grid.width))
+                window = grid.window_bounds(rows, cols)
+                overlapping = sorted(idx for idx in tree.query(window) if footprints[idx].intersection(window).area > 0)
+
+                sources = [ (inputs[idx], [ input_bands[idx].get(band) for band in bands ]) for idx in overlapping ]
+                if sources:
+                    yield sources, bands, grid, rows, cols, rule, feather, resampling, dtype
+
+    profile = {
+        'driver': 'GTiff', 'height': grid.height, 'width': grid.width, 'count': len(bands), 'dtype': np.dtype(dtype).name,
+        'nodata': np.nan, 'crs': grid.crs.to_wkt(), 'transform': grid.transform, 'tiled': True, 'blockxsize': tile_size,
+        'blockysize': tile_size, 'compress': compress, 'predictor': 3, 'bigtiff': 'IF_NEEDED', 'sparse_ok': True,
+    }
+
+    DATASET_POOL.discard(out_path)
+    with rasterio.open(out_path, 'w', **profile) as dst:
+        for idx, band in enumerate(bands, start = 1):
+            dst.set_band_description(idx, band)
+
+        for window, block in _map_tiles(tasks(), workers):
+            dst.write(block, window = window)
+
+def _map_tiles(tasks : Iterable[tuple], workers : int | None) -> Iterator[Tuple[Window, np.ndarray]]:
+    """
+    Compute mosaic tiles in a process pool with a bounded number of tiles in flight.
+
+    Parameters
+    ----------
+    tasks : Iterable[tuple]
+        Arguments of _mosaic_tile
+    workers : int or None
+        Worker processes, None for one per CPU
+
+    Yields
+    ------
+    Tuple[Window, np.ndarray]
+        Window and values of every tile, in completion order
+    """
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1:
+        yield from map(_mosaic_tile, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        pending = set()
+        for task in tasks:
+            pending.add(executor.submit(_mosaic_tile, task))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when = FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+
+        for future in as_completed(pending):
+            yield future.result()
+
+def _mosaic_tile(task : tuple) -> Tuple[Window, np.ndarray]:
+    """
+    Merge the overlapping inputs of an output tile.
+
+    Parameters
+    ----------
+    task : tuple
+        Sources with their band indexes, bands, grid, rows, columns, rule,
+        feather distance, resampling and data type of the tile
+
+    Returns
+    -------
+    Tuple[Window, np.ndarray]
+        Window of the tile and its (bands, rows, columns) values
+    """
+
+    sources, bands, grid, rows, cols, rule, feather, resampling, dtype = task
+    window = Window(cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start)
+    out = np.full((len(bands), window.height, window.width), np.nan, dtype = dtype)
+
+    if rule == 'priority':
+        for path, indexes in sources:
+            wanted = [ idx for idx, index in enumerate(indexes) if index is not None and np.isnan(out[idx]).any() ]
+            if not wanted:
+                continue
+
+            values = _read_warped(path, [ indexes[idx] for idx in wanted ], grid, window, resampling, dtype)
+            for band, band_values in zip(wanted, values):
+                empty = np.isnan(out[band])
+                out[band][empty] = band_values[empty]
+        return window, out
+
+    # Read a halo around the tile so distances to the data edges are not cut at the tile edges
+    top, left = max(rows.start - feather, 0), max(cols.start - feather, 0)
+    bottom, right = min(rows.stop + feather, grid.height), min(cols.stop + feather, grid.width)
+    halo = Window(left, top, right - left, bottom - top)
+    inner = (slice(rows.start - top, rows.stop - top), slice(cols.start - left, cols.stop - left))
+
+    totals = np.zeros_like(out, dtype = np.float64)
+    weights = np.zeros_like(out, dtype = np.float64)
+    for path, indexes in sources:
+        wanted = [ idx for idx, index in enumerate(indexes) if index is not None ]
+        values = _read_warped(path, [ indexes[idx] for idx in wanted ], grid, halo, resampling, dtype)
+
+        for band, band_values in zip(wanted, values):
+            valid = ~np.isnan(band_values)
+            weight = np.full(valid.shape, float(feather)) if valid.all() else \
+                     np.minimum(ndimage.distance_transform_edt(valid), feather)
+            totals[band] += np.where(valid, band_values * weight, 0)[inner]
+            weights[band] += weight[inner]
+
+    np.divide(totals, weights, out = out, where = weights > 0, casting = 'unsafe')
+    return window, out
+
+def _headers(paths : List[str], grid : Grid) -> Tuple[List[Polygon], List[Dict[str, int]], List[str]]:
+    """
+    Read the footprints, bands and data types of raster files.
+
+    Parameters
+    ----------
+    paths : List[str]
+        Raster files readable by rasterio
+    grid : Grid
+        Grid whose CRS is used for the footprints
+
+    Returns
+    -------
+    Tuple[List[Polygon], List[Dict[str, int]], List[str]]
+        Footprint in the grid CRS and band index by name of every file, and the
+        data types of all their bands
+    """
+
+    footprints, bands, dtypes = [], [], []
+    for path in paths:
+        with DATASET_POOL.open(path) as src:
+            footprints.append(box(*transform_bounds(src.crs, grid.crs, *src.bounds, densify_pts = 21)))
+            bands.append(source_band_names(src))
+            dtypes.extend(src.dtypes)
+    return footprints, bands, dtypes
+
+def _read_warped(path : str, indexes : List[int], grid : Grid, window : Window, resampling : Resampling,
+                 dtype : np.dtype) -> np.ndarray:
+    """
+    Read a window of the grid from a raster file warped to the grid.
+
+    Parameters
+    ----------
+    path : str
+        Raster file readable by rasterio
+    indexes : List[int]
+        Bands to read, starting at 1
+    grid : Grid
+        Grid of the window
+    window : Window
+        Window of the grid
+    resampling : Resampling
+        Resampling used to warp the file
+    dtype : np.dtype
+        Floating point output data type
+
+    Returns
+    -------
+    np.ndarray
+        (bands, rows, columns) values, NaN outside the file and on its nodata
+    """
+
+    with DATASET_POOL.open(path) as src, WarpedVRT(src, crs = grid.crs.to_wkt(), transform = grid.transform,
+                                                   width = grid.width, height = grid.height, resampling = resampling,
+                                                   nodata = np.nan, dtype = np.dtype(dtype).name) as vrt:
+        return vrt.read(indexes, window = window)
+
+def source_band_names(src : rasterio.DatasetReader) -> Dict[str, int]:
+    """
+    Get the band names of a raster as GeoTIFFReader names them.
+
+    Parameters
+    ----------
+    src : rasterio.DatasetReader
+        Open raster
+
+    Returns
+    -------
+    Dict[str, int]
+        Band index, starting at 1, by band name
+    """
+
+    names = src.descriptions if not None in src.descriptions else [f'Band {i}' for i in range(1, src.count + 1)]
+    return { name : idx for idx, name in enumerate(names, start = 1) }
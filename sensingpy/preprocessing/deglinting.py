@@ -1,9 +1,411 @@
 import numpy as np
 
-from scipy.stats import mode
+from typing import Any, Dict, Self, Tuple
+from dataclasses import dataclass
 
 
-def hedley(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray) -> np.ndarray:
+DEFAULT_BLOCK_SIZE : int = 1024
+DEFAULT_MODE_BINS : int = 1000
+
+
+def _deep_water_samples(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extract the deep water samples of every band and of the NIR band once.
+    
+    Parameters
+    ----------
+    deep_area_mask : np.ndarray
+        Boolean mask identifying optically deep water areas
+    to_correct : np.ndarray
+        Array of bands with shape (bands, *nir.shape) or sequence of bands
+    nir : np.ndarray
+        Near-infrared band values
+        
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Deep water band values with shape (bands, samples) and NIR values with shape (samples,)
+    """
+
+    deep_area_mask = np.asarray(deep_area_mask)
+    return np.array([ np.asarray(band)[deep_area_mask] for band in to_correct ]), np.asarray(nir)[deep_area_mask]
+
+
+def _glint_statistics(method : str, band_samples : np.ndarray, nir_samples : np.ndarray,
+                      bins : int = DEFAULT_MODE_BINS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the correction slope and the NIR reference of every band at once.
+    
+    Parameters
+    ----------
+    method : str
+        Deglinting method, 'hedley', 'lyzenga' or 'joyce'
+    band_samples : np.ndarray
+        Deep water band values with shape (bands, samples)
+    nir_samples : np.ndarray
+        Deep water NIR values with shape (samples,)
+    bins : int, optional
+        Number of histogram bins used to estimate the NIR mode in Joyce's method,
+        by default 1000
+        
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Slopes and NIR references with shape (bands,)
+    
+    Notes
+    -----
+    Pairs where either the band or the NIR value is NaN are ignored band by band.
+    The least squares slope of Hedley and Joyce, Sxy / Sxx, and the sample
+    covariance of Lyzenga, Sxy / (n - 1), come from the same sums. Band samples are
+    centered in place on a single float64 copy and the NIR samples are centered one
+    band at a time, so no other temporary spans every band.
+    """
+
+    y = np.array(band_samples, dtype = np.float64)
+    nir_samples = np.asarray(nir_samples, dtype = np.float64)
+    is_valid = ~np.isnan(y)
+    is_valid &= ~np.isnan(nir_samples)
+
+    N = is_valid.sum(axis = 1)
+    if np.any(N < 2):
+        raise ValueError('Every band needs at least two valid deep water pixels')
+
+    # Center the band samples in place, invalid pairs are zeroed so they add nothing to Sxy
+    np.copyto(y, 0, where = ~is_valid)
+    y_mean = y.sum(axis = 1) / N
+    y -= y_mean[:, None]
+    np.copyto(y, 0, where = ~is_valid)
+
+    X_mean, Sxy, Sxx, X_min = (np.empty(len(y)) for _ in range(4))
+    for band, (band_valid, band_y) in enumerate(zip(is_valid, y)):
+        X = nir_samples[band_valid]
+        X_mean[band] = X.mean()
+        X_min[band] = X.min()
+        X -= X_mean[band]
+        Sxy[band] = np.dot(X, band_y[band_valid])
+        Sxx[band] = np.dot(X, X)
+
+    if method == 'hedley':
+        return Sxy / Sxx, X_min
+    elif method == 'lyzenga':
+        return Sxy / (N - 1), X_mean
+    elif method == 'joyce':
+        return Sxy / Sxx, _histogram_mode(nir_samples, is_valid, bins)
+    else:
+        raise ValueError(f"Unknown deglinting method: {method}")
+
+
+def _histogram_mode(nir_samples : np.ndarray, is_valid : np.ndarray, bins : int) -> np.ndarray:
+    """
+    Estimate the mode of the valid NIR samples of every band with a histogram.
+    
+    Parameters
+    ----------
+    nir_samples : np.ndarray
+        Deep water NIR values with shape (samples,)
+    is_valid : np.ndarray
+        Valid samples of every band with shape (bands, samples)
+    bins : int
+        Number of histogram bins
+        
+    Returns
+    -------
+    np.ndarray
+        Center of the most populated bin of every band
+    """
+
+    valid_nir = nir_samples[is_valid.any(axis = 0)]
+    vmin, vmax = valid_nir.min(), valid_nir.max()
+    width = (vmax - vmin) / bins if vmax > vmin else 1.
+
+    # Bins are only computed for valid samples, NaN NIR values cannot be cast to bins
+    band_indexes, sample_indexes = np.nonzero(is_valid)
+    indexes = np.clip(((nir_samples[sample_indexes] - vmin) / width).astype(np.int64, copy = False), 0, bins - 1)
+    counts = np.bincount(band_indexes * bins + indexes, minlength = len(is_valid) * bins)
+
+    return vmin + (counts.reshape(-1, bins).argmax(axis = 1) + 0.5) * width
+
+
+def _apply_correction(to_correct : np.ndarray, nir : np.ndarray, slopes : np.ndarray, references : np.ndarray,
+                      block_size : int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+    """
+    Subtract the glint of every band in place, block by block.
+    
+    Parameters
+    ----------
+    to_correct : np.ndarray
+        Array of bands with shape (bands, *nir.shape) or sequence of bands
+    nir : np.ndarray
+        Near-infrared band values
+    slopes : np.ndarray
+        Correction slope of every band
+    references : np.ndarray
+        NIR reference of every band
+    block_size : int, optional
+        Number of rows corrected at once, by default 1024
+        
+    Returns
+    -------
+    np.ndarray
+        Corrected bands. It is to_correct itself when it has a floating point dtype,
+        otherwise a float32 copy.
+    
+    Notes
+    -----
+    The correction band = band - slope * (nir - reference) is computed in the dtype of
+    the bands (float32 for integer inputs), so temporaries never exceed one block of
+    rows for all bands. Values < 0 after correction are set to NaN.
+    """
+
+    to_correct = np.asarray(to_correct)
+    nir = np.asarray(nir)
+    if not np.issubdtype(to_correct.dtype, np.floating):
+        to_correct = to_correct.astype(np.float32)
+
+    dtype = to_correct.dtype
+    slopes = np.asarray(slopes, dtype = dtype).reshape((-1,) + (1,) * nir.ndim)
+    references = np.asarray(references, dtype = dtype).reshape((-1,) + (1,) * nir.ndim)
+
+    for start in range(0, nir.shape[0], block_size):
+        block = to_correct[:, start : start + block_size]
+        glint = np.subtract(nir[start : start + block_size].astype(dtype, copy = False), references)
+        glint *= slopes
+        block -= glint
+        np.copyto(block, np.nan, where = block < 0)
+
+    return to_correct
+
+
+@dataclass
+class GlintModel():
+    """
+    Fitted sun glint correction coefficients.
+    
+    The model is the result of the fit step of deglinting and applies the
+    correction band = band - slope * (nir - reference) as a pure per-pixel
+    transform, so the same coefficients can be reused over every tile of an
+    acquisition.
+    
+    Parameters
+    ----------
+    method : str
+        Deglinting method used to fit the model, 'hedley', 'lyzenga' or 'joyce'
+    slopes : np.ndarray
+        Correction slope of every band
+    references : np.ndarray
+        NIR reference of every band
+    """
+
+    method : str
+    slopes : np.ndarray
+    references : np.ndarray
+
+    def apply(self, to_correct : np.ndarray, nir : np.ndarray, out : np.ndarray = None,
+              block_size : int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+        """
+        Apply the glint correction to a stack of bands.
+        
+        Parameters
+        ----------
+        to_correct : np.ndarray
+            Array of bands with shape (bands, *nir.shape), e.g. one tile
+        nir : np.ndarray
+            Near-infrared band values of the same pixels
+        out : np.ndarray, optional
+            Floating point array where the result is written, it may be
+            to_correct itself to correct in place, by default None which
+            allocates a new array
+        block_size : int, optional
+            Number of rows corrected at once, by default 1024
+            
+        Returns
+        -------
+        np.ndarray
+            Array of bands with sun glint correction applied
+        
+        Notes
+        -----
+        Inputs that are not numpy arrays but implement the numpy array function
+        protocol, such as dask arrays, are transformed lazily with elementwise
+        operations instead of block by block.
+        """
+
+        if not isinstance(to_correct, np.ndarray) and hasattr(to_correct, '__array_function__'):
+            shape = (-1,) + (1,) * np.ndim(nir)
+            corrected = to_correct - np.reshape(self.slopes, shape) * (nir - np.reshape(self.references, shape))
+            return np.where(corrected < 0, np.nan, corrected)
+
+        if out is None:
+            dtype = to_correct.dtype if np.issubdtype(to_correct.dtype, np.floating) else np.float32
+            out = np.array(to_correct, dtype = dtype)
+        elif out is not to_correct:
+            np.copyto(out, to_correct)
+
+        return _apply_correction(out, nir, self.slopes, self.references, block_size)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the coefficients to JSON compatible types.
+        
+        Returns
+        -------
+        Dict[str, Any]
+            Dictionary with method, slopes and references
+        """
+
+        return { 'method' : self.method, 'slopes' : np.asarray(self.slopes).tolist(),
+                 'references' : np.asarray(self.references).tolist() }
+
+    @classmethod
+    def from_dict(cls, values : Dict[str, Any]) -> Self:
+        """
+        Build a model from the output of to_dict.
+        
+        Parameters
+        ----------
+        values : Dict[str, Any]
+            Dictionary with method, slopes and references
+            
+        Returns
+        -------
+        GlintModel
+            Model with the given coefficients
+        """
+
+        return cls(values['method'], np.asarray(values['slopes'], dtype = np.float64),
+                   np.asarray(values['references'], dtype = np.float64))
+
+
+def fit(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray, method : str = 'hedley',
+        sample_size : int = None, seed : int = None, block_shape : Tuple[int, int] = (512, 512),
+        block_fraction : float = 1., bins : int = DEFAULT_MODE_BINS) -> GlintModel:
+    """
+    Fit the glint correction coefficients of a stack of bands.
+    
+    Parameters
+    ----------
+    deep_area_mask : np.ndarray
+        Boolean 2D mask identifying optically deep water areas to use for correction
+    to_correct : np.ndarray
+        Array of bands with shape (bands, height, width) or sequence of 2D bands.
+        Any array that supports slicing, such as netCDF variables, memory maps or
+        xarray DataArrays, can be used and only the sampled blocks are read.
+    nir : np.ndarray
+        Near-infrared band values with shape (height, width)
+    method : str, optional
+        Deglinting method, 'hedley', 'lyzenga' or 'joyce', by default 'hedley'
+    sample_size : int, optional
+        Number of deep water pixels to fit on, by default None which uses
+        every deep water pixel of the sampled blocks
+    seed : int, optional
+        Seed of the random generator, by default None
+    block_shape : Tuple[int, int], optional
+        Shape of the blocks used as strata, by default (512, 512)
+    block_fraction : float, optional
+        Fraction of blocks to read, chosen at random, by default 1 which reads
+        every block
+    bins : int, optional
+        Number of histogram bins used to estimate the NIR mode in Joyce's method,
+        by default 1000
+        
+    Returns
+    -------
+    GlintModel
+        Fitted coefficients of every band
+    
+    Notes
+    -----
+    The sample is stratified by blocks: each sampled block contributes a number
+    of pixels proportional to its deep water pixel count, so the fit covers the
+    whole scene evenly. Samples only depend on the inputs and the seed.
+    
+    Examples
+    --------
+    >>> model = deglinting.fit(deep, bands, nir, 'hedley', sample_size = 100_000, seed = 0)
+    >>> with open('glint.json', 'w') as file:
+    ...     json.dump(model.to_dict(), file)
+    >>> corrected = model.apply(tile_bands, tile_nir)
+    """
+
+    if sample_size is None and block_fraction >= 1:
+        band_samples, nir_samples = _deep_water_samples(deep_area_mask, to_correct, nir)
+    else:
+        band_samples, nir_samples = _stratified_samples(deep_area_mask, to_correct, nir, sample_size, seed,
+                                                        block_shape, block_fraction)
+
+    slopes, references = _glint_statistics(method, band_samples, nir_samples, bins)
+    return GlintModel(method, slopes, references)
+
+
+def _stratified_samples(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray, sample_size : int | None,
+                        seed : int | None, block_shape : Tuple[int, int], block_fraction : float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw a block stratified random sample of deep water pixels.
+    
+    Parameters
+    ----------
+    deep_area_mask : np.ndarray
+        Boolean 2D mask identifying optically deep water areas
+    to_correct : np.ndarray
+        Array of bands with shape (bands, height, width) or sequence of 2D bands
+    nir : np.ndarray
+        Near-infrared band values with shape (height, width)
+    sample_size : int or None
+        Number of pixels to draw, None to keep every deep water pixel of the sampled blocks
+    seed : int or None
+        Seed of the random generator
+    block_shape : Tuple[int, int]
+        Shape of the blocks used as strata
+    block_fraction : float
+        Fraction of blocks to read
+        
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Sampled band values with shape (bands, samples) and NIR values with shape (samples,)
+    """
+
+    rng = np.random.default_rng(seed)
+    height, width = nir.shape
+    rows, cols = block_shape
+    blocks = [ (slice(row, row + rows), slice(col, col + cols))
+               for row in range(0, height, rows) for col in range(0, width, cols) ]
+
+    if block_fraction < 1:
+        chosen = rng.choice(len(blocks), max(1, round(block_fraction * len(blocks))), replace = False)
+        blocks = [ blocks[idx] for idx in np.sort(chosen) ]
+
+    counts = np.array([ np.count_nonzero(deep_area_mask[block]) for block in blocks ])
+    total = counts.sum()
+    if total == 0:
+        raise ValueError('There are no deep water pixels in the sampled blocks')
+
+    if sample_size is None or sample_size >= total:
+        sizes = counts
+    else:
+        quotas = counts * sample_size / total
+        sizes = np.floor(quotas).astype(np.int64)
+        remainder = np.argsort(sizes - quotas, kind = 'stable')[: sample_size - sizes.sum()]
+        sizes[remainder] += 1
+
+    band_samples, nir_samples = [], []
+    for block, count, size in zip(blocks, counts, sizes):
+        if size == 0:
+            continue
+
+        positions = np.flatnonzero(np.asarray(deep_area_mask[block]))
+        if size < count:
+            positions = np.sort(rng.choice(positions, size, replace = False))
+
+        band_samples.append(np.array([ np.asarray(band[block]).ravel()[positions] for band in to_correct ]))
+        nir_samples.append(np.asarray(nir[block]).ravel()[positions])
+
+    return np.concatenate(band_samples, axis = 1), np.concatenate(nir_samples)
+
+
+def hedley(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray,
+           block_size : int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
     """
     Hedley method for deglinting.
     
@@ -19,11 +421,13 @@ def hedley(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarra
         Array of bands to correct for sun glint
     nir : np.ndarray
         Near-infrared band values used as the glint predictor
+    block_size : int, optional
+        Number of rows corrected at once, by default 1024
         
     Returns
     -------
     np.ndarray
-        Array of bands with sun glint correction applied
+        Array of bands with sun glint correction applied, in place for floating point inputs
     
     Notes
     -----
@@ -39,19 +443,12 @@ def hedley(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarra
     https://doi.org/10.1080/01431160500034086
     """
 
-    for idx in range(len(to_correct)):
-        deep_value = to_correct[idx][deep_area_mask]
-        deep_nir = nir[deep_area_mask]
-        is_valid = ~np.isnan(deep_value) & ~np.isnan(deep_nir)
-
-        m = np.polyfit(deep_nir[is_valid].ravel(), deep_value[is_valid].ravel(), 1)[0]
-        to_correct[idx] = to_correct[idx] - m * (nir - np.nanmin(deep_nir[is_valid]))
-        to_correct[idx][to_correct[idx] < 0] = np.nan
-    
-    return to_correct
+    model = fit(deep_area_mask, to_correct, nir, 'hedley')
+    return _apply_correction(to_correct, nir, model.slopes, model.references, block_size)
 
 
-def lyzenga(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray) -> np.ndarray:
+def lyzenga(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray,
+            block_size : int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
     """
     Lyzenga method for deglinting.
     
@@ -67,11 +464,13 @@ def lyzenga(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarr
         Array of bands to correct for sun glint
     nir : np.ndarray
         Near-infrared band values used as the glint predictor
+    block_size : int, optional
+        Number of rows corrected at once, by default 1024
         
     Returns
     -------
     np.ndarray
-        Array of bands with sun glint correction applied
+        Array of bands with sun glint correction applied, in place for floating point inputs
     
     Notes
     -----
@@ -88,19 +487,12 @@ def lyzenga(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarr
     https://doi.org/10.1109/TGRS.2006.872909
     """
 
-    for idx in range(len(to_correct)):
-        deep_value = to_correct[idx][deep_area_mask]
-        deep_nir = nir[deep_area_mask]
-        is_valid = ~np.isnan(deep_value) & ~np.isnan(deep_nir)
-
-        m = np.cov(deep_nir[is_valid].ravel(), deep_value[is_valid].ravel())[0, 1]
-        to_correct[idx] = to_correct[idx] - m * (nir - np.nanmean(deep_nir[is_valid]))
-        to_correct[idx][to_correct[idx] < 0] = np.nan
-    
-    return to_correct
+    model = fit(deep_area_mask, to_correct, nir, 'lyzenga')
+    return _apply_correction(to_correct, nir, model.slopes, model.references, block_size)
 
 
-def joyce(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray) -> np.ndarray:
+def joyce(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray,
+          block_size : int = DEFAULT_BLOCK_SIZE, bins : int = DEFAULT_MODE_BINS) -> np.ndarray:
     """
     Joyce method for deglinting.
     
@@ -116,18 +508,23 @@ def joyce(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray
         Array of bands to correct for sun glint
     nir : np.ndarray
         Near-infrared band values used as the glint predictor
+    block_size : int, optional
+        Number of rows corrected at once, by default 1024
+    bins : int, optional
+        Number of histogram bins used to estimate the NIR mode, by default 1000
         
     Returns
     -------
     np.ndarray
-        Array of bands with sun glint correction applied
+        Array of bands with sun glint correction applied, in place for floating point inputs
     
     Notes
     -----
     The algorithm uses the slope of the linear regression between each visible 
     band and the NIR band over deep water, similar to Hedley's method. However,
     it uses the mode of NIR values as the reference point rather than the minimum.
-    Values < 0 after correction are set to NaN.
+    The mode is the center of the most populated bin of a histogram of the deep
+    water NIR values. Values < 0 after correction are set to NaN.
     
     References
     ----------
@@ -140,13 +537,5 @@ def joyce(deep_area_mask : np.ndarray, to_correct : np.ndarray, nir : np.ndarray
     https://doi.org/10.3390/rs1040697
     """
 
-    for idx in range(len(to_correct)):
-        deep_value = to_correct[idx][deep_area_mask]
-        deep_nir = nir[deep_area_mask]
-        is_valid = ~np.isnan(deep_value) & ~np.isnan(deep_nir)
-
-        m = np.polyfit(deep_nir[is_valid].ravel(), deep_value[is_valid].ravel(), 1)[0]
-        to_correct[idx] = to_correct[idx] - m * (nir - mode(deep_nir[is_valid].ravel()).mode)
-        to_correct[idx][to_correct[idx] < 0] = np.nan
-    
-    return to_correct
\ No newline at end of file
+    model = fit(deep_area_mask, to_correct, nir, 'joyce', bins = bins)
+    return _apply_correction(to_correct, nir, model.slopes, model.references, block_size)
\ No newline at end of file
@@ -1,64 +1,698 @@
+import os
 import numpy as np
 
-from scipy.stats import zscore
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from fractions import Fraction
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Callable, Iterable, Iterator, List, Self, Tuple
 
+from sensingpy.sketch import ExactSum, QuantileSketch
 
-def IQR(data : np.ndarray, distance : float = 1.5) -> np.ndarray:
+
+DEFAULT_BLOCK_SIZE = 1024
+DEFAULT_RELATIVE_ACCURACY = 0.001
+DEFAULT_WINDOW_MEMORY = 64 * 2**20
+
+
+def _mask_outside(data : np.ndarray, lower : np.ndarray | float | None, upper : np.ndarray | float | None,
+                  inplace : bool = False) -> np.ndarray:
+    """Masks as NaN the values lower or equal than lower or greater or equal than upper.
+
+    Args:
+        data (np.ndarray): array to be masked.
+        lower (np.ndarray | float | None): lower limits broadcastable to data, None to skip.
+        upper (np.ndarray | float | None): upper limits broadcastable to data, None to skip.
+        inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
+
+    Returns:
+        np.ndarray: array with outliers masked as NaN.
+    """
+
+    condition = np.zeros(data.shape, dtype = bool)
+    if lower is not None:
+        np.less_equal(data, lower, out = condition)
+    if upper is not None:
+        condition |= data >= upper
+
+    if inplace:
+        if not np.issubdtype(data.dtype, np.floating):
+            raise ValueError('inplace masking requires a floating point array')
+        np.copyto(data, np.nan, where = condition)
+        return data
+
+    return np.where(condition, np.nan, data)
+
+def _group_codes(groups : np.ndarray, shape : Tuple[int, ...]) -> Tuple[np.ndarray, int]:
+    """Converts group labels into consecutive codes, NaN labels get the code -1.
+
+    Args:
+        groups (np.ndarray): group label of each value.
+        shape (Tuple[int, ...]): shape of the data.
+
+    Returns:
+        Tuple[np.ndarray, int]: flat codes and number of groups.
+    """
+
+    groups = np.asarray(groups)
+    if groups.shape != shape:
+        raise ValueError('groups must have the same shape as data')
+
+    labels, codes = np.unique(groups.ravel(), return_inverse = True)
+    if labels.dtype.kind == 'f' and len(labels) and np.isnan(labels[-1]):
+        codes[codes == len(labels) - 1] = -1
+        labels = labels[:-1]
+
+    return codes, len(labels)
+
+def _grouped_percentiles(values : np.ndarray, codes : np.ndarray, n_groups : int, percentiles : Iterable[float]) -> List[np.ndarray]:
+    """Linearly interpolated percentiles of every group with a single sort, as np.nanpercentile.
+
+    Args:
+        values (np.ndarray): flat values.
+        codes (np.ndarray): flat group codes, negative codes are ignored.
+        n_groups (int): number of groups.
+        percentiles (Iterable[float]): percentiles between 0 and 100.
+
+    Returns:
+        List[np.ndarray]: for each percentile, its value in every group (NaN for empty groups).
+    """
+
+    is_valid = ~np.isnan(values) & (codes >= 0)
+    values, codes = values[is_valid], codes[is_valid]
+
+    values = values[np.lexsort((values, codes))]
+    counts = np.bincount(codes, minlength = n_groups)
+    starts = np.cumsum(counts) - counts
+    filled = counts > 0
+
+    result = []
+    for percentile in percentiles:
+        position = percentile / 100 * (counts[filled] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts[filled] - 1)
+
+        low_values = values[starts[filled] + lower]
+        high_values = values[starts[filled] + upper]
+
+        limits = np.full(n_groups, np.nan)
+        limits[filled] = low_values + (high_values - low_values) * (position - lower)
+        result.append(limits)
+
+    return result
+
+def _percentiles(data : np.ndarray, percentiles : List[float], axis : int | Tuple[int, ...] | None,
+                 groups : np.ndarray | None) -> List[np.ndarray]:
+    """Computes all the required percentiles with a single partition or sort.
+
+    Args:
+        data (np.ndarray): array of values.
+        percentiles (List[float]): percentiles between 0 and 100.
+        axis (int | Tuple[int, ...] | None): axis along which percentiles are computed.
+        groups (np.ndarray | None): group label of each value.
+
+    Returns:
+        List[np.ndarray]: limits broadcastable to data, one per percentile.
+    """
+
+    if groups is None:
+        return list(np.nanpercentile(data, percentiles, axis = axis, keepdims = True))
+
+    codes, n_groups = _group_codes(groups, data.shape)
+    limits = _grouped_percentiles(np.asarray(data, dtype = np.float64).ravel(), codes, n_groups, percentiles)
+    return [ np.append(limit, np.nan)[codes].reshape(data.shape) for limit in limits ]
+
+def _moments(data : np.ndarray, axis : int | Tuple[int, ...] | None, groups : np.ndarray | None) -> Tuple[np.ndarray, np.ndarray]:
+    """NaN-aware mean and population standard deviation sharing the valid count and the mean.
+
+    Args:
+        data (np.ndarray): array of values.
+        axis (int | Tuple[int, ...] | None): axis along which moments are computed.
+        groups (np.ndarray | None): group label of each value.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: mean and std broadcastable to data.
+    """
+
+    if groups is None:
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            count = np.sum(~np.isnan(data), axis = axis, keepdims = True)
+            mean = np.nansum(data, axis = axis, keepdims = True, dtype = np.float64) / count
+            deviation = np.subtract(data, mean, dtype = np.float64)
+            std = np.sqrt(np.nansum(deviation * deviation, axis = axis, keepdims = True) / count)
+        return mean, std
+
+    codes, n_groups = _group_codes(groups, data.shape)
+    values = np.asarray(data, dtype = np.float64).ravel()
+    is_valid = ~np.isnan(values) & (codes >= 0)
+    values, valid_codes = values[is_valid], codes[is_valid]
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        count = np.bincount(valid_codes, minlength = n_groups)
+        mean = np.bincount(valid_codes, weights = values, minlength = n_groups) / count
+        deviation = values - mean[valid_codes]
+        std = np.sqrt(np.bincount(valid_codes, weights = deviation * deviation, minlength = n_groups) / count)
+
+    mean, std = np.append(mean, np.nan)[codes], np.append(std, np.nan)[codes]
+    return mean.reshape(data.shape), std.reshape(data.shape)
+
+
+def IQR(data : np.ndarray, distance : float = 1.5, axis : int | Tuple[int, ...] = None, groups : np.ndarray = None,
+        inplace : bool = False) -> np.ndarray:
     """Interquartile Range (IQR) method for outlier masking.
 
     Args:
         data (np.ndarray): array to be masked.
         distance (float, optional): distance to consider a value an outlier. Defaults to 1.5.
+        axis (int | Tuple[int, ...], optional): axis along which quartiles are computed,
+            e.g. (1, 2) filters each band of a stack independently. Defaults to None, the whole array.
+        groups (np.ndarray, optional): label of each value, e.g. its depth bin, to compute
+            quartiles per group. NaN labels are never masked. Defaults to None.
+        inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
 
     Returns:
         np.ndarray: array with outliers masked as NaN.
     """
 
-    Q1 = np.nanpercentile(data.reshape(-1), 25)
-    Q3 = np.nanpercentile(data.reshape(-1), 75)
+    Q1, Q3 = _percentiles(data, [25, 75], axis, groups)
     outlier_distance = distance * (Q3 - Q1)
 
-    return np.where( (data <= (Q1 - outlier_distance)) | (data >= (Q3 + outlier_distance)), np.nan, data)
+    return _mask_outside(data, Q1 - outlier_distance, Q3 + outlier_distance, inplace)
 
-def Z_Score(data : np.ndarray) -> np.ndarray:
-    """Z-Score method for outlier masking.
+def Z_Score(data : np.ndarray, threshold : float = 3, axis : int | Tuple[int, ...] = None, groups : np.ndarray = None,
+            inplace : bool = False) -> np.ndarray:
+    """Z-Score method for outlier masking, NaN values are ignored in the mean and std.
 
     Args:
         data (np.ndarray): array to be masked.
+        threshold (float, optional): absolute z-score to consider a value an outlier. Defaults to 3.
+        axis (int | Tuple[int, ...], optional): axis along which mean and std are computed. Defaults to None, the whole array.
+        groups (np.ndarray, optional): label of each value to compute mean and std per group. Defaults to None.
+        inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
 
     Returns:
         np.ndarray: array with outliers masked as NaN.
     """
 
-    z_scores = np.abs(zscore(data))
+    mean, std = _moments(data, axis, groups)
+    std = np.where(std > 0, std, np.inf)
 
-    return np.where(z_scores >= 3, np.nan, data)
+    return _mask_outside(data, mean - threshold * std, mean + threshold * std, inplace)
 
-def upper_percentile(data : np.ndarray, percentile : float) -> np.ndarray:
+def upper_percentile(data : np.ndarray, percentile : float, axis : int | Tuple[int, ...] = None, groups : np.ndarray = None,
+                     inplace : bool = False) -> np.ndarray:
     """Masks values above a certain percentile.
 
     Args:
         data (np.ndarray): array to be masked.
         percentile (float): limit for upper percentile.
+        axis (int | Tuple[int, ...], optional): axis along which the percentile is computed. Defaults to None, the whole array.
+        groups (np.ndarray, optional): label of each value to compute the percentile per group. Defaults to None.
+        inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
 
     Returns:
         np.ndarray: array with outliers masked as NaN.
     """
 
-    limit = np.nanpercentile(data.reshape(-1), percentile)
-    return np.where( data >= limit, np.nan, data)
+    limit, = _percentiles(data, [percentile], axis, groups)
+    return _mask_outside(data, None, limit, inplace)
 
-def lower_percentile(data : np.ndarray, percentile : float) -> np.ndarray:
+def lower_percentile(data : np.ndarray, percentile : float, axis : int | Tuple[int, ...] = None, groups : np.ndarray = None,
+                     inplace : bool = False) -> np.ndarray:
     """Masks values below a certain percentile.
 
     Args:
         data (np.ndarray): array to be masked.
         percentile (float): limit for lower percentile.
+        axis (int | Tuple[int, ...], optional): axis along which the percentile is computed. Defaults to None, the whole array.
+        groups (np.ndarray, optional): label of each value to compute the percentile per group. Defaults to None.
+        inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
+
+    Returns:
+        np.ndarray: array with outliers masked as NaN.
+    """
+
+    limit, = _percentiles(data, [percentile], axis, groups)
+    return _mask_outside(data, limit, None, inplace)
+
+
+def _window_shape(window : int | Tuple[int, int]) -> Tuple[int, int]:
+    """Validates a moving window size.
+
+    Args:
+        window (int | Tuple[int, int]): odd window size, or odd rows and columns.
+
+    Returns:
+        Tuple[int, int]: rows and columns of the window.
+    """
+
+    rows, cols = (window, window) if np.isscalar(window) else window
+    if rows < 1 or cols < 1 or rows % 2 == 0 or cols % 2 == 0:
+        raise ValueError('window sizes must be odd positive integers')
+
+    return int(rows), int(cols)
+
+def _moving_filter(data : np.ndarray, window : int | Tuple[int, int], inplace : bool, block_size : int | None,
+                   values_per_pixel : int, outliers : Callable[[np.ndarray, int, int], np.ndarray],
+                   workers : int | None = 1) -> np.ndarray:
+    """Applies a moving window outlier test over the last two axes, block_size rows at a time.
+
+    Every block is read with a halo of half a window, padded with NaN at the array borders,
+    and masked only once the next block has been read, so all windows see the original values.
+    Blocks are tested by a pool of threads, numpy releases the GIL while sorting and reducing them.
+
+    Args:
+        data (np.ndarray): array of at least two dimensions to be masked.
+        window (int | Tuple[int, int]): odd window size, or odd rows and columns.
+        inplace (bool): write NaNs into data instead of returning a new array.
+        block_size (int | None): rows processed at once, None to fit DEFAULT_WINDOW_MEMORY per worker.
+        values_per_pixel (int): float64 temporaries per pixel of a block, used to size the blocks.
+        outliers (Callable[[np.ndarray, int, int], np.ndarray]): test receiving a NaN padded block
+            and the window shape, returning the outlier condition of the unpadded block.
+        workers (int | None, optional): threads testing blocks, None for one per CPU. Defaults to 1.
+
+    Returns:
+        np.ndarray: array with outliers masked as NaN.
+    """
+
+    rows, cols = _window_shape(window)
+    half_rows, half_cols = rows // 2, cols // 2
+    workers = (os.cpu_count() or 1) if workers is None else max(workers, 1)
+
+    if data.ndim < 2:
+        raise ValueError('moving window filters require at least two dimensions')
+    if inplace:
+        if not np.issubdtype(data.dtype, np.floating):
+            raise ValueError('inplace masking requires a floating point array')
+        result = data
+    else:
+        result = np.array(data, dtype = np.result_type(data.dtype, np.float32))
+
+    height, width = result.shape[-2:]
+    if block_size is None:
+        block_size = DEFAULT_WINDOW_MEMORY // (8 * values_per_pixel * (width + 2 * half_cols))
+    block_size = max(block_size, half_rows, 1)
+
+    def condition(plane : np.ndarray, start : int, stop : int) -> np.ndarray:
+        top, bottom = max(start - half_rows, 0), min(stop + half_rows, height)
+
+        padded = np.full((stop - start + 2 * half_rows, width + 2 * half_cols), np.nan)
+        offset = half_rows - (start - top)
+        padded[offset : offset + bottom - top, half_cols : half_cols + width] = plane[top : bottom]
+        return outliers(padded, rows, cols)
+
+    def conditions(plane : np.ndarray, executor : ThreadPoolExecutor | None) -> Iterator[Tuple[int, int, np.ndarray]]:
+        blocks = [ (start, min(start + block_size, height)) for start in range(0, height, block_size) ]
+        if executor is None:
+            yield from ((start, stop, condition(plane, start, stop)) for start, stop in blocks)
+            return
+
+        # Blocks are at least half a window high, so the blocks being read never overlap
+        # a block that is masked: it is only masked once the next block has been read
+        futures = deque()
+        for start, stop in blocks:
+            futures.append((start, stop, executor.submit(condition, plane, start, stop)))
+            if len(futures) > workers:
+                start, stop, future = futures.popleft()
+                yield start, stop, future.result()
+        while futures:
+            start, stop, future = futures.popleft()
+            yield start, stop, future.result()
+
+    with ThreadPoolExecutor(max_workers = workers) if workers > 1 else nullcontext() as executor:
+        for index in np.ndindex(result.shape[:-2]):
+            plane = result[index]
+            pending = None
+
+            for start, stop, block_condition in conditions(plane, executor):
+                if pending is not None:
+                    np.copyto(plane[pending[0] : pending[1]], np.nan, where = pending[2])
+                pending = (start, stop, block_condition)
+
+            if pending is not None:
+                np.copyto(plane[pending[0] : pending[1]], np.nan, where = pending[2])
+
+    return result
+
+def _sorted_median(values : np.ndarray, offsets : np.ndarray, count : np.ndarray) -> np.ndarray:
+    """Median of the first count values of every sorted window, NaN for empty windows.
+
+    Args:
+        values (np.ndarray): contiguous windows sorted along the last axis.
+        offsets (np.ndarray): flat offset of every window in values.
+        count (np.ndarray): number of valid values of every window.
+
+    Returns:
+        np.ndarray: float64 median of every window.
+    """
+
+    median = np.add(values.take(offsets + (count - 1) // 2, mode = 'clip'), values.take(offsets + count // 2, mode = 'clip'),
+                    dtype = np.float64)
+    median *= 0.5
+    median[count == 0] = np.nan
+    return median
+
+def _sorted_deviation(values : np.ndarray, offsets : np.ndarray, count : np.ndarray, median : np.ndarray,
+                      rank : np.ndarray) -> np.ndarray:
+    """rank-th smallest absolute deviation from the median of the first count values of every sorted window.
+
+    The rank + 1 values closest to the median are consecutive once sorted, so the deviation is the
+    smallest spread max(median - values[j], values[j + rank] - median) over j. The first term shrinks
+    and the second one grows with j, so the smallest spread is where they cross, which is found with
+    a binary search in log(count) steps instead of sorting the deviations.
+
+    Args:
+        values (np.ndarray): contiguous windows sorted along the last axis.
+        offsets (np.ndarray): flat offset of every window in values.
+        count (np.ndarray): number of valid values of every window.
+        median (np.ndarray): median of every window.
+        rank (np.ndarray): rank of the deviation in every window, lower than count.
+
+    Returns:
+        np.ndarray: float64 deviation of every window.
+    """
+
+    # Number of starts j where the distance below the median is still the larger one, found with halving steps
+    last = count - rank
+    start = np.zeros_like(count)
+    step = 1 << int(np.max(last, initial = 0)).bit_length()
+    while step := step >> 1:
+        candidate = start + step
+        position = offsets + candidate - 1
+        above = np.subtract(median, values.take(position, mode = 'clip'), dtype = np.float64) > \
+                np.subtract(values.take(position + rank, mode = 'clip'), median, dtype = np.float64)
+        above &= candidate <= last
+        np.add(start, step, out = start, where = above)
+
+    after = np.where(start < last, values.take(offsets + start + rank, mode = 'clip') - median, np.inf)
+    before = np.where(start > 0, median - values.take(offsets + start - 1, mode = 'clip'), np.inf)
+    return np.minimum(after, before)
+
+def _sorted_mad(values : np.ndarray, offsets : np.ndarray, count : np.ndarray, median : np.ndarray) -> np.ndarray:
+    """Median absolute deviation from the median of the first count values of every sorted window, see _sorted_deviation."""
+
+    with np.errstate(invalid = 'ignore'):
+        mad = _sorted_deviation(values, offsets, count, median, (count - 1) // 2)
+
+        # Even counts average the two middle deviations
+        even = np.flatnonzero(count % 2 == 0)
+        if even.size:
+            even_count = count.ravel()[even]
+            following = _sorted_deviation(values, offsets.ravel()[even], even_count, median.ravel()[even], even_count // 2)
+            mad.ravel()[even] = 0.5 * (mad.ravel()[even] + following)
+
+    mad[count == 0] = np.nan
+    return mad
+
+def _window_sums(values : np.ndarray, rows : int, cols : int) -> np.ndarray:
+    """Moving window sums of a padded block with a summed-area table."""
+
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    np.cumsum(values, axis = 0, out = table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis = 1, out = table[1:, 1:])
+
+    return table[rows:, cols:] - table[:-rows, cols:] - table[rows:, :-cols] + table[:-rows, :-cols]
+
+def hampel(data : np.ndarray, window : int | Tuple[int, int] = 3, n_sigmas : float = 3, inplace : bool = False,
+           block_size : int = None, workers : int = None) -> np.ndarray:
+    """Hampel filter, masks values far from the median of their moving window.
+
+    A value is an outlier when its distance to the window median is greater than
+    n_sigmas times the scaled median absolute deviation (1.4826 * MAD) of the window.
+    NaN values are ignored inside every window, and windows are computed over the last two
+    axes, so a band stack is filtered band by band.
+
+    Every window is sorted once to find its median, and its MAD is found from the sorted window
+    with a binary search, in log(window area) steps. Copying and sorting the windows still grows
+    with the window area: on one core a 10980 x 10980 float32 band with 2% of NaNs takes about
+    40 s with a 3x3 window, 50 s with a 5x5 window and 85 s with a 9x9 window. Blocks of rows are
+    spread over workers threads, which divides that time by the number of cores. moving_zscore is
+    much faster and does not depend on the window size.
+
+    Args:
+        data (np.ndarray): array to be masked, with at least two dimensions.
+        window (int | Tuple[int, int], optional): odd window size, or odd rows and columns. Defaults to 3.
+        n_sigmas (float, optional): number of scaled MADs to consider a value an outlier. Defaults to 3.
+        inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
+        block_size (int, optional): rows processed at once. Defaults to None, which keeps the window
+            temporaries around 64 MB per worker.
+        workers (int, optional): threads filtering blocks of rows. Defaults to None, one per CPU.
 
     Returns:
         np.ndarray: array with outliers masked as NaN.
     """
 
-    limit = np.nanpercentile(data.reshape(-1), percentile)
+    def outliers(padded : np.ndarray, rows : int, cols : int) -> np.ndarray:
+        center = padded[rows // 2 : padded.shape[0] - rows // 2, cols // 2 : padded.shape[1] - cols // 2]
+        count = np.rint(_window_sums(~np.isnan(padded), rows, cols)).astype(np.intp)
+
+        # NaNs become inf so they are sorted last and every window median only needs its valid count
+        windows = np.empty((*center.shape, rows * cols), dtype = dtype)
+        np.copyto(windows.reshape(*center.shape, rows, cols),
+                  sliding_window_view(np.nan_to_num(padded, nan = np.inf), (rows, cols)))
+        windows.sort(axis = -1)
+
+        offsets = np.arange(0, windows.size, rows * cols).reshape(center.shape)
+        median = _sorted_median(windows, offsets, count)
+        mad = _sorted_mad(windows, offsets, count, median)
+
+        with np.errstate(invalid = 'ignore'):
+            return np.abs(center - median) > n_sigmas * 1.4826 * mad
+
+    # Windows are sorted in the data type of the result, float32 bands do not need float64 sorts.
+    # Blocks are sized as if every window value took one more float64, which keeps the sorted
+    # windows of a block around 20 MB, where sorting them is faster than in larger blocks
+    dtype = np.result_type(np.asarray(data).dtype, np.float32)
+    rows, cols = _window_shape(window)
+    return _moving_filter(data, window, inplace, block_size, rows * cols * (dtype.itemsize + 8) // 8 + 8, outliers, workers)
+
+def moving_zscore(data : np.ndarray, window : int | Tuple[int, int] = 3, threshold : float = 3, inplace : bool = False,
+                  block_size : int = None, workers : int = None) -> np.ndarray:
+    """Moving window Z-Score, masks values far from the mean of their moving window.
+
+    Window means and stds are computed with summed-area tables, so the cost does not
+    depend on the window size. NaN values are ignored inside every window, and windows are
+    computed over the last two axes, so a band stack is filtered band by band.
+
+    Args:
+        data (np.ndarray): array to be masked, with at least two dimensions.
+        window (int | Tuple[int, int], optional): odd window size, or odd rows and columns. Defaults to 3.
+        threshold (float, optional): absolute z-score to consider a value an outlier. Defaults to 3.
+        inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
+        block_size (int, optional): rows processed at once. Defaults to None, which keeps the
+            temporaries around 64 MB per worker.
+        workers (int, optional): threads filtering blocks of rows. Defaults to None, one per CPU.
+
+    Returns:
+        np.ndarray: array with outliers masked as NaN.
+    """
+
+    def outliers(padded : np.ndarray, rows : int, cols : int) -> np.ndarray:
+        center = padded[rows // 2 : padded.shape[0] - rows // 2, cols // 2 : padded.shape[1] - cols // 2]
+        is_valid = ~np.isnan(padded)
+        if not is_valid.any():
+            return np.zeros(center.shape, dtype = bool)
+
+        # Centering on the block mean keeps the sums of squares from cancelling
+        values = np.where(is_valid, padded - np.mean(padded, where = is_valid), 0)
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            count = _window_sums(is_valid.astype(np.float64), rows, cols)
+            mean = _window_sums(values, rows, cols) / count
+            squares = _window_sums(values * values, rows, cols) / count
+            variance = squares - mean * mean
+            std = np.sqrt(np.where(variance > 1e-12 * squares, variance, 0))
+
+            deviation = np.abs(values[rows // 2 : values.shape[0] - rows // 2, cols // 2 : values.shape[1] - cols // 2] - mean)
+            return (deviation >= threshold * std) & (std > 0) & ~np.isnan(center)
+
+    return _moving_filter(data, window, inplace, block_size, 8, outliers, workers)
+
+
+
+class _StreamingFilter(ABC):
+    """Two-pass outlier filter: thresholds are accumulated over every tile or scene, then applied to each one."""
+
+    @abstractmethod
+    def update(self, data : np.ndarray) -> Self:
+        """Accumulates the statistics of a tile or scene.
+
+        Args:
+            data (np.ndarray): values of any shape, NaNs are ignored.
+
+        Returns:
+            Self: the filter for method chaining.
+        """
+
+    @abstractmethod
+    def merge(self, other : Self) -> Self:
+        """Adds the statistics accumulated by another filter of the same kind, e.g. from another process.
+
+        Args:
+            other (Self): filter to be merged into this one.
+
+        Returns:
+            Self: the filter for method chaining.
+        """
+
+    @abstractmethod
+    def thresholds(self) -> Tuple[float | None, float | None]:
+        """Global thresholds of the values seen so far.
+
+        Returns:
+            Tuple[float | None, float | None]: lower and upper limits, None when the side is not filtered.
+        """
+
+    def apply(self, data : np.ndarray, inplace : bool = False, block_size : int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+        """Masks as NaN the values outside the global thresholds, block_size rows at a time.
+
+        Args:
+            data (np.ndarray): array to be masked.
+            inplace (bool, optional): write NaNs into data instead of returning a new array. Defaults to False.
+            block_size (int, optional): rows masked at once, bounds the temporary memory. Defaults to 1024.
+
+        Returns:
+            np.ndarray: array with outliers masked as NaN.
+        """
+
+        lower, upper = self.thresholds()
+
+        if inplace:
+            if not np.issubdtype(data.dtype, np.floating):
+                raise ValueError('inplace masking requires a floating point array')
+            result = data
+        else:
+            result = np.array(data, dtype = np.result_type(data.dtype, np.float32))
+
+        if result.ndim < 2:
+            _mask_outside(result, lower, upper, inplace = True)
+            return result
+
+        for start in range(0, result.shape[-2], block_size):
+            _mask_outside(result[..., start : start + block_size, :], lower, upper, inplace = True)
+
+        return result
+
+    def __str__(self) -> str:
+        lower, upper = self.thresholds()
+        return f'{self.__class__.__name__} | Lower: {lower} | Upper: {upper}'
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class _StreamingQuantileFilter(_StreamingFilter):
+    """Streaming filter whose thresholds come from quantiles of a mergeable sketch."""
+
+    def __init__(self, relative_accuracy : float = DEFAULT_RELATIVE_ACCURACY, max_bins : int = 2**16) -> None:
+        self.sketch : QuantileSketch = QuantileSketch(relative_accuracy, max_bins)
+
+    def update(self, data : np.ndarray) -> Self:
+        self.sketch.update(data)
+        return self
+
+    def merge(self, other : Self) -> Self:
+        self.sketch.merge(other.sketch)
+        return self
+
+
+class StreamingIQR(_StreamingQuantileFilter):
+    """Interquartile Range (IQR) outlier masking with global quartiles across tiles or scenes.
+
+    Quartiles are estimated with a QuantileSketch, so they are within relative_accuracy
+    of the exact ones and do not depend on how the data is split into tiles.
+
+    Args:
+        distance (float, optional): distance to consider a value an outlier. Defaults to 1.5.
+        relative_accuracy (float, optional): relative error of the quartiles. Defaults to 0.001.
+        max_bins (int, optional): maximum number of sketch buckets, bounds the memory. Defaults to 2**16.
+    """
+
+    def __init__(self, distance : float = 1.5, relative_accuracy : float = DEFAULT_RELATIVE_ACCURACY, max_bins : int = 2**16) -> None:
+        super().__init__(relative_accuracy, max_bins)
+        self.distance : float = distance
+
+    def thresholds(self) -> Tuple[float, float]:
+        Q1, Q3 = self.sketch.quantile([0.25, 0.75])
+        outlier_distance = self.distance * (Q3 - Q1)
+
+        return Q1 - outlier_distance, Q3 + outlier_distance
+
+
+class StreamingUpperPercentile(_StreamingQuantileFilter):
+    """Masks values above a global percentile across tiles or scenes.
+
+    Args:
+        percentile (float): limit for upper percentile.
+        relative_accuracy (float, optional): relative error of the percentile. Defaults to 0.001.
+        max_bins (int, optional): maximum number of sketch buckets, bounds the memory. Defaults to 2**16.
+    """
+
+    def __init__(self, percentile : float, relative_accuracy : float = DEFAULT_RELATIVE_ACCURACY, max_bins : int = 2**16) -> None:
+        super().__init__(relative_accuracy, max_bins)
+        self.percentile : float = percentile
+
+    def thresholds(self) -> Tuple[None, float]:
+        return None, self.sketch.quantile(self.percentile / 100)
+
+
+class StreamingLowerPercentile(_StreamingQuantileFilter):
+    """Masks values below a global percentile across tiles or scenes.
+
+    Args:
+        percentile (float): limit for lower percentile.
+        relative_accuracy (float, optional): relative error of the percentile. Defaults to 0.001.
+        max_bins (int, optional): maximum number of sketch buckets, bounds the memory. Defaults to 2**16.
+    """
+
+    def __init__(self, percentile : float, relative_accuracy : float = DEFAULT_RELATIVE_ACCURACY, max_bins : int = 2**16) -> None:
+        super().__init__(relative_accuracy, max_bins)
+        self.percentile : float = percentile
+
+    def thresholds(self) -> Tuple[float, None]:
+        return self.sketch.quantile(self.percentile / 100), None
+
+
+class StreamingZScore(_StreamingFilter):
+    """Z-Score outlier masking with a global mean and std across tiles or scenes.
+
+    The sums of values and squares are accumulated exactly, so the thresholds do not
+    depend on how the data is split into tiles.
+
+    Args:
+        threshold (float, optional): absolute z-score to consider a value an outlier. Defaults to 3.
+    """
+
+    def __init__(self, threshold : float = 3) -> None:
+        self.threshold : float = threshold
+        self.sum : ExactSum = ExactSum()
+        self.sum_squares : ExactSum = ExactSum()
+
+    def update(self, data : np.ndarray) -> Self:
+        values = np.asarray(data, dtype = np.float64).ravel()
+        values = values[~np.isnan(values)]
+
+        self.sum.update(values)
+        self.sum_squares.update(values * values)
+        return self
+
+    def merge(self, other : Self) -> Self:
+        self.sum.merge(other.sum)
+        self.sum_squares.merge(other.sum_squares)
+        return self
+
+    def thresholds(self) -> Tuple[float, float]:
+        count = self.sum.count
+        if count == 0:
+            return np.nan, np.nan
+
+        mean = self.sum.exact() / count
+        variance = max(self.sum_squares.exact() / count - mean * mean, Fraction(0))
+        std = np.sqrt(float(variance))
+        if std == 0:
+            return -np.inf, np.inf
 
-    return np.where( data <= limit, np.nan, data)
\ No newline at end of file
+        mean = float(mean)
+        return mean - self.threshold * std, mean + self.threshold * std
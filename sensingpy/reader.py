@@ -1,12 +1,27 @@
 # from __future__ import annotations
 
+import asyncio
+import functools
+import json
+import os
 import xarray as xr
 import numpy as np
 import rasterio
+import rasterio.transform
+import rasterio.windows
 import pyproj
 import sensingpy.enums as enums
+import sensingpy.mosaic as mosaic
 
-from typing import Dict
+from affine import Affine
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from rasterio.enums import Interleaving
+from rasterio.warp import Resampling
+from rasterio.windows import Window
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+from sensingpy.cache import BLOCK_CACHE, DATASET_POOL, BlockCache, signature
 from sensingpy.image import Image
 
 
@@ -17,6 +32,13 @@ class ImageReader:
     This is an abstract base class that defines the interface for all image readers.
     Concrete subclasses must implement the `read` method.
     
+    Parameters
+    ----------
+    window : Window, optional
+        Window of pixels to read, by default None which reads the whole image
+    bands : List[str], optional
+        Names of the bands to read, by default None which reads every band
+    
     Notes
     -----
     This class follows the Strategy pattern to provide different algorithms
@@ -24,6 +46,10 @@ class ImageReader:
     interface.
     """
 
+    def __init__(self, window: Window = None, bands: List[str] = None) -> None:
+        self.window = window
+        self.bands = bands
+
     def read(self, filename: str) -> Image:
         """
         Read an image file and convert it to an Image object.
@@ -45,8 +71,149 @@ class ImageReader:
         """
         raise NotImplementedError("This method must be implemented by subclasses")
 
+    def _window(self, height: int, width: int) -> Window:
+        """
+        Get the window of pixels to read from an image.
+        
+        Parameters
+        ----------
+        height : int
+            Height of the image in pixels
+        width : int
+            Width of the image in pixels
+            
+        Returns
+        -------
+        Window
+            Window with integer offsets and lengths
+            
+        Raises
+        ------
+        ValueError
+            If the window is empty or not inside the image
+        """
+        if self.window is None:
+            return Window(0, 0, width, height)
+        
+        window = self.window.round_offsets().round_lengths()
+        if window.col_off < 0 or window.row_off < 0 or window.width < 1 or window.height < 1 \
+           or window.col_off + window.width > width or window.row_off + window.height > height:
+            raise ValueError(f'Window {window} is not inside an image of {height}x{width} pixels')
+        return window
+
+    def _band_names(self, names: List[str]) -> List[str]:
+        """
+        Get the names of the bands to read from an image.
+        
+        Parameters
+        ----------
+        names : List[str]
+            Names of the bands of the image
+            
+        Returns
+        -------
+        List[str]
+            Names of the selected bands in the requested order
+            
+        Raises
+        ------
+        ValueError
+            If a requested band is not in the image
+        """
+        if self.bands is None:
+            return list(names)
+        
+        missing = [band for band in self.bands if band not in names]
+        if missing:
+            raise ValueError(f'Bands {missing} are not in the image')
+        return list(self.bands)
+
+
+class XarrayReader(ImageReader):
+    """
+    Base reader for formats opened as xarray Datasets with CF metadata.
+
+    Notes
+    -----
+    NetCDF files and Zarr stores can store coordinate reference system (CRS)
+    information in several locations according to the CF conventions. This reader
+    searches for CRS information in coordinates, variables, and global attributes,
+    in that order.
+    """
+
+    def _to_image(self, src: xr.Dataset) -> Image:
+        """
+        Convert a Dataset with CF metadata to an Image object.
+
+        Parameters
+        ----------
+        src : xr.Dataset
+            Dataset with the bands and CRS information
+
+        Returns
+        -------
+        Image
+            An Image object containing the data, coordinates, and CRS information
+
+        Notes
+        -----
+        The reader searches for CRS information in the following locations:
+        1. DataArrays with a 'crs_wkt' attribute in coordinates
+        2. Variables with a 'crs_wkt' attribute
+        3. Global attributes ('crs_wkt' or 'proj4_string')
+        
+        If no CRS information is found, a default grid mapping variable is created.
+        """
+        grid_mapping = 'projection'
 
-class NetCDFReader(ImageReader):
+        crs = None
+        crs_var_name = None
+        
+        # Search for a DataArray with crs_wkt attribute in coordinates
+        for coord_name, coord in src.coords.items():
+            if 'crs_wkt' in coord.attrs:
+                crs = pyproj.CRS.from_wkt(coord.attrs['crs_wkt'])
+                crs_var_name = coord_name
+                break
+        
+        # If not found in coordinates, search in variables
+        if crs is None:
+            for var_name, var in src.data_vars.items():
+                if 'crs_wkt' in var.attrs:
+                    crs = pyproj.CRS.from_wkt(var.attrs['crs_wkt'])
+                    crs_var_name = var_name
+                    src.coords[var_name] = var
+                    break
+        
+        # If still not found, look in global attributes
+        if crs is None:
+            if 'crs_wkt' in src.attrs:
+                crs = pyproj.CRS.from_wkt(src.attrs['crs_wkt'])
+            elif 'proj4_string' in src.attrs:
+                crs = pyproj.CRS.from_proj4(src.attrs['proj4_string'])
+        
+        # If no variable name was found for the projection, use the default
+        if crs_var_name is None:
+            crs_var_name = grid_mapping
+            src.coords[grid_mapping] = xr.DataArray(0, attrs=crs.to_cf())
+        
+        # Ensure all variables have the grid_mapping attribute
+        for var in src.data_vars:
+            src[var].attrs['grid_mapping'] = crs_var_name
+
+        src.attrs['grid_mapping'] = crs_var_name
+        
+        if self.bands is not None:
+            src = src[self._band_names(list(src.data_vars))]
+        if self.window is not None:
+            window = self._window(src.sizes['y'], src.sizes['x'])
+            src = src.isel(y=slice(window.row_off, window.row_off + window.height),
+                           x=slice(window.col_off, window.col_off + window.width))
+        
+        return Image(data=src, crs=crs)
+
+
+class NetCDFReader(XarrayReader):
     """
     Reader for NetCDF image files with geospatial metadata.
     
@@ -83,48 +250,40 @@ class NetCDFReader(ImageReader):
         3. Global attributes ('crs_wkt' or 'proj4_string')
         
         If no CRS information is found, a default grid mapping variable is created.
+        
+        Datasets are opened through the process-wide dataset pool, so repeated
+        reads of a file do not parse its header again.
         """
-        grid_mapping = 'projection'
         
-        with xr.open_dataset(filename) as src:
-            crs = None
-            crs_var_name = None
-            
-            # Search for a DataArray with crs_wkt attribute in coordinates
-            for coord_name, coord in src.coords.items():
-                if 'crs_wkt' in coord.attrs:
-                    crs = pyproj.CRS.from_wkt(coord.attrs['crs_wkt'])
-                    crs_var_name = coord_name
-                    break
-            
-            # If not found in coordinates, search in variables
-            if crs is None:
-                for var_name, var in src.data_vars.items():
-                    if 'crs_wkt' in var.attrs:
-                        crs = pyproj.CRS.from_wkt(var.attrs['crs_wkt'])
-                        crs_var_name = var_name
-                        src.coords[var_name] = var
-                        break
-            
-            # If still not found, look in global attributes
-            if crs is None:
-                if 'crs_wkt' in src.attrs:
-                    crs = pyproj.CRS.from_wkt(src.attrs['crs_wkt'])
-                elif 'proj4_string' in src.attrs:
-                    crs = pyproj.CRS.from_proj4(src.attrs['proj4_string'])
-            
-            # If no variable name was found for the projection, use the default
-            if crs_var_name is None:
-                crs_var_name = grid_mapping
-                src.coords[grid_mapping] = xr.DataArray(0, attrs=crs.to_cf())
-            
-            # Ensure all variables have the grid_mapping attribute
-            for var in src.data_vars:
-                src[var].attrs['grid_mapping'] = crs_var_name
+        with DATASET_POOL.open(filename, xr.open_dataset) as src:
+            return self._to_image(src.copy())
+
+
+class ZarrReader(XarrayReader):
+    """
+    Reader for Zarr stores with geospatial metadata.
+
+    This class opens Zarr stores (.zarr) written by Image.to_zarr or other CF
+    compliant writers. Bands are read lazily, so only the chunks that are used
+    are loaded, and CRS information is found as in NetCDFReader.
+    """
 
-            src.attrs['grid_mapping'] = crs_var_name
+    def read(self, filename: str) -> Image:
+        """
+        Open a Zarr store and convert it to an Image object.
+        
+        Parameters
+        ----------
+        filename : str
+            Path to the Zarr store
             
-            return Image(data=src, crs=crs)
+        Returns
+        -------
+        Image
+            An Image object containing the data, coordinates, and CRS information
+        """
+
+        return self._to_image(xr.open_zarr(filename, chunks=None))
 
 
 class GeoTIFFReader(ImageReader):
@@ -135,6 +294,18 @@ class GeoTIFFReader(ImageReader):
     coordinate systems, and spatial metadata to create an Image object. It handles
     conversion from GDAL/rasterio representation to xarray format.
     
+    Parameters
+    ----------
+    mmap : bool, optional
+        Memory-map the pixels of uncompressed strip GeoTIFFs instead of decoding
+        them, by default False. Bands are then copy-on-write views of the file
+        whose pages are loaded on demand and shared between processes through the
+        page cache. Other files are decoded as usual
+    window : Window, optional
+        Window of pixels to read, by default None which reads the whole image
+    bands : List[str], optional
+        Names of the bands to read, by default None which reads every band
+    
     Notes
     -----
     The class preserves band-specific metadata, nodata values, and coordinates while
@@ -142,6 +313,10 @@ class GeoTIFFReader(ImageReader):
     coordinates.
     """
 
+    def __init__(self, mmap: bool = False, window: Window = None, bands: List[str] = None) -> None:
+        super().__init__(window, bands)
+        self.mmap = mmap
+
     def read(self, filename: str) -> Image:
         """
         Read a GeoTIFF file and convert it to an Image object.
@@ -163,41 +338,97 @@ class GeoTIFFReader(ImageReader):
         - Band data and descriptions
         - Nodata values
         - TIFF tags and band-specific metadata
-        """
-        grid_mapping = 'projection'
         
-        with rasterio.open(filename) as src:
-            crs = pyproj.CRS.from_proj4(src.crs.to_proj4())
-            coords = self._prepare_coords(src, crs, grid_mapping)
-            variables = self._prepare_vars(src, coords, grid_mapping)
-            
-            # Create global dataset attributes
-            attrs = {}
-            
-            # Add nodata values
-            for i in range(1, src.count + 1):
-                nodata = src.nodatavals[i-1]
-                if nodata is not None:
-                    attrs[f'_FillValue_band_{i}'] = nodata
-            
-            # Add other relevant metadata from GeoTIFF file
-            for key, value in src.tags().items():
-                # Filter some tags that might cause problems or aren't relevant
-                if key not in ['TIFFTAG_DATETIME', 'TIFFTAG_SOFTWARE']:
-                    attrs[f'tiff_{key}'] = value
+        Files are opened through the process-wide dataset pool, and windows are
+        assembled from decoded blocks kept in the process-wide block cache, so
+        repeated windowed reads of a scene neither parse its header nor decode
+        its blocks again. Whole images are decoded directly.
+        """
+        with DATASET_POOL.open(filename) as src:
+            window = self._window(src.height, src.width)
+            mapped = self._memmap(src) if self.mmap else None
+            rows, cols = window.toslices()
             
-            # Add band metadata summary
-            for i in range(1, src.count + 1):
-                band_tags = src.tags(i)
-                for tag_key, tag_value in band_tags.items():
-                    attrs[f'band_{i}_{tag_key}'] = tag_value
+            if mapped is not None:
+                arrays = {idx: mapped[idx-1][rows, cols] for idx in self._indexes(src)}
+            elif self.window is None:
+                arrays = {idx: src.read(idx) for idx in self._indexes(src)}
+            else:
+                file_signature = signature(filename)
+                arrays = {}
+                for idx in self._indexes(src):
+                    blocks = _window_blocks(window, src.block_shapes[idx-1])
+                    values = [_read_block(src, filename, file_signature, idx, row, col) for row, col in blocks]
+                    arrays[idx] = _assemble(window, src.block_shapes[idx-1], blocks, values, src.dtypes[idx-1])
             
-            attrs['grid_mapping'] = grid_mapping
+            return self._to_image(src, arrays)
+    
+    def _indexes(self, src: rasterio.DatasetReader) -> List[int]:
+        """
+        Get the indexes of the bands to read.
+        
+        Parameters
+        ----------
+        src : rasterio.DatasetReader
+            Rasterio object representing the source data
             
-            # Create dataset with all attributes
-            dataset = xr.Dataset(data_vars=variables, coords=coords, attrs=attrs)
+        Returns
+        -------
+        List[int]
+            Band indexes, starting at 1, in the requested order
+        """
+        band_indexes = mosaic.source_band_names(src)
+        return [band_indexes[band_name] for band_name in self._band_names(list(band_indexes))]
+    
+    def _to_image(self, src: rasterio.DatasetReader, arrays: Dict[int, np.ndarray]) -> Image:
+        """
+        Convert the pixels read from a GeoTIFF to an Image object.
+        
+        Parameters
+        ----------
+        src : rasterio.DatasetReader
+            Rasterio object representing the source data
+        arrays : Dict[int, np.ndarray]
+            Pixels of the window by band index
             
-            return Image(data=dataset, crs=crs)
+        Returns
+        -------
+        Image
+            An Image object containing the data, coordinates, and CRS information
+        """
+        grid_mapping = 'projection'
+        
+        crs = pyproj.CRS.from_proj4(src.crs.to_proj4())
+        coords = self._prepare_coords(src, crs, grid_mapping)
+        variables = self._prepare_vars(src, coords, grid_mapping, arrays)
+        
+        # Create global dataset attributes
+        attrs = {}
+        
+        # Add nodata values
+        for i in arrays:
+            nodata = src.nodatavals[i-1]
+            if nodata is not None:
+                attrs[f'_FillValue_band_{i}'] = nodata
+        
+        # Add other relevant metadata from GeoTIFF file
+        for key, value in src.tags().items():
+            # Filter some tags that might cause problems or aren't relevant
+            if key not in ['TIFFTAG_DATETIME', 'TIFFTAG_SOFTWARE']:
+                attrs[f'tiff_{key}'] = value
+        
+        # Add band metadata summary
+        for i in arrays:
+            band_tags = src.tags(i)
+            for tag_key, tag_value in band_tags.items():
+                attrs[f'band_{i}_{tag_key}'] = tag_value
+        
+        attrs['grid_mapping'] = grid_mapping
+        
+        # Create dataset with all attributes
+        dataset = xr.Dataset(data_vars=variables, coords=coords, attrs=attrs)
+        
+        return Image(data=dataset, crs=crs)
     
     def _prepare_coords(self, src: rasterio.DatasetReader, crs: pyproj.CRS, grid_mapping: str) -> Dict[str, xr.DataArray]:
         """
@@ -222,32 +453,11 @@ class GeoTIFFReader(ImageReader):
         This method creates coordinate arrays with proper CF Convention attributes
         derived from the CRS.
         """
-        x_meta, y_meta = crs.cs_to_cf()
-        wkt_meta = crs.to_cf()
-            
-        x = np.array([src.xy(row, col)[0] for row, col in zip(np.zeros(src.width), np.arange(src.width))])
-        y = np.array([src.xy(row, col)[-1] for row, col in zip(np.arange(src.height), np.zeros(src.height))])
-        
-        coords = {
-            'x': xr.DataArray(
-                data=x,
-                coords={'x': x},
-                attrs=x_meta
-            ),
-            'y': xr.DataArray(
-                data=y,
-                coords={'y': y},
-                attrs=y_meta
-            ),
-            grid_mapping: xr.DataArray(
-                data=0,
-                attrs=wkt_meta
-            )
-        }
-        
-        return coords
+        window = self._window(src.height, src.width)
+        return _grid_coords(src.window_transform(window), window.width, window.height, crs, grid_mapping)
     
-    def _prepare_vars(self, src: rasterio.DatasetReader, coords: Dict[str, xr.DataArray], grid_mapping: str) -> Dict[str, xr.DataArray]:
+    def _prepare_vars(self, src: rasterio.DatasetReader, coords: Dict[str, xr.DataArray], grid_mapping: str,
+                      arrays: Dict[int, np.ndarray]) -> Dict[str, xr.DataArray]:
         """
         Generate data variables (bands) for the dataset from the source data.
         
@@ -259,6 +469,8 @@ class GeoTIFFReader(ImageReader):
             Dictionary of coordinate arrays
         grid_mapping : str
             Name of the projection variable
+        arrays : Dict[int, np.ndarray]
+            Pixels of the window by band index
             
         Returns
         -------
@@ -270,12 +482,12 @@ class GeoTIFFReader(ImageReader):
         This method processes each raster band, preserving band descriptions,
         nodata values, and any band-specific metadata from the GeoTIFF.
         """
-        band_names = src.descriptions if not None in src.descriptions else [f'Band {i}' for i in range(1, src.count + 1)]
+        band_names = {idx: band_name for band_name, idx in mosaic.source_band_names(src).items()}
         
         variables = {}
         
-        for idx, band_name in enumerate(band_names, start=1):
-            band_data = src.read(idx)
+        for idx, band_data in arrays.items():
+            band_name = band_names[idx]
             nodata = src.nodatavals[idx-1]
             
             # Create band-specific attributes
@@ -301,8 +513,427 @@ class GeoTIFFReader(ImageReader):
         
         return variables
 
+    def _memmap(self, src: rasterio.DatasetReader) -> List[np.ndarray] | None:
+        """
+        Memory-map the bands of an uncompressed strip GeoTIFF.
+        
+        Parameters
+        ----------
+        src : rasterio.DatasetReader
+            Rasterio object representing the source data
+            
+        Returns
+        -------
+        List[np.ndarray] or None
+            Copy-on-write view of every band, or None if the pixels are compressed,
+            tiled or not stored contiguously
+            
+        Notes
+        -----
+        The strip offsets and sizes reported by GDAL must follow each other with no
+        gaps, for the whole file with pixel interleaving or for every band with band
+        interleaving.
+        """
+        structure = src.tags(ns='IMAGE_STRUCTURE')
+        if src.compression is not None or src.block_shapes[0][1] != src.width or 'NBITS' in structure \
+           or len(set(src.dtypes)) > 1:
+            return None
+        
+        byteorder = '<' if np.fromfile(src.name, dtype='S2', count=1)[0] == b'II' else '>'
+        dtype = np.dtype(src.dtypes[0]).newbyteorder(byteorder)
+        interleaved = src.count > 1 and src.interleaving == Interleaving.pixel
+        strips = -(-src.height // src.block_shapes[0][0])
+        shape = (src.height, src.width, src.count) if interleaved else (src.height, src.width)
+        
+        offsets = []
+        for idx in ([1] if interleaved else range(1, src.count + 1)):
+            start = position = src.get_tag_item('BLOCK_OFFSET_0_0', 'TIFF', bidx=idx)
+            for strip in range(strips):
+                offset = src.get_tag_item(f'BLOCK_OFFSET_0_{strip}', 'TIFF', bidx=idx)
+                size = src.get_tag_item(f'BLOCK_SIZE_0_{strip}', 'TIFF', bidx=idx)
+                if offset is None or size is None or int(offset) != int(position):
+                    return None
+                position = int(offset) + int(size)
+            
+            if position - int(start) != np.prod(shape) * dtype.itemsize:
+                return None
+            offsets.append(int(start))
+        
+        if interleaved:
+            cube = np.memmap(src.name, dtype=dtype, mode='c', offset=offsets[0], shape=shape)
+            return [cube[..., idx] for idx in range(src.count)]
+        return [np.memmap(src.name, dtype=dtype, mode='c', offset=offset, shape=shape) for offset in offsets]
+
+
+class NumpyReader(ImageReader):
+    """
+    Reader for band cubes written with Image.to_npy.
+    
+    The bands are read from a (bands, height, width) .npy file and the band names,
+    attributes, CRS and transform from the JSON sidecar with the same name.
+    
+    Parameters
+    ----------
+    mmap : bool, optional
+        Memory-map the cube, by default True. Bands are then copy-on-write views of
+        the file whose pages are loaded on demand and shared between processes
+        through the page cache
+    window : Window, optional
+        Window of pixels to read, by default None which reads the whole image
+    bands : List[str], optional
+        Names of the bands to read, by default None which reads every band
+    """
+
+    def __init__(self, mmap: bool = True, window: Window = None, bands: List[str] = None) -> None:
+        super().__init__(window, bands)
+        self.mmap = mmap
+
+    def read(self, filename: str) -> Image:
+        """
+        Read a band cube and convert it to an Image object.
+        
+        Parameters
+        ----------
+        filename : str
+            Path to the .npy file
+            
+        Returns
+        -------
+        Image
+            An Image object containing the data, coordinates, and CRS information
+        """
+        grid_mapping = 'projection'
+        
+        metadata = json.loads(Path(os.path.splitext(filename)[0] + '.json').read_text())
+        cube = np.load(filename, mmap_mode='c' if self.mmap else None)
+        crs = pyproj.CRS.from_wkt(metadata['crs_wkt'])
+        window = self._window(cube.shape[1], cube.shape[2])
+        transform = rasterio.windows.transform(window, Affine(*metadata['transform']))
+        coords = _grid_coords(transform, window.width, window.height, crs, grid_mapping)
+        rows, cols = window.toslices()
+        band_indexes = {band_name: idx for idx, band_name in enumerate(metadata['bands'])}
+        
+        variables = {
+            band_name: xr.DataArray(
+                data=cube[band_indexes[band_name], rows, cols],
+                dims=('y', 'x'),
+                coords={'y': coords['y'], 'x': coords['x']},
+                attrs=metadata['bands'][band_name]
+            )
+            for band_name in self._band_names(list(metadata['bands']))
+        }
+        
+        return Image(data=xr.Dataset(data_vars=variables, coords=coords, attrs=metadata['attrs']), crs=crs)
+
+
+class AsyncReader:
+    """
+    Asyncio reader of image windows for services running an event loop.
+    
+    Blocking reads run in a bounded thread pool, so the event loop is never
+    stalled. GeoTIFF windows are read block by block with handles of the
+    process-wide dataset pool and decoded blocks of the process-wide block
+    cache, and concurrent requests for the same block share a single read.
+    Other formats are opened with open in the thread pool.
+    
+    Parameters
+    ----------
+    workers : int, optional
+        Threads reading files, by default 4. Each thread uses one handle at a
+        time, so it also bounds the handles opened per path
+        
+    Attributes
+    ----------
+    reads : int
+        Number of block reads run in the thread pool, from files or the cache
+    coalesced : int
+        Number of block requests served by a read already in flight
+        
+    Examples
+    --------
+    >>> async_reader = reader.AsyncReader(workers=8)
+    >>> image = await async_reader.open('scene.tif', window=Window(0, 0, 256, 256), bands=['pSDB Green'])
+    >>> async_reader.close()
+    """
+
+    def __init__(self, workers: int = 4) -> None:
+        self.workers = workers
+        self.reads = 0
+        self.coalesced = 0
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+        self.__inflight: Dict[Tuple, asyncio.Future] = {}
+
+    async def open(self, filename: str, window: Window = None, bands: List[str] = None) -> Image:
+        """
+        Read a window of an image file without blocking the event loop.
+        
+        Parameters
+        ----------
+        filename : str
+            Path or URL of the image file
+        window : Window, optional
+            Window of pixels to read, by default None which reads the whole image
+        bands : List[str], optional
+            Names of the bands to read, by default None which reads every band
+            
+        Returns
+        -------
+        Image
+            An Image object with the window, as returned by open
+            
+        Raises
+        ------
+        ValueError
+            If the window is not inside the image or a band is not in it
+        """
+        extension = filename.rstrip('/\\').split('.')[-1].lower()
+        if extension not in enums.FILE_EXTENTIONS.TIF.value:
+            return await self.__run(open, filename, window=window, bands=bands)
+        
+        geotiff = GeoTIFFReader(window=window, bands=bands)
+        window, layout = await self.__run(self.__with_handle, filename, functools.partial(self.__layout, geotiff))
+        file_signature = signature(filename)
+        
+        arrays = await asyncio.gather(*(
+            self.__read_window(filename, file_signature, idx, window, block_shape, dtype)
+            for idx, block_shape, dtype in layout
+        ))
+        arrays = {idx: array for (idx, _, _), array in zip(layout, arrays)}
+        
+        return await self.__run(self.__with_handle, filename, lambda src: geotiff._to_image(src, arrays))
+
+    def close(self) -> None:
+        """
+        Wait for the pending reads and stop the thread pool.
+        """
+        self.__executor.shutdown(wait=True)
+
+    @staticmethod
+    def __layout(geotiff: GeoTIFFReader, src: rasterio.DatasetReader) -> Tuple[Window, List[Tuple[int, Tuple[int, int], str]]]:
+        window = geotiff._window(src.height, src.width)
+        return window, [(idx, src.block_shapes[idx-1], src.dtypes[idx-1]) for idx in geotiff._indexes(src)]
+
+    async def __read_window(self, filename: str, file_signature: Tuple[int, int], idx: int, window: Window,
+                            block_shape: Tuple[int, int], dtype: str) -> np.ndarray:
+        blocks = _window_blocks(window, block_shape)
+        values = await asyncio.gather(*(self.__block(filename, file_signature, idx, row, col) for row, col in blocks))
+        return _assemble(window, block_shape, blocks, values, dtype)
+
+    async def __block(self, filename: str, file_signature: Tuple[int, int], idx: int, row: int, col: int) -> np.ndarray:
+        key = (asyncio.get_running_loop(), filename, file_signature, idx, row, col)
+        future = self.__inflight.get(key)
+        
+        if future is None:
+            future = asyncio.ensure_future(self.__run(self.__with_handle, filename, functools.partial(
+                _read_block, filename=filename, file_signature=file_signature, idx=idx, row=row, col=col)))
+            self.__inflight[key] = future
+            future.add_done_callback(lambda _: self.__inflight.pop(key, None))
+            self.reads += 1
+        else:
+            self.coalesced += 1
+        
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def __with_handle(filename: str, function: Callable[[rasterio.DatasetReader], object]) -> object:
+        with DATASET_POOL.open(filename) as src:
+            return function(src)
+
+    async def __run(self, function: Callable, *args, **kwargs) -> object:
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, functools.partial(function, *args, **kwargs))
+
+    def __enter__(self) -> 'AsyncReader':
+        return self
 
-def open(filename: str) -> Image:
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        return f'AsyncReader | Workers: {self.workers} | Reads: {self.reads} | Coalesced: {self.coalesced}'
+
+
+def _window_blocks(window: Window, block_shape: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """
+    Get the internal blocks of a band that intersect a window.
+    
+    Parameters
+    ----------
+    window : Window
+        Window of pixels with integer offsets and lengths
+    block_shape : Tuple[int, int]
+        Height and width of the blocks of the band
+        
+    Returns
+    -------
+    List[Tuple[int, int]]
+        Row and column of every block, row by row
+    """
+    height, width = block_shape
+    rows = range(window.row_off // height, (window.row_off + window.height - 1) // height + 1)
+    cols = range(window.col_off // width, (window.col_off + window.width - 1) // width + 1)
+    return [(row, col) for row in rows for col in cols]
+
+
+def _assemble(window: Window, block_shape: Tuple[int, int], blocks: List[Tuple[int, int]],
+              values: List[np.ndarray], dtype: str) -> np.ndarray:
+    """
+    Copy the parts of decoded blocks that fall in a window to a new array.
+    
+    Parameters
+    ----------
+    window : Window
+        Window of pixels with integer offsets and lengths
+    block_shape : Tuple[int, int]
+        Height and width of the blocks of the band
+    blocks : List[Tuple[int, int]]
+        Row and column of every block, as returned by _window_blocks
+    values : List[np.ndarray]
+        Pixels of every block, clipped at the edges of the band
+    dtype : str
+        Data type of the band
+        
+    Returns
+    -------
+    np.ndarray
+        Pixels of the window
+    """
+    height, width = block_shape
+    array = np.empty((window.height, window.width), dtype=dtype)
+    
+    for (row, col), block in zip(blocks, values):
+        top, left = row * height - window.row_off, col * width - window.col_off
+        block = block[max(-top, 0):window.height - top, max(-left, 0):window.width - left]
+        array[max(top, 0):max(top, 0) + block.shape[0], max(left, 0):max(left, 0) + block.shape[1]] = block
+    
+    return array
+
+
+def _read_block(src: rasterio.DatasetReader, filename: str, file_signature: Tuple[int, int], idx: int,
+                row: int, col: int) -> np.ndarray:
+    """
+    Read an internal block of a band through the process-wide block cache.
+    
+    Parameters
+    ----------
+    src : rasterio.DatasetReader
+        Open handle of the file
+    filename : str
+        Path or URL of the file
+    file_signature : Tuple[int, int]
+        Modification time and size of the file, as returned by signature
+    idx : int
+        Band index, starting at 1
+    row : int
+        Row of the block
+    col : int
+        Column of the block
+        
+    Returns
+    -------
+    np.ndarray
+        Read-only pixels of the block, clipped at the edges of the band
+    """
+    return BLOCK_CACHE.get((filename, file_signature, idx, row, col),
+                           lambda: src.read(idx, window=src.block_window(idx, row, col)))
+
+
+def _estimated_nbytes(filename: str, window: Window = None, bands: List[str] = None, **kwargs) -> int:
+    """
+    Estimate the bytes of an image read by open from the header of its file.
+    
+    Parameters
+    ----------
+    filename : str
+        Path to the image file
+    window : Window, optional
+        Window to be read, by default None for the whole image
+    bands : List[str], optional
+        Bands to be read, by default None for every band
+    **kwargs
+        Other options of the readers, which do not change the size
+        
+    Returns
+    -------
+    int
+        Estimated bytes, 0 if the header cannot be read so open reports the error
+    """
+    extension = filename.rstrip('/\\').split('.')[-1].lower()
+    
+    try:
+        if extension in enums.FILE_EXTENTIONS.TIF.value:
+            with DATASET_POOL.open(filename) as src:
+                height, width = src.height, src.width
+                itemsizes = [np.dtype(dtype).itemsize for dtype in src.dtypes]
+        elif extension in enums.FILE_EXTENTIONS.NUMPY.value:
+            cube = np.load(filename, mmap_mode='r')
+            height, width = cube.shape[1:]
+            itemsizes = [cube.dtype.itemsize] * cube.shape[0]
+        else:
+            opener = xr.open_dataset if extension in enums.FILE_EXTENTIONS.NETCDF.value else functools.partial(xr.open_zarr, chunks=None)
+            with opener(filename) as src:
+                variables = {name: var for name, var in src.data_vars.items() if var.ndim >= 2}
+                height, width = next(iter(variables.values())).shape[-2:]
+                itemsizes = [var.nbytes // (height * width) for var in variables.values()]
+    except (OSError, ValueError, KeyError, StopIteration):
+        return 0
+    
+    if window is not None:
+        height, width = window.height, window.width
+    if bands is not None:
+        itemsizes = itemsizes[:1] * len(bands)
+    
+    return int(height * width * sum(itemsizes))
+
+
+def _grid_coords(transform: Affine, width: int, height: int, crs: pyproj.CRS, grid_mapping: str) -> Dict[str, xr.DataArray]:
+    """
+    Generate pixel center coordinates of a grid with CF Convention attributes.
+    
+    Parameters
+    ----------
+    transform : Affine
+        Transform of the grid
+    width : int
+        Width of the grid in pixels
+    height : int
+        Height of the grid in pixels
+    crs : pyproj.CRS
+        CRS object representing the coordinate reference system
+    grid_mapping : str
+        Name of the projection variable
+        
+    Returns
+    -------
+    Dict[str, xr.DataArray]
+        Dictionary of coordinate arrays including x, y and the grid mapping
+    """
+    x_meta, y_meta = crs.cs_to_cf()
+    wkt_meta = crs.to_cf()
+    
+    x = np.array(rasterio.transform.xy(transform, np.zeros(width), np.arange(width))[0])
+    y = np.array(rasterio.transform.xy(transform, np.arange(height), np.zeros(height))[-1])
+    
+    coords = {
+        'x': xr.DataArray(
+            data=x,
+            coords={'x': x},
+            attrs=x_meta
+        ),
+        'y': xr.DataArray(
+            data=y,
+            coords={'y': y},
+            attrs=y_meta
+        ),
+        grid_mapping: xr.DataArray(
+            data=0,
+            attrs=wkt_meta
+        )
+    }
+    
+    return coords
+
+
+def open(filename: str, **kwargs) -> Image:
     """
     Open an image file using the appropriate reader based on file extension.
     
@@ -313,6 +944,9 @@ def open(filename: str) -> Image:
     ----------
     filename : str
         Path to the image file to be opened
+    **kwargs
+        Options of the reader, such as window and bands for every format or mmap
+        for GeoTIFFReader and NumpyReader
         
     Returns
     -------
@@ -333,12 +967,225 @@ def open(filename: str) -> Image:
     >>> # Open a NetCDF file
     >>> img = reader.open('example.nc')
     >>> print(img.band_names)
+    
+    >>> # Open a Zarr store
+    >>> img = reader.open('example.zarr')
+    
+    >>> # Memory-map an uncompressed GeoTIFF
+    >>> img = reader.open('example.tif', mmap=True)
+    
+    >>> # Read two bands of a window
+    >>> from rasterio.windows import Window
+    >>> img = reader.open('example.tif', window=Window(0, 0, 256, 256), bands=['Rrs_B3', 'Rrs_B4'])
     """
-    extension = filename.split('.')[-1].lower()
+    extension = filename.rstrip('/\\').split('.')[-1].lower()
     
     if extension in enums.FILE_EXTENTIONS.TIF.value:
-        return GeoTIFFReader().read(filename)
+        return GeoTIFFReader(**kwargs).read(filename)
     elif extension in enums.FILE_EXTENTIONS.NETCDF.value:
-        return NetCDFReader().read(filename)
+        return NetCDFReader(**kwargs).read(filename)
+    elif extension in enums.FILE_EXTENTIONS.ZARR.value:
+        return ZarrReader(**kwargs).read(filename)
+    elif extension in enums.FILE_EXTENTIONS.NUMPY.value:
+        return NumpyReader(**kwargs).read(filename)
     else:
-        raise ValueError(f"Unsupported file format: {extension}")
\ No newline at end of file
+        raise ValueError(f"Unsupported file format: {extension}")
+
+
+def open_many(filenames: Iterable[str], workers: int = None, **kwargs) -> List[Image]:
+    """
+    Open several image files concurrently.
+    
+    Files are read in a thread pool. GDAL and netCDF release the GIL while
+    decoding, so I/O-bound batches scale with the number of workers.
+    
+    Parameters
+    ----------
+    filenames : Iterable[str]
+        Paths to the image files
+    workers : int, optional
+        Threads reading files, by default None which uses the default of
+        ThreadPoolExecutor
+    **kwargs
+        Options of the readers, as in open
+        
+    Returns
+    -------
+    List[Image]
+        Images in the order of the filenames
+        
+    Examples
+    --------
+    >>> images = reader.open_many(paths, workers=8)
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda filename: open(filename, **kwargs), filenames))
+
+
+def iter_images(filenames: Iterable[str], prefetch: int = 2, max_bytes: int = None, **kwargs) -> Iterator[Image]:
+    """
+    Iterate over image files while the next ones are read in the background.
+    
+    While the caller processes an image, up to prefetch of the following files
+    are read in a thread pool.
+    
+    Parameters
+    ----------
+    filenames : Iterable[str]
+        Paths to the image files
+    prefetch : int, optional
+        Files read ahead of the current one, by default 2. 0 reads every file
+        when it is needed
+    max_bytes : int, optional
+        Cap on the bytes of the images read ahead and not consumed yet, by
+        default None for no cap. The size of every file is estimated from its
+        header and reserved before it starts reading, so no file starts while
+        the reserved bytes would exceed max_bytes. One file is always read
+        ahead, even if it is larger than max_bytes
+    **kwargs
+        Options of the readers, as in open
+        
+    Yields
+    ------
+    Image
+        Images in the order of the filenames
+        
+    Examples
+    --------
+    >>> for image in reader.iter_images(paths, prefetch=4, max_bytes=2 * 2**30):
+    ...     process(image)
+    """
+    filenames = iter(filenames)
+    if prefetch < 1:
+        yield from (open(filename, **kwargs) for filename in filenames)
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque()
+    upcoming = deque()
+    
+    def reserved() -> int:
+        return sum(future.result().data.nbytes if future.done() and future.exception() is None else nbytes
+                   for future, nbytes in pending)
+    
+    def read_ahead(limit: int) -> None:
+        while len(pending) < limit:
+            if not upcoming:
+                filename = next(filenames, None)
+                if filename is None:
+                    return
+                upcoming.append((filename, 0 if max_bytes is None else _estimated_nbytes(filename, **kwargs)))
+            filename, nbytes = upcoming[0]
+            if max_bytes is not None and pending and reserved() + nbytes > max_bytes:
+                return
+            upcoming.popleft()
+            pending.append((executor.submit(open, filename, **kwargs), nbytes))
+    
+    try:
+        read_ahead(prefetch + 1)
+        while pending:
+            image = pending.popleft()[0].result()
+            read_ahead(prefetch)
+            yield image
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def open_mosaic(filenames: Iterable[str], target_crs: pyproj.CRS = None, resolution: float = None,
+                resampling: Resampling = Resampling.nearest, block_size: int = mosaic.DEFAULT_BLOCK_SIZE,
+                cache: BlockCache = None) -> Image:
+    """
+    Open several raster files as one virtual mosaic image.
+    
+    The bands are not read when the mosaic is opened. Reading values, windows
+    taken with isel or clip only opens, reads and warps the source blocks that
+    intersect the request, and decoded blocks are kept in an LRU cache.
+    
+    Parameters
+    ----------
+    filenames : Iterable[str]
+        Raster files readable by rasterio, in priority order where they overlap
+    target_crs : pyproj.CRS, optional
+        CRS of the mosaic, by default None which uses the CRS of the first file
+    resolution : float, optional
+        Pixel size in CRS units, by default None which uses the finest resolution
+        of the files
+    resampling : Resampling, optional
+        Resampling used to warp the files, by default Resampling.nearest
+    block_size : int, optional
+        Size in pixels of the cached square blocks, by default 512
+    cache : BlockCache, optional
+        Cache of decoded blocks, by default None which uses the process-wide cache
+        
+    Returns
+    -------
+    Image
+        Image with lazy bands over the union of the file footprints
+        
+    Examples
+    --------
+    >>> from sensingpy import reader
+    >>> img = reader.open_mosaic(['T29SPB.tif', 'T29SQB.tif'], resolution=10)
+    >>> img.clip([aoi])
+    >>> depth = img.select('depth')
+    """
+    grid_mapping = 'projection'
+    
+    virtual = mosaic.VirtualMosaic.from_paths(filenames, target_crs, resolution, resampling=resampling,
+                                              block_size=block_size, cache=cache)
+    coords = _grid_coords(virtual.grid.transform, virtual.grid.width, virtual.grid.height, virtual.grid.crs, grid_mapping)
+    
+    variables = {
+        band_name: xr.DataArray(
+            data=xr.Variable(('y', 'x'), virtual.array(band_name)),
+            coords={'y': coords['y'], 'x': coords['x']},
+            attrs={'grid_mapping': grid_mapping, 'long_name': band_name}
+        )
+        for band_name in virtual.band_names
+    }
+    
+    dataset = xr.Dataset(data_vars=variables, coords=coords, attrs={'grid_mapping': grid_mapping})
+    return Image(data=dataset, crs=virtual.grid.crs)
+
+
+_ASYNC_READER: AsyncReader = None
+
+
+async def aopen(filename: str, window: Window = None, bands: List[str] = None, async_reader: AsyncReader = None) -> Image:
+    """
+    Open a window of an image file from a coroutine.
+    
+    The file is read in the thread pool of an AsyncReader, so the event loop
+    keeps serving other requests, and concurrent calls share open handles and
+    reads of the same blocks.
+    
+    Parameters
+    ----------
+    filename : str
+        Path or URL of the image file
+    window : Window, optional
+        Window of pixels to read, by default None which reads the whole image
+    bands : List[str], optional
+        Names of the bands to read, by default None which reads every band
+    async_reader : AsyncReader, optional
+        Reader running the reads, by default None which uses a reader shared by
+        the whole process
+        
+    Returns
+    -------
+    Image
+        An Image object with the window, as returned by open
+        
+    Examples
+    --------
+    >>> from rasterio.windows import Window
+    >>> image = await reader.aopen('scene.tif', window=Window(512, 0, 256, 256), bands=['pSDB Green'])
+    """
+    global _ASYNC_READER
+    
+    if async_reader is None:
+        if _ASYNC_READER is None:
+            _ASYNC_READER = AsyncReader()
+        async_reader = _ASYNC_READER
+    
+    return await async_reader.open(filename, window=window, bands=bands)
@@ -1,60 +1,287 @@
 import numpy as np
 
-from typing import Iterable, List, Callable
-from itertools import pairwise
+from typing import Iterable, Callable, Tuple, Dict, List, Hashable, Self
 
 
-def _get_limit_masks(array : np.array, pairs : Iterable) -> List[np.array]:
-    """Generates a list of boolean masks for the given array based on the provided pairs of limits.
+_CHUNK_SIZE : int = 1 << 20
+
+
+def _interval_groups(array : np.ndarray, intervals : Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """Groups the flat indexes of the given array by interval with a single binning pass.
 
     Args:
-        array (np.array): array to be masked
-        pairs (Iterable): list of pairs of limits
+        array (np.ndarray): array to be grouped, NaNs and values outside the intervals are left out
+        intervals (Iterable): strictly increasing interval edges
+
+            e.g. [0, 1, 2, 3] for [0, 1), [1, 2) and [2, 3)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: flat indexes sorted by interval and the number of indexes in each interval
+    """
+
+    edges = np.asarray(intervals, dtype = np.float64)
+    if edges.ndim != 1 or len(edges) < 2 or np.any(np.diff(edges) <= 0):
+        raise ValueError('intervals must be at least two strictly increasing edges')
+
+    flat = np.ravel(array)
+    n_intervals = len(edges) - 1
 
-            e.g. [(0, 1), (1, 2), (2, 3)]
+    # code 0 is below the first edge and code len(edges) above the last one or NaN
+    codes = np.empty(flat.size, dtype = np.min_scalar_type(len(edges)))
+    for start in range(0, flat.size, _CHUNK_SIZE):
+        codes[start : start + _CHUNK_SIZE] = np.searchsorted(edges, flat[start : start + _CHUNK_SIZE], side = 'right')
+
+    counts = np.bincount(codes, minlength = len(edges) + 1)[1 : len(edges)]
+    cursors = np.cumsum(counts) - counts
+    order = np.empty(counts.sum(), dtype = np.int32 if flat.size <= np.iinfo(np.int32).max else np.int64)
+
+    # counting sort, chunk by chunk so only the positions inside the intervals are kept
+    for start in range(0, codes.size, _CHUNK_SIZE):
+        chunk = codes[start : start + _CHUNK_SIZE]
+        local = np.argsort(chunk, kind = 'stable')
+        bounds = np.cumsum(np.bincount(chunk, minlength = len(edges) + 1))
+
+        for idx in range(n_intervals):
+            lower, upper = bounds[idx], bounds[idx + 1]
+            order[cursors[idx] : cursors[idx] + upper - lower] = local[lower : upper] + start
+            cursors[idx] += upper - lower
+
+    return order, counts
+
+def _interval_sample(array : np.ndarray, size : int, intervals : Iterable, replace : bool,
+                     rng : np.random.Generator | int | None, on_underpopulated : str) -> np.ndarray:
+    """Draws the flat indexes of a stratified random sample, size indexes per interval.
+
+    Args:
+        array (np.ndarray): array to be sampled
+        size (int): size for each interval
+        intervals (Iterable): strictly increasing interval edges
+        replace (bool): whether indexes can be drawn more than once
+        rng (np.random.Generator | int | None): random generator or seed
+        on_underpopulated (str): 'error', 'cap' or 'replace', see interval_choice
 
     Returns:
-        List[np.array]: list of boolean masks for the given array based on the provided pairs of limits
+        np.ndarray: flat indexes of the sample, grouped by interval
     """
 
-    return [ (vmin <= array) & (array < vmax) for vmin, vmax in pairs ]
+    if on_underpopulated not in ('error', 'cap', 'replace'):
+        raise ValueError("on_underpopulated must be 'error', 'cap' or 'replace'")
+
+    rng = np.random.default_rng(rng)
+    order, counts = _interval_groups(array, intervals)
+    starts = np.cumsum(counts) - counts
+
+    if np.any(counts == 0) and size > 0 and on_underpopulated != 'cap':
+        raise ValueError('Cannot take a sample from an empty interval')
+
+    if replace:
+        filled = counts > 0
+        positions = rng.integers(0, counts[filled, np.newaxis], (np.count_nonzero(filled), size))
+        return order[(starts[filled, np.newaxis] + positions).ravel()]
 
-def interval_choice(array : np.ndarray, size : int, intervals : Iterable, replace = True) -> np.ndarray:
+    if np.any(counts < size) and on_underpopulated == 'error':
+        raise ValueError('Cannot take a larger sample than population when replace is False')
+
+    samples = []
+    for start, count in zip(starts, counts):
+        if count >= size:
+            positions = rng.choice(count, size, replace = False)
+        elif on_underpopulated == 'replace':
+            positions = rng.integers(0, count, size)
+        else:
+            positions = rng.permutation(count)
+        samples.append(order[start + positions])
+
+    return np.concatenate(samples)
+
+def interval_choice(array : np.ndarray, size : int, intervals : Iterable, replace = True,
+                    rng : np.random.Generator | int = None, on_underpopulated : str = 'error') -> np.ndarray:
     """Generates a random sample from the given array based on the provided intervals.
 
     Args:
         array (np.ndarray): array to be sampled
         size (int): size for each interval
-        intervals (Iterable): intervals to be sampled from
-            
-                e.g. [(0, 1), (1, 2), (2, 3)]
-        replace (bool, optional): np.choice sample argument. Defaults to True.
+        intervals (Iterable): strictly increasing edges of the intervals to be sampled from
+
+                e.g. [0, 1, 2, 3] for [0, 1), [1, 2) and [2, 3)
+        replace (bool, optional): whether values can be drawn more than once. Defaults to True.
+        rng (np.random.Generator | int, optional): random generator or seed, for reproducible samples. Defaults to None.
+        on_underpopulated (str, optional): what to do with intervals holding less than size values when replace is False,
+            or no values at all. 'error' raises a ValueError, 'cap' takes every value in the interval and 'replace'
+            draws that interval with replacement. Empty intervals can only be capped. Defaults to 'error'.
 
     Returns:
         np.ndarray: Random sample from the given array based on the provided intervals.
     """
 
-    limit_masks = _get_limit_masks(array, pairwise(intervals))
-    return np.array([ np.random.choice(array[in_limits], size, replace = replace) for in_limits in limit_masks ]).ravel()
+    return np.ravel(array)[_interval_sample(array, size, intervals, replace, rng, on_underpopulated)]
 
-def arginterval_choice(array : np.ndarray, size : int, intervals : Iterable, replace = True) -> np.ndarray:
-    """Generates the indexes of a random sample from the given array based on the provided intervals.
+def arginterval_choice(array : np.ndarray, size : int, intervals : Iterable, replace = True,
+                       rng : np.random.Generator | int = None, on_underpopulated : str = 'error') -> np.ndarray:
+    """Generates the flat indexes of a random sample from the given array based on the provided intervals.
 
     Args:
         array (np.ndarray): array to be sampled
         size (int): size for each interval
-        intervals (Iterable): intervals to be sampled from
-            
-                e.g. [(0, 1), (1, 2), (2, 3)]
-        replace (bool, optional): np.choice sample argument. Defaults to True.
+        intervals (Iterable): strictly increasing edges of the intervals to be sampled from
+
+                e.g. [0, 1, 2, 3] for [0, 1), [1, 2) and [2, 3)
+        replace (bool, optional): whether indexes can be drawn more than once. Defaults to True.
+        rng (np.random.Generator | int, optional): random generator or seed, for reproducible samples. Defaults to None.
+        on_underpopulated (str, optional): 'error', 'cap' or 'replace', see interval_choice. Defaults to 'error'.
 
     Returns:
         np.ndarray: The indexes of a random sample from the given array based on the provided intervals.
     """
 
-    indexes = np.arange(array.size)
-    limit_masks = _get_limit_masks(array, pairwise(intervals))
-    return np.array([ np.random.choice(indexes[in_limits], size, replace = replace) for in_limits in limit_masks ]).ravel()
+    return _interval_sample(array, size, intervals, replace, rng, on_underpopulated)
+
+class StratifiedReservoir(object):
+    """Streaming stratified sampler that keeps size uniformly drawn samples per interval.
+
+    Every value falling in an interval gets a uniform random key and each interval keeps the
+    values with the size smallest keys, so after any number of updates it holds a uniform
+    sample without replacement of every value seen in that interval, or all of them if fewer
+    than size were seen. Memory is bounded by size per interval, and reservoirs filled by
+    different workers can be merged into the sample of the whole stream.
+
+    Args:
+        size (int): number of samples kept per interval
+        intervals (Iterable): strictly increasing interval edges
+
+                e.g. [0, 1, 2, 3] for [0, 1), [1, 2) and [2, 3)
+        seed (int | Iterable[int], optional): seed of the random keys. Workers whose reservoirs are merged
+            must use different seeds, e.g. (seed, worker). Defaults to None.
+
+    Examples:
+        >>> reservoir = StratifiedReservoir(100, [0, 2, 5, 10], seed = 0)
+        >>> for scene, image in images.items():
+        ...     reservoir.update(image.select('depth'), image.data.x.values, image.data.y.values, scene)
+        >>> sample = reservoir.sample()
+    """
+
+    def __init__(self, size : int, intervals : Iterable, seed : int | Iterable[int] = None) -> None:
+        self.size : int = size
+        self.intervals : np.ndarray = np.asarray(intervals, dtype = np.float64)
+        self.rng : np.random.Generator = np.random.default_rng(seed)
+
+        n_intervals = len(_interval_groups(np.empty(0), self.intervals)[1])
+        self.seen : np.ndarray = np.zeros(n_intervals, dtype = np.int64)
+        self._reservoirs : List[Dict[str, np.ndarray]] = [ self.__empty() for _ in range(n_intervals) ]
+
+    def update(self, values : np.ndarray, xs : np.ndarray = None, ys : np.ndarray = None, scene : Hashable = None) -> Self:
+        """Adds a block or scene to the sampled stream.
+
+        Args:
+            values (np.ndarray): values to be sampled, NaNs and values outside the intervals are ignored
+            xs (np.ndarray, optional): x coordinates with the shape of values, or of its columns if values is 2D.
+                Defaults to None, the column indexes.
+            ys (np.ndarray, optional): y coordinates with the shape of values, or of its rows if values is 2D.
+                Defaults to None, the row indexes.
+            scene (Hashable, optional): id of the block or scene stored with its samples. Defaults to None.
+
+        Returns:
+            Self: the reservoir for method chaining
+        """
+
+        values = np.asarray(values)
+        order, counts = _interval_groups(values, self.intervals)
+        keys = self.rng.random(len(order))
+        self.seen += counts
+
+        shape = values.shape if values.ndim == 2 else (1, values.size)
+        starts = np.cumsum(counts) - counts
+
+        for idx, (start, count) in enumerate(zip(starts, counts)):
+            interval_keys = keys[start : start + count]
+            candidates = interval_keys < self.__threshold(idx)
+            indexes = order[start : start + count][candidates]
+
+            rows, cols = np.unravel_index(indexes, shape)
+            self.__insert(idx, {
+                'keys' : interval_keys[candidates],
+                'values' : values.ravel()[indexes],
+                'xs' : self.__coordinates(xs, cols, indexes, values),
+                'ys' : self.__coordinates(ys, rows, indexes, values),
+                'scenes' : np.full(len(indexes), scene, dtype = object),
+            })
+
+        return self
+
+    def merge(self, other : 'StratifiedReservoir') -> Self:
+        """Adds the samples of a reservoir filled by another worker.
+
+        Args:
+            other (StratifiedReservoir): reservoir with the same size and intervals
+
+        Returns:
+            Self: the reservoir for method chaining
+        """
+
+        if other.size != self.size or not np.array_equal(other.intervals, self.intervals):
+            raise ValueError('Only reservoirs with the same size and intervals can be merged')
+
+        self.seen += other.seen
+        for idx, reservoir in enumerate(other._reservoirs):
+            self.__insert(idx, reservoir)
+
+        return self
+
+    def sample(self) -> Dict[str, np.ndarray]:
+        """Current sample, grouped by interval.
+
+        Returns:
+            Dict[str, np.ndarray]: 'values', 'xs', 'ys', 'scenes' and the 'interval' index of every sample
+        """
+
+        orders = [ np.argsort(reservoir['keys'], kind = 'stable') for reservoir in self._reservoirs ]
+        sample = { name : np.concatenate([ reservoir[name][order] for reservoir, order in zip(self._reservoirs, orders) ])
+                   for name in ('values', 'xs', 'ys', 'scenes') }
+        sample['interval'] = np.repeat(np.arange(len(self._reservoirs)), [ len(order) for order in orders ])
+
+        return sample
+
+    def __threshold(self, idx : int) -> float:
+        """Key a new value must be below to enter a full interval"""
+        keys = self._reservoirs[idx]['keys']
+        return keys.max() if len(keys) >= self.size else np.inf
+
+    def __insert(self, idx : int, candidates : Dict[str, np.ndarray]) -> None:
+        """Keeps the size smallest keys among the interval samples and the candidates"""
+
+        reservoir = { name : np.concatenate([ self._reservoirs[idx][name], candidates[name] ]) for name in candidates }
+        if len(reservoir['keys']) > self.size:
+            kept = np.argpartition(reservoir['keys'], self.size - 1)[:self.size]
+            reservoir = { name : array[kept] for name, array in reservoir.items() }
+
+        self._reservoirs[idx] = reservoir
+
+    @staticmethod
+    def __coordinates(coordinates : np.ndarray | None, axis_indexes : np.ndarray, indexes : np.ndarray, values : np.ndarray) -> np.ndarray:
+        """Coordinates of the sampled values, from full or per-axis coordinates"""
+
+        if coordinates is None:
+            return axis_indexes.astype(np.float64)
+
+        coordinates = np.asarray(coordinates, dtype = np.float64)
+        if coordinates.shape == values.shape:
+            return coordinates.ravel()[indexes]
+        return coordinates[axis_indexes]
+
+    @staticmethod
+    def __empty() -> Dict[str, np.ndarray]:
+        """Reservoir of an interval without samples"""
+        return { 'keys' : np.empty(0), 'values' : np.empty(0), 'xs' : np.empty(0), 'ys' : np.empty(0),
+                 'scenes' : np.empty(0, dtype = object) }
+
+    def __len__(self) -> int:
+        return sum(len(reservoir['keys']) for reservoir in self._reservoirs)
+
+    def __str__(self) -> str:
+        return f'StratifiedReservoir | Size: {self.size} | Samples: {len(self)} | Seen: {self.seen.sum()}'
+
+    def __repr__(self) -> str:
+        return str(self)
 
 def composite(arrays : np.ndarray, method : Callable | np.ndarray = np.nanmax) -> np.ndarray:
     """Generates a synthetic array based on the provided method.
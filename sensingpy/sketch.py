@@ -0,0 +1,369 @@
+import numpy as np
+
+from fractions import Fraction
+from typing import Dict, Self
+
+
+class _LogStore(object):
+    """
+    Dense counts of logarithmic bucket keys with a bounded number of buckets.
+
+    Parameters
+    ----------
+    max_bins : int
+        Maximum number of buckets. When exceeded, the lowest keys are collapsed
+        into the lowest key that still fits.
+    """
+
+    def __init__(self, max_bins : int) -> None:
+        self.max_bins : int = max_bins
+        self.offset : int = 0
+        self.counts : np.ndarray = np.zeros(0, dtype = np.int64)
+
+    def add(self, keys : np.ndarray) -> None:
+        """
+        Count the given bucket keys.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            1D integer bucket keys
+        """
+
+        if len(keys) == 0:
+            return
+
+        kmin, kmax = int(keys.min()), int(keys.max())
+        self.__extend(kmin, kmax)
+
+        first = max(kmin, self.offset)
+        counts = np.bincount(np.maximum(keys, first) - first)
+        self.counts[first - self.offset : first - self.offset + len(counts)] += counts
+
+    def merge(self, other : '_LogStore') -> None:
+        """
+        Add the counts of another store.
+
+        Parameters
+        ----------
+        other : _LogStore
+            Store to be merged into this one
+        """
+
+        if len(other.counts) == 0:
+            return
+
+        self.__extend(other.offset, other.offset + len(other.counts) - 1)
+
+        shift = self.offset - other.offset
+        if shift >= len(other.counts):
+            self.counts[0] += other.counts.sum()
+            return
+
+        counts = other.counts[max(shift, 0):]
+        if shift > 0:
+            counts = counts.copy()
+            counts[0] += other.counts[:shift].sum()
+
+        start = max(-shift, 0)
+        self.counts[start : start + len(counts)] += counts
+
+    def __extend(self, kmin : int, kmax : int) -> None:
+        """Grow the dense array to hold [kmin, kmax], collapsing the lowest keys if needed"""
+
+        if len(self.counts) == 0:
+            self.offset = max(kmin, kmax - self.max_bins + 1)
+            self.counts = np.zeros(kmax - self.offset + 1, dtype = np.int64)
+            return
+
+        low = min(kmin, self.offset)
+        high = max(kmax, self.offset + len(self.counts) - 1)
+        low = max(low, high - self.max_bins + 1)
+
+        counts = np.zeros(high - low + 1, dtype = np.int64)
+        keys = np.arange(self.offset, self.offset + len(self.counts))
+        np.add.at(counts, np.maximum(keys, low) - low, self.counts)
+
+        self.offset, self.counts = low, counts
+
+
+class QuantileSketch(object):
+    """
+    Mergeable quantile sketch with relative accuracy guarantees.
+
+    Values are counted in logarithmic buckets of ratio gamma = (1 + a) / (1 - a),
+    so every quantile is estimated within a relative error ``a`` of the exact
+    value of rank floor(q * (count - 1)). Positive and negative values are kept
+    in separate stores and values with magnitude below ``min_value`` are counted
+    as zeros. The sketch state only depends on the values seen, not on the order
+    or the chunking of the updates, and two sketches with the same parameters can
+    be merged exactly.
+
+    Parameters
+    ----------
+    relative_accuracy : float, optional
+        Relative error of the quantile estimates, by default 0.01
+    max_bins : int, optional
+        Maximum number of buckets per sign, by default 2048. With the default
+        accuracy this covers about 17 orders of magnitude; beyond it the values
+        closest to zero lose accuracy first.
+    min_value : float, optional
+        Magnitude below which values are counted as zero, by default 1e-9
+
+    Attributes
+    ----------
+    count : int
+        Number of values added to the sketch, NaNs excluded
+    min : float
+        Minimum value added to the sketch
+    max : float
+        Maximum value added to the sketch
+
+    Notes
+    -----
+    The structure follows DDSketch: Masson, C., Rim, J. E., & Lee, H. K. (2019).
+    DDSketch: a fast and fully-mergeable quantile sketch with relative-error
+    guarantees. Proceedings of the VLDB Endowment, 12(12), 2195-2205.
+    https://doi.org/10.14778/3352063.3352135
+    """
+
+    def __init__(self, relative_accuracy : float = 0.01, max_bins : int = 2048, min_value : float = 1e-9) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be between 0 and 1')
+
+        self.relative_accuracy : float = relative_accuracy
+        self.max_bins : int = max_bins
+        self.min_value : float = min_value
+        self.gamma : float = (1 + relative_accuracy) / (1 - relative_accuracy)
+
+        self.count : int = 0
+        self.zero_count : int = 0
+        self.min : float = np.inf
+        self.max : float = -np.inf
+        self._positive : _LogStore = _LogStore(max_bins)
+        self._negative : _LogStore = _LogStore(max_bins)
+
+    def update(self, values : np.ndarray) -> Self:
+        """
+        Add values to the sketch.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Values of any shape, NaNs are ignored
+
+        Returns
+        -------
+        Self
+            Returns the sketch for method chaining
+        """
+
+        values = np.asarray(values, dtype = np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        magnitude = np.abs(values)
+        is_zero = magnitude < self.min_value
+        self.zero_count += int(np.count_nonzero(is_zero))
+
+        is_positive = (values > 0) & ~is_zero
+        is_negative = (values < 0) & ~is_zero
+        self._positive.add(self._key(magnitude[is_positive]))
+        self._negative.add(self._key(magnitude[is_negative]))
+
+        return self
+
+    def merge(self, other : 'QuantileSketch') -> Self:
+        """
+        Merge another sketch into this one.
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            Sketch built with the same relative_accuracy and min_value
+
+        Returns
+        -------
+        Self
+            Returns the sketch for method chaining
+
+        Raises
+        ------
+        ValueError
+            If both sketches were built with different parameters
+        """
+
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError('Only sketches with the same relative_accuracy and min_value can be merged')
+
+        self.count += other.count
+        self.zero_count += other.zero_count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._positive.merge(other._positive)
+        self._negative.merge(other._negative)
+
+        return self
+
+    def quantile(self, q : float | np.ndarray) -> float | np.ndarray:
+        """
+        Estimate quantiles of the values added so far.
+
+        Parameters
+        ----------
+        q : float or np.ndarray
+            Quantile or quantiles to estimate, between 0 and 1
+
+        Returns
+        -------
+        float or np.ndarray
+            Estimated quantiles, NaN if the sketch is empty
+        """
+
+        q = np.asarray(q, dtype = np.float64)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError('Quantiles must be between 0 and 1')
+
+        if self.count == 0:
+            result = np.full(q.shape, np.nan)
+        else:
+            negative_keys = np.arange(self._negative.offset, self._negative.offset + len(self._negative.counts))[::-1]
+            positive_keys = np.arange(self._positive.offset, self._positive.offset + len(self._positive.counts))
+
+            values = np.concatenate([ -self._value(negative_keys), [0.], self._value(positive_keys) ])
+            counts = np.concatenate([ self._negative.counts[::-1], [self.zero_count], self._positive.counts ])
+
+            rank = np.floor(q * (self.count - 1))
+            position = np.searchsorted(np.cumsum(counts), rank, side = 'right')
+            result = np.clip(values[position], self.min, self.max)
+
+        return float(result) if result.ndim == 0 else result
+
+    def _key(self, magnitude : np.ndarray) -> np.ndarray:
+        """Logarithmic bucket keys of positive magnitudes"""
+        return np.ceil(np.log(magnitude) / np.log(self.gamma)).astype(np.int64)
+
+    def _value(self, keys : np.ndarray) -> np.ndarray:
+        """Representative magnitude of each bucket, within relative_accuracy of any value in it"""
+        return 2 * self.gamma ** keys.astype(np.float64) / (self.gamma + 1)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __str__(self) -> str:
+        return f'QuantileSketch | N: {self.count} | Accuracy: {self.relative_accuracy}'
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class ExactSum(object):
+    """
+    Mergeable sum of floating point values without rounding errors.
+
+    Every value is split into an integer mantissa and a binary exponent, and the
+    mantissas are accumulated as Python integers per exponent. The result is the
+    exact sum of the values seen, so it does not depend on the order or the
+    chunking of the updates, unlike a running float sum.
+
+    Attributes
+    ----------
+    count : int
+        Number of values added, non finite values excluded
+    """
+
+    CHUNK_SIZE : int = 2**24
+
+    def __init__(self) -> None:
+        self.count : int = 0
+        self._parts : Dict[int, int] = {}
+
+    def update(self, values : np.ndarray) -> Self:
+        """
+        Add values to the sum.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Values of any shape, non finite values are ignored
+
+        Returns
+        -------
+        Self
+            Returns the sum for method chaining
+        """
+
+        values = np.asarray(values, dtype = np.float64).ravel()
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+
+        for start in range(0, len(values), self.CHUNK_SIZE):
+            mantissa, exponent = np.frexp(values[start : start + self.CHUNK_SIZE])
+            integer = np.ldexp(mantissa, 53).astype(np.int64)
+
+            # Halves below 2**27 keep the float64 bincount sums exact for CHUNK_SIZE values
+            high = integer >> 26
+            low = integer - (high << 26)
+            emin = int(exponent.min())
+            keys = exponent - emin
+
+            high_sums = np.bincount(keys, weights = high)
+            low_sums = np.bincount(keys, weights = low)
+            for key in np.flatnonzero((high_sums != 0) | (low_sums != 0)):
+                total = (int(high_sums[key]) << 26) + int(low_sums[key])
+                exp = int(key) + emin - 53
+                self._parts[exp] = self._parts.get(exp, 0) + total
+
+        return self
+
+    def merge(self, other : 'ExactSum') -> Self:
+        """
+        Add the values of another sum.
+
+        Parameters
+        ----------
+        other : ExactSum
+            Sum to be merged into this one
+
+        Returns
+        -------
+        Self
+            Returns the sum for method chaining
+        """
+
+        self.count += other.count
+        for exp, total in other._parts.items():
+            self._parts[exp] = self._parts.get(exp, 0) + total
+
+        return self
+
+    def exact(self) -> Fraction:
+        """
+        Exact value of the sum.
+
+        Returns
+        -------
+        Fraction
+            Sum of all the values added
+        """
+
+        if not self._parts:
+            return Fraction(0)
+
+        emin = min(self._parts)
+        total = sum(part << (exp - emin) for exp, part in self._parts.items())
+        return Fraction(total) * Fraction(2) ** emin
+
+    def __float__(self) -> float:
+        return float(self.exact())
+
+    def __str__(self) -> str:
+        return f'ExactSum | N: {self.count} | Sum: {float(self)}'
+
+    def __repr__(self) -> str:
+        return str(self)
@@ -21,7 +21,7 @@ requirements = [
     'sphinx-book-theme==1.1.4','sphinx-rtd-theme==3.0.2','sphinxcontrib-applehelp==2.0.0','sphinxcontrib-devhelp==2.0.0','sphinxcontrib-htmlhelp==2.1.0',
     'sphinxcontrib-jquery==4.1','sphinxcontrib-jsmath==1.0.1','sphinxcontrib-qthelp==2.0.0','sphinxcontrib-serializinghtml==2.0.0','stack-data==0.6.3',
     'threadpoolctl==3.6.0','tinycss2==1.4.0','tornado==6.4.2','traitlets==5.14.3','typing_extensions==4.13.1','tzdata==2025.2','urllib3==2.3.0',
-    'wcwidth==0.2.13','webencodings==0.5.1','xarray==2025.3.1','xyzservices==2025.1.0'
+    'wcwidth==0.2.13','webencodings==0.5.1','xarray==2025.3.1','xyzservices==2025.1.0','zarr==3.1.6'
 ]
 
 setup(
@@ -0,0 +1,104 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+
+from rasterio.windows import Window
+from sensingpy import reader
+from sensingpy.cache import BLOCK_CACHE, BlockCache, DatasetPool
+
+
+class Test_BlockCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        """Test the least recently used blocks are evicted when the cache is full."""
+        cache = BlockCache(max_bytes = 3 * 80)
+        for key in range(3):
+            cache.get(key, lambda: np.zeros(10))
+        cache.get(0, lambda: np.ones(10))
+        cache.get(3, lambda: np.zeros(10))
+
+        self.assertNotIn(1, cache)
+        self.assertEqual([ key in cache for key in (0, 2, 3) ], [ True, True, True ])
+        self.assertEqual((cache.hits, cache.misses, cache.nbytes), (1, 4, 240))
+        np.testing.assert_array_equal(cache.get(0, lambda: np.ones(10)), np.zeros(10))
+
+    def test_blocks_are_read_only(self):
+        """Test cached blocks cannot be modified and pickled caches arrive empty."""
+        cache = BlockCache()
+        block = cache.get('a', lambda: np.zeros(4))
+
+        with self.assertRaises(ValueError):
+            block[0] = 1
+        self.assertEqual(len(pickle.loads(pickle.dumps(cache))), 0)
+        self.assertEqual(len(cache), 1)
+
+
+class Test_DatasetPool(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.paths = [ os.path.join(self.folder.name, f'{name}.txt') for name in 'abc' ]
+        for path in self.paths:
+            with open(path, 'w') as file:
+                file.write('data')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_handles_are_reused(self):
+        """Test handles return to the pool, rewritten files are reopened and idle handles are bounded."""
+        pool = DatasetPool(max_handles = 2)
+
+        with pool.open(self.paths[0], open) as first:
+            with pool.open(self.paths[0], open) as second:
+                self.assertIsNot(first, second)
+        with pool.open(self.paths[0], open) as third:
+            self.assertIs(third, first)
+        self.assertEqual((pool.hits, pool.misses, len(pool)), (1, 2, 2))
+
+        with open(self.paths[0], 'a') as file:
+            file.write('more data')
+        with pool.open(self.paths[0], open) as fourth:
+            self.assertTrue(first.closed and second.closed)
+            self.assertEqual(fourth.read(), 'datamore data')
+
+        with pool.open(self.paths[1], open) as fifth, pool.open(self.paths[2], open):
+            pass
+        self.assertTrue(fourth.closed)
+        self.assertFalse(fifth.closed)
+        self.assertEqual(len(pool), 2)
+
+        pool.clear()
+        self.assertTrue(fifth.closed)
+
+    def test_windowed_reads_use_cache(self):
+        """Test repeated windowed reads decode every block once."""
+        path = os.path.join(self.folder.name, 'scene.tif')
+        image = reader.open('tests/files/20241226.tif')
+        image.to_tif(path, blocksize = 64)
+
+        misses = BLOCK_CACHE.misses
+        first = reader.open(path, window = Window(10, 10, 50, 50), bands = [ 'ndwi' ])
+        self.assertEqual(BLOCK_CACHE.misses - misses, 1)
+
+        hits = BLOCK_CACHE.hits
+        second = reader.open(path, window = Window(20, 0, 100, 60), bands = [ 'ndwi' ])
+        self.assertEqual((BLOCK_CACHE.hits - hits, BLOCK_CACHE.misses - misses), (1, 2))
+
+        np.testing.assert_array_equal(first.select('ndwi'), image.select('ndwi')[10:60, 10:60])
+        np.testing.assert_array_equal(second.select('ndwi'), image.select('ndwi')[:60, 20:120])
+
+    def test_writers_discard_handles(self):
+        """Test files that were read can be overwritten while their handles are pooled."""
+        path = os.path.join(self.folder.name, 'scene.nc')
+        image = reader.open('tests/files/20241226.tif')
+        image.to_netcdf(path)
+        reader.open(path)
+
+        image.drop_bands([ band for band in image.band_names if band != 'ndwi' ])
+        image.to_netcdf(path)
+        self.assertEqual(reader.open(path).band_names, [ 'ndwi' ])
+
+
+if __name__ == '__main__':
+    unittest.main()
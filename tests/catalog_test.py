@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+
+from datetime import datetime, timezone
+from shapely.geometry import box
+from sensingpy import reader
+from sensingpy.catalog import Catalog
+
+
+class Test_Catalog(unittest.TestCase):
+    def setUp(self):
+        """Write scenes in several formats with dates in their names."""
+        self.image = reader.open('tests/files/20241226.tif')
+        self.image.drop_bands(self.image.band_names[3:-2])
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = lambda name: os.path.join(self.folder.name, name)
+
+        north = self.image.copy()
+        north.data = north.data.isel(y = slice(0, 80), x = slice(0, 100))
+        north.to_tif(self.path('S2_20240601T103021.tif'))
+
+        south = self.image.copy()
+        south.data = south.data.isel(y = slice(100, None))
+        south.drop_bands([ 'Rrs_B1' ])
+        south.to_netcdf(self.path('scene_20240715.nc'))
+        south.to_zarr(self.path('scene_20240801.zarr'))
+
+        self.image.to_tif(self.path('mosaic.tif'))
+        self.catalog = Catalog(':memory:')
+        self.catalog.scan(self.folder.name)
+
+    def tearDown(self):
+        self.catalog.close()
+        self.folder.cleanup()
+
+    def test_scene_headers(self):
+        """Test headers are indexed for every format with their acquisition times."""
+        self.assertEqual(len(self.catalog), 4)
+
+        scene = self.catalog.scene(self.path('S2_20240601T103021.tif'))
+        self.assertEqual(scene.crs, self.image.crs)
+        self.assertEqual((scene.width, scene.height), (100, 80))
+        self.assertEqual(scene.transform, self.image.transform)
+        self.assertEqual(scene.bands, tuple(self.image.band_names))
+        self.assertEqual(scene.acquired, datetime(2024, 6, 1, 10, 30, 21, tzinfo = timezone.utc))
+
+        scene = self.catalog.scene(self.path('scene_20240801.zarr'))
+        self.assertEqual(scene.height, self.image.height - 100)
+        self.assertEqual(scene.acquired, datetime(2024, 8, 1, tzinfo = timezone.utc))
+        self.assertIsNone(self.catalog.scene(self.path('mosaic.tif')).acquired)
+
+    def test_search(self):
+        """Test searches by geometry, time range and bands."""
+        names = lambda paths: [ os.path.basename(path) for path in paths ]
+        north = box(self.image.left, self.image.top - 100, self.image.left + 100, self.image.top)
+
+        self.assertEqual(names(self.catalog.search()), [ 'S2_20240601T103021.tif', 'scene_20240715.nc', 'scene_20240801.zarr', 'mosaic.tif' ])
+        self.assertEqual(names(self.catalog.search(north, crs = self.image.crs)), [ 'S2_20240601T103021.tif', 'mosaic.tif' ])
+        self.assertEqual(names(self.catalog.search(time_range = ('2024-07-01', None))), [ 'scene_20240715.nc', 'scene_20240801.zarr' ])
+        self.assertEqual(names(self.catalog.search(time_range = (None, datetime(2024, 7, 15)))), [ 'S2_20240601T103021.tif', 'scene_20240715.nc' ])
+        self.assertEqual(names(self.catalog.search(bands = [ 'Rrs_B1', 'Rrs_B2' ])), [ 'S2_20240601T103021.tif', 'mosaic.tif' ])
+        self.assertEqual(names(self.catalog.search(north, ('2024-07-01', None), crs = self.image.crs)), [])
+        self.assertEqual(reader.open(self.catalog.search(north, crs = self.image.crs)[0]).width, 100)
+
+    def test_incremental_add(self):
+        """Test unchanged files are skipped and changed or removed files are updated."""
+        self.assertEqual(self.catalog.scan(self.folder.name), 0)
+
+        north = self.image.copy()
+        north.data = north.data.isel(y = slice(0, 50))
+        north.to_tif(self.path('S2_20240601T103021.tif'))
+        os.utime(self.path('S2_20240601T103021.tif'), (0, 0))
+
+        self.assertEqual(self.catalog.add([ self.path('S2_20240601T103021.tif') ]), 1)
+        self.assertEqual(self.catalog.scene(self.path('S2_20240601T103021.tif')).height, 50)
+
+        self.catalog.remove([ self.path('mosaic.tif') ])
+        self.assertEqual(len(self.catalog), 3)
+        with self.assertRaises(ValueError):
+            self.catalog.scene(self.path('mosaic.tif'))
+
+        os.remove(self.path('scene_20240715.nc'))
+        other = Catalog(':memory:')
+        other.add([ 'tests/files/20241226.tif' ])
+        self.assertEqual(other.scan(self.folder.name), 3)
+        self.assertEqual(self.catalog.scan(self.folder.name), 1)
+        self.assertEqual(len(self.catalog), 3)
+        self.assertEqual(len(other), 4)
+        with self.assertRaises(ValueError):
+            self.catalog.scene(self.path('scene_20240715.nc'))
+        other.close()
+
+
+    def test_unreadable_files(self):
+        """Test files that cannot be read are skipped and reported while the others are indexed."""
+        with open(self.path('broken.tif'), 'wb') as file:
+            file.write(b'not a GeoTIFF')
+        os.remove(self.path('mosaic.tif'))
+
+        catalog = Catalog(':memory:')
+        with self.assertWarns(UserWarning):
+            self.assertEqual(catalog.scan(self.folder.name), 3)
+        self.assertEqual(list(catalog.failed), [ self.path('broken.tif') ])
+
+        with self.assertWarns(UserWarning):
+            self.assertEqual(catalog.add([ self.path('mosaic.tif'), self.path('broken.tif') ]), 0)
+        self.assertEqual(sorted(catalog.failed), [ self.path('broken.tif'), self.path('mosaic.tif') ])
+        self.assertEqual(len(catalog), 3)
+        catalog.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import json
+import warnings
+import numpy as np
+
+from sensingpy.preprocessing import deglinting
+
+
+class Test_Deglinting(unittest.TestCase):
+    def setUp(self):
+        """Set up a glinted scene with three bands and a deep water area."""
+        rng = np.random.default_rng(0)
+        self.nir = rng.uniform(0.01, 0.05, (40, 30)).astype(np.float32)
+        self.slopes = np.array([0.8, 0.5, 0.2])
+        self.bands = np.array([ 0.05 + slope * self.nir + rng.normal(0, 1e-3, self.nir.shape)
+                                for slope in self.slopes ]).astype(np.float32)
+        self.bands[1, 0, 0] = np.nan
+        self.deep = np.zeros(self.nir.shape, dtype = bool)
+        self.deep[20:] = True
+
+    def reference(self, band, fit):
+        """Per band reference computation with the deep water samples."""
+        deep_value, deep_nir = band[self.deep], self.nir[self.deep]
+        is_valid = ~np.isnan(deep_value) & ~np.isnan(deep_nir)
+        return fit(deep_nir[is_valid].astype(np.float64), deep_value[is_valid].astype(np.float64))
+
+    def test_hedley(self):
+        """Test hedley matches per band polyfit and corrects in place."""
+        bands = self.bands.copy()
+        result = deglinting.hedley(self.deep, bands, self.nir, block_size = 7)
+
+        self.assertIs(result, bands)
+        for idx in range(len(bands)):
+            m = self.reference(self.bands[idx], lambda x, y: np.polyfit(x, y, 1)[0])
+            expected = self.bands[idx] - m * (self.nir - self.nir[self.deep].min())
+            expected[expected < 0] = np.nan
+            self.assertTrue(np.allclose(result[idx], expected, atol = 1e-6, equal_nan = True))
+
+    def test_lyzenga(self):
+        """Test lyzenga matches per band covariance."""
+        result = deglinting.lyzenga(self.deep, self.bands.copy(), self.nir)
+
+        for idx in range(len(self.bands)):
+            m = self.reference(self.bands[idx], lambda x, y: np.cov(x, y)[0, 1])
+            expected = self.bands[idx] - m * (self.nir - self.nir[self.deep].mean())
+            self.assertTrue(np.allclose(result[idx], expected, atol = 1e-6, equal_nan = True))
+
+    def test_joyce(self):
+        """Test joyce removes the glint and uses a histogram mode within the NIR range, ignoring NaN NIR values."""
+        result = deglinting.joyce(self.deep, self.bands.astype(np.float64), self.nir, bins = 10)
+
+        self.assertTrue(np.all(np.nanstd(result, axis = (1, 2)) < np.nanstd(self.bands, axis = (1, 2))))
+
+        nir = self.nir.copy()
+        nir[25, 3] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            deglinting.joyce(self.deep, self.bands.astype(np.float64), nir, bins = 10)
+
+    def test_fit_apply_matches_hedley(self):
+        """Test fit on every pixel then apply gives the hedley result without modifying inputs."""
+        model = deglinting.fit(self.deep, self.bands, self.nir, 'hedley')
+        corrected = model.apply(self.bands, self.nir)
+
+        self.assertFalse(np.shares_memory(corrected, self.bands))
+        expected = deglinting.hedley(self.deep, self.bands.copy(), self.nir)
+        self.assertTrue(np.array_equal(corrected, expected, equal_nan = True))
+
+    def test_fit_sample_reproducible(self):
+        """Test stratified samples are reproducible and the model can be serialized."""
+        first = deglinting.fit(self.deep, self.bands, self.nir, 'lyzenga', sample_size = 100, seed = 2, block_shape = (8, 8))
+        second = deglinting.fit(self.deep, self.bands, self.nir, 'lyzenga', sample_size = 100, seed = 2, block_shape = (8, 8))
+        partial = deglinting.fit(self.deep, self.bands, self.nir, 'hedley', seed = 2, block_shape = (8, 8), block_fraction = 0.5)
+
+        self.assertTrue(np.array_equal(first.slopes, second.slopes))
+        self.assertTrue(np.allclose(partial.slopes, self.slopes, atol = 0.1))
+
+        restored = deglinting.GlintModel.from_dict(json.loads(json.dumps(first.to_dict())))
+        self.assertTrue(np.array_equal(restored.slopes, first.slopes))
+        self.assertTrue(np.array_equal(restored.references, first.references))
+
+    def test_integer_input(self):
+        """Test integer bands are corrected into a float32 copy."""
+        bands = np.nan_to_num(self.bands * 10_000).astype(np.uint16)
+        result = deglinting.hedley(self.deep, bands, self.nir * 10_000)
+        self.assertEqual(result.dtype, np.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import numpy as np
+
+from sensingpy import expression
+from sensingpy.expression import band, inrange, valid
+
+
+class Test_Expression(unittest.TestCase):
+    def setUp(self):
+        """Set up bands with NaNs used across multiple tests."""
+        rng = np.random.default_rng(0)
+        self.bands = { 'ndwi' : rng.uniform(-1, 1, (50, 37)), 'red' : rng.uniform(0, 0.4, (50, 37)) }
+        self.bands['red'][::7, ::3] = np.nan
+        self.expected = (self.bands['ndwi'] > 0) & (self.bands['red'] >= 0) & (self.bands['red'] <= 0.2)
+
+    def test_parse_matches_numpy(self):
+        """Test parsed expressions match numpy, whatever the block size."""
+        mask = expression.parse('(ndwi > 0) & inrange(red, 0, 0.2)')
+
+        self.assertEqual(mask.bands, { 'ndwi', 'red' })
+        for block_size in (1, 100, 10**6):
+            np.testing.assert_array_equal(mask.evaluate(self.bands, block_size = block_size), self.expected)
+
+    def test_operators_match_parser(self):
+        """Test expressions built with operators match parsed ones."""
+        built = (band('ndwi') > 0) & inrange(band('red'), 0, 0.2) | ~valid(band('red'))
+        parsed = expression.parse('ndwi > 0 and 0 <= red <= 0.2 or not valid(red)')
+
+        np.testing.assert_array_equal(built.evaluate(self.bands), parsed.evaluate(self.bands))
+        np.testing.assert_array_equal(built.evaluate(self.bands), self.expected | np.isnan(self.bands['red']))
+
+    def test_packed_and_out(self):
+        """Test bit-packed and preallocated outputs."""
+        mask = expression.parse("(band('ndwi') > 0) & inrange(red, 0, 0.2)")
+        packed = mask.evaluate(self.bands, packed = True, block_size = 37 * 3)
+        self.assertEqual(packed.shape, (50, 5))
+        np.testing.assert_array_equal(np.unpackbits(packed, axis = -1, count = 37).astype(bool), self.expected)
+
+        out = np.zeros((50, 37), dtype = bool)
+        self.assertIs(mask.evaluate(self.bands, out = out), out)
+        np.testing.assert_array_equal(out, self.expected)
+
+    def test_unsupported_syntax(self):
+        """Test only whitelisted syntax is parsed."""
+        for text in ('__import__("os")', 'ndwi.real > 0', 'inrange(red, 0)', 'ndwi >'):
+            with self.assertRaises(ValueError):
+                expression.parse(text)
+        with self.assertRaises(TypeError):
+            bool(band('ndwi') > 0)
+
+    def test_arithmetic_matches_numpy(self):
+        """Test arithmetic expressions match numpy whatever the threads and block size."""
+        ndwi, red = self.bands['ndwi'], self.bands['red']
+        cases = {
+            '(ndwi - red) / (ndwi + red)' : (ndwi - red) / (ndwi + red),
+            '-ndwi ** 2 + 2 * abs(red) - 1 / (1 + red)' : -ndwi ** 2 + 2 * np.abs(red) - 1 / (1 + red),
+            'log(red * 1000) / log(abs(ndwi) * 1000)' : np.log(red * 1000) / np.log(np.abs(ndwi) * 1000),
+            'where(ndwi > 0, sqrt(red), nan)' : np.where(ndwi > 0, np.sqrt(red), np.nan),
+        }
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            for text, expected in cases.items():
+                for workers in (1, 4):
+                    result = expression.parse(text).evaluate(self.bands, block_size = 200, workers = workers)
+                    np.testing.assert_allclose(result, expected, equal_nan = True, err_msg = text)
+
+        built = (band('ndwi') - band('red')) / (band('ndwi') + band('red'))
+        np.testing.assert_array_equal(built.evaluate(self.bands), expression.parse(str(built)).evaluate(self.bands))
+
+    def test_inputs_are_not_modified(self):
+        """Test in-place evaluation never writes into the input bands."""
+        bands = { name : array.astype(np.float32) for name, array in self.bands.items() }
+        copies = { name : array.copy() for name, array in bands.items() }
+        result = expression.parse('(ndwi * 2 + red) * 3 - ndwi').evaluate(bands)
+
+        self.assertEqual(result.dtype, np.float32)
+        for name in bands:
+            np.testing.assert_array_equal(bands[name], copies[name])
+
+    def test_iter_blocks(self):
+        """Test several expressions are evaluated together block by block in order."""
+        blocks = list(expression.iter_blocks([ band('ndwi') + 1, band('red') > 0.1 ], self.bands, block_size = 37 * 10, workers = 2))
+
+        self.assertEqual([ rows.start for rows, _ in blocks ], [ 0, 10, 20, 30, 40 ])
+        np.testing.assert_array_equal(np.concatenate([ values[0] for _, values in blocks ]), self.bands['ndwi'] + 1)
+
+    def test_shared_subexpressions(self):
+        """Test subexpressions shared between expressions are computed once per block and never overwritten."""
+        calls = []
+        expression.FUNCTIONS['traced'] = (lambda array: calls.append(1) or np.log(array), 1)
+        try:
+            exprs = { 'first' : expression.parse('traced(red * 10) + 1'), 'second' : expression.parse('traced(red * 10) * 2') }
+            result = expression.evaluate_many(exprs, self.bands, workers = 1)
+        finally:
+            del expression.FUNCTIONS['traced']
+
+        self.assertEqual(len(calls), 1)
+        np.testing.assert_allclose(result['first'], np.log(self.bands['red'] * 10) + 1, equal_nan = True)
+        np.testing.assert_allclose(result['second'], np.log(self.bands['red'] * 10) * 2, equal_nan = True)
+
+    def test_substitute(self):
+        """Test bands can be replaced by expressions or constants."""
+        formula = expression.parse('log(blue * n)').substitute({ 'blue' : band('red'), 'n' : 10 })
+
+        self.assertEqual(formula.bands, { 'red' })
+        self.assertEqual(formula.key, expression.parse('log(red * 10)').key)
+
+
+if __name__ == '__main__':
+    unittest.main()
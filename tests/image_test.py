@@ -0,0 +1,251 @@
+import os
+import tempfile
+import unittest
+import warnings
+import numpy as np
+import rasterio
+import xarray as xr
+import zarr
+
+from shapely.geometry import box
+from sensingpy import reader
+from sensingpy.preprocessing import deglinting, outliers
+
+
+class Test_Image(unittest.TestCase):
+    def setUp(self):
+        """Read the test image used across multiple tests."""
+        self.image = reader.open('tests/files/20241226.tif')
+        self.bands = ['Rrs_B2', 'Rrs_B3', 'Rrs_B4']
+
+    def test_deglint_in_place(self):
+        """Test deglint with geometries matches hedley over the rasterized deep water mask."""
+        deep_water = box(self.image.left, self.image.bottom, self.image.right, self.image.bottom + 50 * self.image.y_res)
+        deep_mask = np.zeros((self.image.height, self.image.width), dtype = bool)
+        deep_mask[-50:] = True
+
+        expected = deglinting.hedley(deep_mask, self.image.select(self.bands), self.image.select('Rrs_B8'))
+        values = self.image.data['Rrs_B2'].values
+
+        self.image.deglint('hedley', self.bands, 'Rrs_B8', deep_water = [deep_water])
+
+        self.assertIs(self.image.data['Rrs_B2'].values, values)
+        self.assertTrue(np.allclose(self.image.select(self.bands), expected, equal_nan = True))
+
+    def test_deglint_mask(self):
+        """Test deglint with a boolean mask and sampling."""
+        deep_mask = np.zeros((self.image.height, self.image.width), dtype = bool)
+        deep_mask[-50:, 10:100] = True
+
+        self.image.deglint('lyzenga', self.bands, 'Rrs_B8', deep_water = deep_mask, sample_size = 500, seed = 0)
+        self.assertTrue(np.isfinite(self.image.select('Rrs_B2')).any())
+
+    def test_remove_outliers(self):
+        """Test outlier filters are applied band by band in place."""
+        values = self.image.data['Rrs_B2'].values
+        expected = outliers.hampel(values, 5)
+
+        self.image.remove_outliers(outliers.hampel, self.bands, window = 5)
+
+        self.assertIs(self.image.data['Rrs_B2'].values, values)
+        np.testing.assert_array_equal(values, expected)
+
+    def test_mask_expression(self):
+        """Test masking with an expression over band names."""
+        red = self.image.select('Rrs_B4')
+        expected = np.where((self.image.select('ndwi') > 0) & (red <= 0.02), red, np.nan)
+
+        self.image.mask('(ndwi > 0) & inrange(Rrs_B4, -1, 0.02)', 'Rrs_B4')
+        np.testing.assert_array_equal(self.image.select('Rrs_B4'), expected)
+
+    def test_expr(self):
+        """Test band math expressions match numpy and can be added as bands."""
+        green, nir = self.image.select('Rrs_B3'), self.image.select('Rrs_B8')
+        expected = (green - nir) / (green + nir)
+
+        np.testing.assert_allclose(self.image.expr('(Rrs_B3 - Rrs_B8) / (Rrs_B3 + Rrs_B8)'), expected, equal_nan = True)
+        np.testing.assert_allclose(self.image.normalized_diference('Rrs_B3', 'Rrs_B8'), expected, equal_nan = True)
+
+        self.image.add_band('ratio', self.image.band('Rrs_B3') / self.image.band('Rrs_B8'))
+        np.testing.assert_allclose(self.image.select('ratio'), green / nir, equal_nan = True)
+        with self.assertRaises(ValueError):
+            self.image.expr('Rrs_B3 + missing')
+
+    def test_expr_to_tif(self):
+        """Test expressions are streamed to a multiband GeoTIFF."""
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'indices.tif')
+            self.image.expr_to_tif(filename, { 'sum' : 'Rrs_B3 + Rrs_B4', 'double' : 'Rrs_B3 * 2' }, block_size = 147 * 20)
+
+            with rasterio.open(filename) as src:
+                self.assertEqual(src.descriptions, ('sum', 'double'))
+                self.assertEqual(src.transform, self.image.transform)
+                np.testing.assert_allclose(src.read(2), self.image.select('Rrs_B3') * 2, equal_nan = True)
+
+    def test_compute_indices(self):
+        """Test several indices are added as bands or written to a single file."""
+        blue, green = self.image.select('Rrs_B2'), self.image.select('Rrs_B3')
+        self.image.compute_indices([ 'NDWI', 'pSDB_green' ], band_format = 'Rrs_{}')
+
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            expected = np.log(blue * np.pi * 1000) / np.log(green * np.pi * 1000)
+        np.testing.assert_allclose(self.image.select('pSDB_green'), expected, rtol = 1e-5, equal_nan = True)
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'indices.tif')
+            self.image.compute_indices([ 'NDWI', 'pSDB_green', 'pSDB_red' ], band_format = 'Rrs_{}', filename = filename)
+
+            with rasterio.open(filename) as src:
+                self.assertEqual(src.count, 3)
+                np.testing.assert_allclose(src.read(1), self.image.select('NDWI'), equal_nan = True)
+
+    def test_to_tif_options(self):
+        """Test tiled, compressed GeoTIFFs keep values, a common dtype and NaN nodata."""
+        self.image.drop_bands([ band for band in self.image.band_names if band not in self.bands ])
+        self.image.add_band('count', np.arange(self.image.height * self.image.width, dtype = np.int32).reshape(self.image.height, self.image.width))
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'image.tif')
+            self.image.to_tif(filename, blocksize = 64, compress = 'lzw')
+
+            with rasterio.open(filename) as src:
+                self.assertEqual(src.block_shapes[0], (64, 64))
+                self.assertEqual(src.compression.name, 'lzw')
+                self.assertEqual(src.dtypes[0], 'float64')
+                self.assertTrue(np.isnan(src.nodata))
+                np.testing.assert_array_equal(src.read(4), self.image.select('count'))
+                np.testing.assert_allclose(src.read(1), self.image.select('Rrs_B2'), equal_nan = True)
+
+    def test_to_tif_cog(self):
+        """Test Cloud-Optimized GeoTIFFs are written with overviews."""
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'image.tif')
+            self.image.to_tif(filename, cog = True, blocksize = 64, overviews = [2, 4])
+
+            self.assertEqual(os.listdir(folder), [ 'image.tif' ])
+            with rasterio.open(filename) as src:
+                self.assertEqual(src.tags(ns = 'IMAGE_STRUCTURE')['LAYOUT'], 'COG')
+                self.assertEqual(src.overviews(1), [ 2, 4 ])
+                self.assertEqual(src.descriptions, tuple(self.image.band_names))
+                np.testing.assert_allclose(src.read(2), self.image.select(self.image.band_names[1]), equal_nan = True)
+
+    def test_to_netcdf_encoding(self):
+        """Test NetCDF bands are chunked, packed and read back without modifying the image."""
+        self.image.drop_bands([ band for band in self.image.band_names if band not in self.bands ])
+        attrs = dict(self.image.data.attrs)
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'image.nc')
+            self.image.to_netcdf(filename, chunks = (32, 64), pack = { 'Rrs_B2': 'int16' }, encoding = { 'Rrs_B4': { 'zlib': False } })
+
+            self.assertEqual(self.image.data.attrs, attrs)
+            with xr.open_dataset(filename) as src:
+                self.assertEqual(src['Rrs_B2'].encoding['dtype'], np.int16)
+                self.assertEqual(src['Rrs_B3'].encoding['chunksizes'], (32, 64))
+                self.assertFalse(src['Rrs_B4'].encoding['zlib'])
+                np.testing.assert_allclose(src['Rrs_B2'].values, self.image.select('Rrs_B2'), atol = src['Rrs_B2'].encoding['scale_factor'])
+                np.testing.assert_array_equal(src['Rrs_B3'].values, self.image.select('Rrs_B3'))
+
+            self.assertEqual(reader.open(filename).crs, self.image.crs)
+
+    def test_append_to_packed_netcdf(self):
+        """Test appending values outside the range of packed bands fails unless a pack range covers them, and NaNs are not cast."""
+        self.image.drop_bands([ band for band in self.image.band_names if band not in self.bands ])
+        later = self.image.copy()
+        later.data = later.data * 10 + 5
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'image.nc')
+            self.image.to_netcdf(filename, pack = 'int16', time = '2024-12-26')
+            with self.assertRaises(ValueError):
+                later.append_to_netcdf(filename, time = '2024-12-27')
+
+            self.image.to_netcdf(filename, pack = 'int16', time = '2024-12-26', pack_range = (-10, 20))
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', RuntimeWarning)
+                later.append_to_netcdf(filename, time = '2024-12-27')
+            with xr.open_dataset(filename) as src:
+                np.testing.assert_allclose(src['Rrs_B3'].values[1], later.select('Rrs_B3'), atol = src['Rrs_B3'].encoding['scale_factor'])
+
+    def test_append_to_netcdf(self):
+        """Test tiles and time steps are written into their place of an existing NetCDF file."""
+        self.image.drop_bands([ band for band in self.image.band_names if band not in self.bands ])
+        tile = self.image.copy()
+        tile.data = tile.data.isel(y = slice(40, 90), x = slice(30, 100))
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'image.nc')
+            self.image.to_netcdf(filename, chunks = 16, time = '2024-12-26')
+            tile.append_to_netcdf(filename, time = '2024-12-27')
+            tile.append_to_netcdf(filename, time = '2024-12-26')
+
+            with xr.open_dataset(filename) as src:
+                self.assertEqual(src['Rrs_B3'].shape, (2, self.image.height, self.image.width))
+                np.testing.assert_array_equal(src['Rrs_B3'].values[0], self.image.select('Rrs_B3'))
+                np.testing.assert_array_equal(src['Rrs_B3'].values[1, 40:90, 30:100], tile.select('Rrs_B3'))
+                self.assertTrue(np.isnan(src['Rrs_B3'].values[1, :40]).all())
+
+            with self.assertRaises(ValueError):
+                tile.append_to_netcdf(filename)
+            tile.data = tile.data.assign_coords(x = tile.data.x + 1)
+            with self.assertRaises(ValueError):
+                tile.append_to_netcdf(filename, time = '2024-12-27')
+
+    def test_to_zarr(self):
+        """Test Zarr stores keep the CRS, chunks and values and accept chunk aligned tiles."""
+        self.image.drop_bands([ band for band in self.image.band_names if band not in self.bands ])
+        tile = self.image.copy()
+        tile.data = xr.full_like(tile.data.isel(y = slice(64, 128), x = slice(64, 188)), 1)
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'image.zarr')
+            self.image.to_zarr(path, chunks = 64, compressor = zarr.codecs.BloscCodec(cname = 'zstd', clevel = 5))
+            tile.to_zarr(path, region = True)
+
+            result = reader.open(path)
+            self.assertEqual(result.crs, self.image.crs)
+            self.assertEqual(result.band_names, self.image.band_names)
+            self.assertEqual(result.data['Rrs_B3'].encoding['chunks'], (64, 64))
+
+            expected = self.image.select('Rrs_B3')
+            expected[64:128, 64:] = 1
+            np.testing.assert_array_equal(result.select('Rrs_B3'), expected)
+
+            tile.data = tile.data.isel(y = slice(1, None))
+            with self.assertRaises(ValueError):
+                tile.to_zarr(path, region = True)
+
+    def test_mmap_read(self):
+        """Test uncompressed strip GeoTIFFs are memory-mapped copy-on-write and tiled ones decoded."""
+        mapped = reader.open('tests/files/20241226.tif', mmap = True)
+
+        self.assertIsInstance(mapped.data['ndwi'].values.base, np.memmap)
+        for band in self.image.band_names:
+            np.testing.assert_array_equal(mapped.select(band), self.image.select(band))
+
+        mapped.mask(mapped.select('ndwi') > 0.5)
+        np.testing.assert_array_equal(reader.open('tests/files/20241226.tif', mmap = True).select('ndwi'), self.image.select('ndwi'))
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'image.tif')
+            self.image.to_tif(filename, compress = None, tiled = True, blocksize = 64)
+            self.assertTrue(reader.open(filename, mmap = True).data['ndwi'].values.flags.owndata)
+
+    def test_to_npy(self):
+        """Test band cubes are read back as memory-mapped bands with their metadata."""
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'image.npy')
+            self.image.to_npy(filename, blocksize = 50)
+            result = reader.open(filename)
+
+            self.assertIsInstance(result.data['ndwi'].values.base, np.memmap)
+            self.assertEqual(result.crs, self.image.crs)
+            self.assertEqual(result.band_names, self.image.band_names)
+            self.assertEqual(result.data['ndwi'].attrs, self.image.data['ndwi'].attrs)
+            np.testing.assert_array_equal(result.data.x, self.image.data.x)
+            np.testing.assert_array_equal(result.data.y, self.image.data.y)
+            np.testing.assert_array_equal(result.values, self.image.values)
+
+
+if __name__ == '__main__':
+    unittest.main()
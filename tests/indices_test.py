@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+
+from sensingpy import enums, expression, indices
+from sensingpy.bathymetry.models import stumpf_pseudomodel
+
+
+class Test_Indices(unittest.TestCase):
+    def setUp(self):
+        """Set up Sentinel-2 like bands used across multiple tests."""
+        rng = np.random.default_rng(0)
+        self.bands = { f'Rrs_{band}' : rng.uniform(0.001, 0.1, (20, 30)) for band in ('B2', 'B3', 'B4', 'B8', 'B11') }
+
+    def test_indices_match_formulas(self):
+        """Test registered indices match their reference implementations."""
+        exprs = indices.build([ 'NDWI', 'MNDWI', 'pSDB_green', 'pSDB_red' ], band_format = 'Rrs_{}')
+        result = expression.evaluate_many(exprs, self.bands)
+        green, nir = self.bands['Rrs_B3'], self.bands['Rrs_B8']
+
+        np.testing.assert_allclose(result['NDWI'], (green - nir) / (green + nir))
+        np.testing.assert_allclose(result['pSDB_green'], stumpf_pseudomodel(self.bands['Rrs_B2'], green))
+        np.testing.assert_allclose(result['pSDB_red'], stumpf_pseudomodel(self.bands['Rrs_B2'], self.bands['Rrs_B4']))
+
+    def test_sensor_roles(self):
+        """Test indices are mapped to the band names of each sensor."""
+        ndvi = indices.INDICES['NDVI'].to_expression(enums.MICASENSE_BANDS)
+        self.assertEqual(ndvi.bands, { 'NIR', 'RED' })
+
+        with self.assertRaises(ValueError):
+            indices.build([ 'MNDWI' ], enums.MICASENSE_BANDS)
+        with self.assertRaises(ValueError):
+            indices.build([ 'NDTI' ])
+
+    def test_register(self):
+        """Test custom indices can be registered."""
+        try:
+            index = indices.register('NDTI', '(red - green) / (red + green)', 'Normalized Difference Turbidity Index')
+            self.assertEqual(index.roles, { 'red', 'green' })
+            self.assertIn('NDTI', indices.build([ 'NDTI' ]))
+        finally:
+            indices.INDICES.pop('NDTI', None)
+
+        with self.assertRaises(ValueError):
+            indices.register('broken', 'red +')
+
+
+if __name__ == '__main__':
+    unittest.main()
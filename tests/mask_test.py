@@ -58,6 +58,11 @@ class Test_Masks(unittest.TestCase):
         self.assertEqual(len(masks.is_gte(empty_array, 1)), 0)
         self.assertEqual(len(masks.is_in_range(empty_array, 1, 2)), 0)
 
+    def test_expr(self):
+        """Test mask expressions match the mask functions."""
+        result = masks.expr("valid(a) & inrange(a, 2, 3)").evaluate({ 'a' : self.array_with_nans })
+        self.assertTrue(np.array_equal(result, masks.is_in_range(self.array_with_nans, 2, 3)))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import unittest
+import numpy as np
+
+from dataclasses import FrozenInstanceError
+from sensingpy.bathymetry.metrics import ValidationSummary, ValidationAccumulator
+from sensingpy.bathymetry.models import LinearModel
+
+
+class Test_Metrics(unittest.TestCase):
+    def setUp(self):
+        """Set up model and in situ arrays used across multiple tests."""
+        rng = np.random.default_rng(0)
+        self.in_situ = rng.uniform(0, 10, 500)
+        self.model = self.in_situ + rng.normal(0, 0.5, 500)
+        self.model[:5] = np.nan
+
+    def test_metrics_match_nan_reductions(self):
+        """Test single-pass metrics match the NaN-aware numpy reductions."""
+        summary = ValidationSummary(self.model, self.in_situ)
+        error = self.in_situ - self.model
+
+        self.assertEqual(summary.N, 495)
+        self.assertAlmostEqual(summary.MSD, np.nanmean(-error))
+        self.assertAlmostEqual(summary.MAE, round(np.nanmean(np.abs(error)), 5))
+        self.assertAlmostEqual(summary.MedAE, round(np.nanmedian(np.abs(error)), 5))
+        self.assertAlmostEqual(summary.RMSE, round(np.sqrt(np.nanmean(error ** 2)), 5))
+        self.assertAlmostEqual(summary.RMedSE, round(np.sqrt(np.nanmedian(error ** 2)), 5))
+        self.assertAlmostEqual(summary.Abs_std, round(np.nanstd(np.abs(error)), 5))
+
+    def test_metrics_are_immutable(self):
+        """Test metrics are cached and can not be modified."""
+        summary = ValidationSummary(self.model, self.in_situ)
+        metrics = summary.to_dict()
+        metrics['MAE'] = -1
+
+        self.assertNotEqual(summary.MAE, -1)
+        self.assertEqual(summary['MAE'], summary.to_dict()['MAE'])
+        with self.assertRaises(FrozenInstanceError):
+            summary.model = self.in_situ
+        with self.assertRaises(ValueError):
+            summary.error[0] = 0
+
+    def test_empty_summary(self):
+        """Test a summary without valid pairs reports N = 0 and NaN metrics."""
+        summary = ValidationSummary(np.array([np.nan]), np.array([1.0]))
+        self.assertEqual(summary.N, 0)
+        self.assertTrue(np.isnan(summary.MAE))
+
+    def test_by_bins_matches_summaries(self):
+        """Test grouped metrics match one ValidationSummary per depth bin."""
+        summary = ValidationSummary(self.model, self.in_situ)
+        edges = [0, 2, 5, 10]
+        table = summary.by_bins(edges)
+
+        for idx, (vmin, vmax) in enumerate(zip(edges[:-1], edges[1:])):
+            in_bin = (self.in_situ >= vmin) & (self.in_situ < vmax)
+            expected = ValidationSummary(self.model[in_bin], self.in_situ[in_bin]).to_dict()
+            for metric, value in expected.items():
+                self.assertAlmostEqual(table[metric][idx], value, places = 4)
+
+    def test_by_groups_weights(self):
+        """Test weighted grouped metrics and empty groups."""
+        summary = ValidationSummary(np.array([1., 2., 3., 4.]), np.array([1., 1., 1., 1.]))
+        table = summary.by_groups(np.array([0, 0, 1, np.nan]), weights = np.array([1., 3., 1., 1.]))
+
+        self.assertTrue(np.array_equal(table['group'], [0, 1]))
+        self.assertTrue(np.array_equal(table['N'], [2, 1]))
+        self.assertAlmostEqual(table['MAE'][0], 0.75)
+        self.assertAlmostEqual(table['MedAE'][0], 1)
+        self.assertAlmostEqual(table['MSD'][1], 2)
+
+        empty = summary.by_bins([10, 20])
+        self.assertEqual(empty['N'][0], 0)
+        self.assertTrue(np.isnan(empty['MAE'][0]))
+
+    def test_accumulator_matches_summary(self):
+        """Test merged streaming accumulators match the in-memory summary."""
+        summary = ValidationSummary(self.model, self.in_situ)
+        first, second = ValidationAccumulator(), ValidationAccumulator()
+
+        for model, in_situ in zip(np.array_split(self.model[:300], 4), np.array_split(self.in_situ[:300], 4)):
+            first.update(model, in_situ)
+        second.update(self.model[300:], self.in_situ[300:])
+        first.merge(second)
+
+        self.assertEqual(first.N, summary.N)
+        for metric in ('MSD', 'MAE', 'RMSE', 'Abs_std'):
+            self.assertAlmostEqual(first[metric], summary[metric], places = 4)
+
+        exact = np.sort(np.abs(summary.error[~np.isnan(summary.error)]))[(summary.N - 1) // 2]
+        self.assertLessEqual(abs(first.MedAE - exact), 0.01 * exact + 1e-5)
+        self.assertEqual(str(first).split('|')[0], str(summary).split('|')[0])
+
+    def test_accumulator_merge_order(self):
+        """Test accumulated metrics do not depend on the chunking or the merge order."""
+        rng = np.random.default_rng(1)
+        in_situ = rng.uniform(0, 10, 10000) * 10.0 ** rng.integers(-6, 6, 10000)
+        model = in_situ + rng.normal(0, 0.5, 10000)
+        chunks = list(zip(np.array_split(model, 7), np.array_split(in_situ, 7)))
+
+        accumulators = []
+        for order in (range(7), reversed(range(7)), rng.permutation(7)):
+            merged = ValidationAccumulator()
+            for idx in order:
+                merged.merge(ValidationAccumulator().update(*chunks[idx]))
+            accumulators.append(merged)
+        accumulators.append(ValidationAccumulator().update(model, in_situ))
+
+        for accumulator in accumulators[1:]:
+            self.assertEqual(accumulator.sum_squares.exact(), accumulators[0].sum_squares.exact())
+            for metric in ('MSD', 'MAE', 'RMSE', 'Abs_std'):
+                self.assertEqual(accumulator[metric], accumulators[0][metric])
+
+    def test_bootstrap_reproducible(self):
+        """Test bootstrap replicates only depend on the seed."""
+        summary = ValidationSummary(self.model, self.in_situ)
+        first = summary.bootstrap(n = 50, seed = 1)
+        second = summary.bootstrap(n = 50, seed = 1, workers = 2)
+
+        for metric in ('MAE', 'RMSE', 'MedAE'):
+            self.assertEqual(len(first[metric]), 50)
+            self.assertTrue(np.array_equal(first[metric], second[metric]))
+
+    def test_bootstrap_chunks(self):
+        """Test bootstrap metrics match a per-replicate computation when chunked."""
+        summary = ValidationSummary(self.model, self.in_situ)
+        error = summary._valid_error
+        max_memory = len(error) * 24 * 3
+        result = summary.bootstrap(('MAE', 'MedAE'), n = 20, seed = 3, max_memory = max_memory)
+
+        counts = [ 3 ] * 6 + [ 2 ]
+        replicates = []
+        for count, seed in zip(counts, np.random.SeedSequence(3).spawn(len(counts))):
+            indexes = np.random.default_rng(seed).integers(0, len(error), size = (count, len(error)))
+            replicates.extend(np.abs(error[row]) for row in indexes)
+
+        np.testing.assert_allclose(result['MAE'], [ replicate.mean() for replicate in replicates ])
+        np.testing.assert_allclose(result['MedAE'], [ np.median(replicate) for replicate in replicates ])
+        vmin, vmax = result.interval(0.9)['MAE']
+        self.assertLessEqual(vmin, vmax)
+
+    def test_bootstrap_unknown_metric(self):
+        """Test bootstrap rejects unknown metric names."""
+        with self.assertRaises(ValueError):
+            ValidationSummary(self.model, self.in_situ).bootstrap(['R2'])
+
+    def test_linear_model_bootstrap(self):
+        """Test regression replicates are centered on the fitted coefficients."""
+        valid = ~np.isnan(self.model)
+        model = LinearModel().fit(self.model[valid], self.in_situ[valid])
+        result = model.bootstrap(self.model, self.in_situ, n = 200, seed = 0)
+
+        self.assertAlmostEqual(result.mean()['slope'], model.slope, places = 1)
+        self.assertAlmostEqual(result.mean()['intercept'], model.intercept, places = 1)
+        self.assertTrue(np.all((result['r_square'] > 0) & (result['r_square'] <= 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pyproj
+
+from shapely.geometry import box
+from sensingpy import reader
+from sensingpy.cache import BlockCache
+from sensingpy.mosaic import Grid, mosaic
+
+
+class Test_Mosaic(unittest.TestCase):
+    def setUp(self):
+        """Split the test image in three overlapping tiles."""
+        self.image = reader.open('tests/files/20241226.tif')
+        self.image.drop_bands(self.image.band_names[3:-2])
+        self.folder = tempfile.TemporaryDirectory()
+        self.paths = []
+
+        for idx, (rows, cols) in enumerate([ (slice(0, 80), slice(0, 100)), (slice(0, 80), slice(90, None)), (slice(70, None), slice(None)) ]):
+            tile = self.image.copy()
+            tile.data = tile.data.isel(y = rows, x = cols)
+            self.paths.append(os.path.join(self.folder.name, f'tile_{idx}.tif'))
+            tile.to_tif(self.paths[-1])
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_mosaic_matches_image(self):
+        """Test the virtual mosaic rebuilds the grid and values of the tiled image."""
+        mosaic = reader.open_mosaic(self.paths, block_size = 64)
+
+        self.assertEqual(mosaic.crs, self.image.crs)
+        self.assertEqual(mosaic.transform, self.image.transform)
+        self.assertEqual(mosaic.band_names, self.image.band_names)
+        np.testing.assert_array_equal(mosaic.data.x, self.image.data.x)
+        for band in self.image.band_names:
+            np.testing.assert_array_equal(mosaic.select(band), self.image.select(band))
+
+    def test_reads_only_intersecting_sources(self):
+        """Test windows and clips only read the blocks and tiles they intersect."""
+        mosaic = reader.open_mosaic(self.paths, block_size = 32, cache = BlockCache())
+        os.remove(self.paths[0])
+        os.remove(self.paths[1])
+
+        geometry = box(self.image.left + 50, self.image.bottom + 50, self.image.left + 500, self.image.bottom + 400)
+        mosaic.clip([ geometry ])
+        expected = self.image.copy().clip([ geometry ])
+
+        np.testing.assert_array_equal(mosaic.select('pSDB Green'), expected.select('pSDB Green'))
+        np.testing.assert_array_equal(mosaic.data['pSDB Green'][::-2, 3].values, expected.data['pSDB Green'][::-2, 3].values)
+        cache = mosaic.data['pSDB Green'].variable._data.array.mosaic.cache
+        self.assertEqual(len(cache), 4)
+
+    def test_grid_from_bounds(self):
+        """Test grids are aligned to the resolution and mosaics can be reprojected."""
+        grid = Grid.from_bounds((12.5, 3, 47, 41), pyproj.CRS.from_epsg(32629), 10)
+
+        self.assertEqual((grid.width, grid.height), (4, 5))
+        self.assertEqual(grid.bounds, (10, 0, 50, 50))
+
+        mosaic = reader.open_mosaic(self.paths, target_crs = pyproj.CRS.from_epsg(4326))
+        self.assertEqual(mosaic.crs, pyproj.CRS.from_epsg(4326))
+        self.assertAlmostEqual(np.nanmean(mosaic.select('pSDB Green')), np.nanmean(self.image.select('pSDB Green')), places = 2)
+
+    def test_mosaic_priority(self):
+        """Test the mosaic writer keeps the value of the input with the lowest priority."""
+        brighter = self.image.copy()
+        brighter.data = brighter.data.isel(y = slice(70, None)) + 1
+        brighter.to_tif(self.paths[2])
+        out_path = os.path.join(self.folder.name, 'mosaic.tif')
+
+        for priority, workers, overlap in ((None, 1, 80), ([ 2, 1, 0 ], 2, 70)):
+            mosaic(self.paths, out_path, priority = priority, tile_size = 32, workers = workers)
+            expected = self.image.select('pSDB Green').copy()
+            expected[overlap:] += 1
+
+            result = reader.open(out_path)
+            self.assertEqual(result.band_names, self.image.band_names)
+            self.assertEqual(result.transform, self.image.transform)
+            np.testing.assert_array_equal(result.select('pSDB Green'), expected)
+
+        with self.assertRaises(ValueError):
+            mosaic(self.paths, out_path, priority = [ 1, 2 ])
+        with self.assertRaises(ValueError):
+            mosaic(self.paths, out_path, rule = 'mean')
+        with self.assertRaises(ValueError):
+            mosaic(self.paths, out_path, tile_size = 100)
+
+    def test_mosaic_feather(self):
+        """Test feathering blends overlaps and does not depend on the tile size."""
+        brighter = self.image.copy()
+        brighter.data = brighter.data.isel(y = slice(70, None)) + 1
+        brighter.to_tif(self.paths[2])
+        results = []
+
+        for tile_size in (16, 256):
+            out_path = os.path.join(self.folder.name, f'mosaic_{tile_size}.tif')
+            mosaic(self.paths, out_path, rule = 'feather', feather = 8, bands = [ 'Rrs_B3' ], tile_size = tile_size, workers = 1)
+            results.append(reader.open(out_path).select('Rrs_B3'))
+
+        np.testing.assert_array_equal(results[0], results[1])
+        expected = self.image.select('Rrs_B3')
+        np.testing.assert_allclose(results[0][:62], expected[:62], atol = 1e-6)
+        np.testing.assert_allclose(results[0][88:], expected[88:] + 1, atol = 1e-6)
+        difference = results[0][72:78] - expected[72:78]
+        self.assertTrue(np.nanmin(difference) > 0.1 and np.nanmax(difference) < 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import numpy as np
+
+from sensingpy.preprocessing import outliers
+
+
+class Test_Outliers(unittest.TestCase):
+    def setUp(self):
+        """Set up a band stack with NaNs and a few extreme values."""
+        rng = np.random.default_rng(0)
+        self.data = rng.normal(0, 1, (3, 40, 50))
+        self.data[:, 0, :5] = np.nan
+        self.data[0, 1, 1] = 50
+        self.data[2, 2, 2] = -50
+
+    def test_iqr_matches_reference(self):
+        """Test IQR thresholds match the two nanpercentile calls over the whole array."""
+        Q1, Q3 = np.nanpercentile(self.data, 25), np.nanpercentile(self.data, 75)
+        distance = 1.5 * (Q3 - Q1)
+        expected = np.where((self.data <= Q1 - distance) | (self.data >= Q3 + distance), np.nan, self.data)
+
+        np.testing.assert_array_equal(outliers.IQR(self.data), expected)
+
+    def test_zscore_ignores_nans(self):
+        """Test Z_Score masks extreme values even when the array has NaNs."""
+        result = outliers.Z_Score(self.data)
+
+        self.assertTrue(np.isnan(result[0, 1, 1]))
+        self.assertTrue(np.isnan(result[2, 2, 2]))
+        self.assertLess(np.isnan(result).sum(), np.isnan(self.data).sum() + 20)
+        np.testing.assert_array_equal(outliers.Z_Score(np.ones(10)), np.ones(10))
+
+    def test_axis_filters_each_band(self):
+        """Test axis filters every band of a stack with its own thresholds."""
+        result = outliers.upper_percentile(self.data, 90, axis = (1, 2))
+
+        for band in range(3):
+            np.testing.assert_array_equal(result[band], outliers.upper_percentile(self.data[band], 90))
+
+    def test_groups_match_subsets(self):
+        """Test grouped thresholds match filtering every group on its own."""
+        groups = np.repeat(np.arange(3), 40 * 50).reshape(self.data.shape).astype(float)
+        groups[1, :2] = np.nan
+
+        for method in (outliers.IQR, outliers.Z_Score, outliers.lower_percentile):
+            kwargs = {} if method is not outliers.lower_percentile else { 'percentile' : 5 }
+            result = method(self.data, groups = groups, **kwargs)
+
+            for group in range(3):
+                in_group = groups == group
+                np.testing.assert_allclose(result[in_group], method(self.data[in_group], **kwargs))
+            np.testing.assert_array_equal(result[np.isnan(groups)], self.data[np.isnan(groups)])
+
+    def test_inplace(self):
+        """Test inplace masking writes into the input array."""
+        data = self.data.copy()
+        result = outliers.IQR(data, inplace = True)
+
+        self.assertIs(result, data)
+        np.testing.assert_array_equal(data, outliers.IQR(self.data))
+        with self.assertRaises(ValueError):
+            outliers.IQR(np.arange(10), inplace = True)
+
+    def test_streaming_is_tiling_independent(self):
+        """Test streaming thresholds do not depend on how the data is tiled and merged."""
+        filters = lambda: [ outliers.StreamingIQR(), outliers.StreamingZScore(),
+                            outliers.StreamingUpperPercentile(95), outliers.StreamingLowerPercentile(5) ]
+        whole, tiled = filters(), filters()
+
+        for method in whole:
+            method.update(self.data)
+        for tile in np.array_split(self.data.reshape(-1, 50), 7):
+            for method, partial in zip(tiled, filters()):
+                method.merge(partial.update(tile))
+
+        for method, other in zip(whole, tiled):
+            self.assertEqual(method.thresholds(), other.thresholds())
+
+    def test_streaming_matches_in_memory(self):
+        """Test streaming thresholds approximate the in-memory filters."""
+        iqr = outliers.StreamingIQR().update(self.data)
+        zscore = outliers.StreamingZScore().update(self.data)
+        valid = self.data[~np.isnan(self.data)]
+
+        np.testing.assert_allclose(iqr.thresholds(), outliers.StreamingIQR().update(valid).thresholds())
+        np.testing.assert_allclose(zscore.thresholds(), (valid.mean() - 3 * valid.std(), valid.mean() + 3 * valid.std()))
+        np.testing.assert_array_equal(zscore.apply(self.data, block_size = 7), outliers.Z_Score(self.data))
+
+        Q1, Q3 = np.nanpercentile(self.data, [25, 75])
+        lower, upper = iqr.thresholds()
+        self.assertAlmostEqual(lower, Q1 - 1.5 * (Q3 - Q1), places = 2)
+        self.assertAlmostEqual(upper, Q3 + 1.5 * (Q3 - Q1), places = 2)
+
+    def test_streaming_apply_inplace(self):
+        """Test streaming filters mask tiles in place with the global thresholds."""
+        upper = outliers.StreamingUpperPercentile(99).update(self.data)
+        tile = self.data[1].copy()
+        upper.apply(tile, inplace = True, block_size = 3)
+
+        self.assertTrue(np.all(np.isnan(tile) | (tile < upper.thresholds()[1])))
+        with self.assertRaises(ValueError):
+            upper.apply(np.arange(4), inplace = True)
+
+    def test_hampel_matches_windows(self):
+        """Test Hampel matches a NaN-aware median and MAD over each window, whatever the window and block size."""
+        data = self.data[0, :12, :15].copy()
+        data[5, 3:6] = np.nan
+        data[8:, 10] = np.round(data[8:, 10])
+
+        for rows, cols in ((3, 3), (1, 3), (5, 1), (5, 7)):
+            expected = data.copy()
+            for row in range(12):
+                for col in range(15):
+                    window = data[max(row - rows // 2, 0) : row + rows // 2 + 1, max(col - cols // 2, 0) : col + cols // 2 + 1]
+                    if np.isnan(window).all():
+                        continue
+                    median = np.nanmedian(window)
+                    if np.abs(data[row, col] - median) > 3 * 1.4826 * np.nanmedian(np.abs(window - median)):
+                        expected[row, col] = np.nan
+
+            for block_size in (None, 1, 5):
+                np.testing.assert_array_equal(outliers.hampel(data, (rows, cols), block_size = block_size), expected)
+                np.testing.assert_array_equal(outliers.hampel(data, (rows, cols), block_size = block_size, workers = 3), expected)
+
+        self.assertEqual(outliers.hampel(data.astype(np.float32), 3).dtype, np.float32)
+        self.assertTrue(np.isnan(outliers.hampel(self.data, (3, 5))[0, 1, 1]))
+
+    def test_moving_zscore_matches_windows(self):
+        """Test the summed-area moving z-score matches the window mean and std."""
+        data = self.data[2, :12, :15]
+        expected = data.copy()
+        for row in range(12):
+            for col in range(15):
+                window = data[max(row - 2, 0) : row + 3, max(col - 2, 0) : col + 3]
+                if np.abs(data[row, col] - np.nanmean(window)) >= 2 * np.nanstd(window):
+                    expected[row, col] = np.nan
+
+        for block_size in (None, 2, 7):
+            np.testing.assert_array_equal(outliers.moving_zscore(data, 5, 2, block_size = block_size), expected)
+            np.testing.assert_array_equal(outliers.moving_zscore(data, 5, 2, block_size = block_size, workers = 3), expected)
+        np.testing.assert_array_equal(outliers.moving_zscore(np.ones((4, 4)), 3), np.ones((4, 4)))
+        with self.assertRaises(ValueError):
+            outliers.moving_zscore(data, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
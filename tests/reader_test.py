@@ -0,0 +1,141 @@
+import os
+import asyncio
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+from rasterio.windows import Window
+from sensingpy import reader
+
+
+# Stand-in for a remote server: serves a folder with HTTP range requests and prints its port
+RANGE_SERVER = '''
+import functools, http.server, io, os, re, sys
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if 'Range' not in self.headers or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start, stop = re.match(r'bytes=(\\d+)-(\\d*)', self.headers['Range']).groups()
+        start, stop = int(start), min(int(stop or size - 1), size - 1)
+        with open(path, 'rb') as file:
+            file.seek(start)
+            data = file.read(stop - start + 1)
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{stop}/{size}')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        return io.BytesIO(data)
+
+server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=sys.argv[1]))
+print(server.server_address[1], flush=True)
+server.serve_forever()
+'''
+
+
+class Test_Reader(unittest.TestCase):
+    def setUp(self):
+        """Write a few scenes to read in batches."""
+        self.image = reader.open('tests/files/20241226.tif')
+        self.folder = tempfile.TemporaryDirectory()
+        self.paths = []
+
+        for idx in range(5):
+            scene = self.image.copy()
+            scene.data = scene.data.isel(y = slice(idx * 10, None))
+            self.paths.append(os.path.join(self.folder.name, f'scene_{idx}.tif'))
+            scene.to_tif(self.paths[-1], compress = None, tiled = False)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_open_many(self):
+        """Test concurrent opens keep the order of the files and forward reader options."""
+        images = reader.open_many(self.paths, workers = 3, mmap = True)
+
+        self.assertEqual([ image.height for image in images ], [ self.image.height - idx * 10 for idx in range(5) ])
+        self.assertIsInstance(images[2].data['ndwi'].values.base, np.memmap)
+        np.testing.assert_array_equal(images[1].select('ndwi'), self.image.select('ndwi')[10:])
+
+    def test_iter_images(self):
+        """Test prefetching iterators yield every file in order, with or without a byte cap, and estimate file sizes."""
+        expected = [ self.image.height - idx * 10 for idx in range(5) ]
+
+        for prefetch, max_bytes in ((0, None), (2, None), (4, 1)):
+            images = reader.iter_images(self.paths, prefetch = prefetch, max_bytes = max_bytes)
+            self.assertEqual([ image.height for image in images ], expected)
+
+        images = reader.iter_images(self.paths, prefetch = 3)
+        self.assertEqual(next(images).height, expected[0])
+        images.close()
+
+        window = Window(30, 40, 100, 70)
+        bands = lambda image: sum(band.nbytes for band in image.data.data_vars.values())
+        self.assertEqual(reader._estimated_nbytes(self.paths[1]), bands(reader.open(self.paths[1])))
+        self.assertEqual(reader._estimated_nbytes(self.paths[1], window = window, bands = ['ndwi']),
+                         bands(reader.open(self.paths[1], window = window, bands = ['ndwi'])))
+
+    def test_open_window(self):
+        """Test windows and band subsets are read with their own coordinates."""
+        window = Window(30, 40, 100, 70)
+        image = reader.open(self.paths[0], window = window, bands = ['ndwi', 'pSDB Green'])
+
+        self.assertEqual(image.band_names, ['ndwi', 'pSDB Green'])
+        self.assertEqual((image.height, image.width), (70, 100))
+        np.testing.assert_array_equal(image.data.x, self.image.data.x[30:130])
+        np.testing.assert_array_equal(image.data.y, self.image.data.y[40:110])
+        np.testing.assert_array_equal(image.select('ndwi'), self.image.select('ndwi')[40:110, 30:130])
+
+        mapped = reader.open(self.paths[0], window = window, bands = ['ndwi'], mmap = True)
+        self.assertIsInstance(mapped.data['ndwi'].values.base, np.memmap)
+
+        with self.assertRaises(ValueError):
+            reader.open(self.paths[0], window = Window(100, 0, 100, 10))
+        with self.assertRaises(ValueError):
+            reader.open(self.paths[0], bands = ['depth'])
+
+    def test_aopen(self):
+        """Test async reads match synchronous ones and share reads of the same blocks."""
+        path = os.path.join(self.folder.name, 'tiled.tif')
+        self.image.to_tif(path, blocksize = 64)
+        window, bands = Window(30, 40, 100, 70), ['ndwi', 'pSDB Green']
+        expected = reader.open(path, window = window, bands = bands)
+
+        async def read(async_reader):
+            return await asyncio.gather(*(reader.aopen(path, window = window, bands = bands, async_reader = async_reader)
+                                          for _ in range(4)))
+
+        with reader.AsyncReader(workers = 2) as async_reader:
+            images = asyncio.run(read(async_reader))
+
+            # The window touches 2 x 3 blocks of 64 pixels in each band, and requests that arrive
+            # while a block is being read wait for that read
+            self.assertEqual(async_reader.reads + async_reader.coalesced, 48)
+            self.assertGreaterEqual(async_reader.reads, 12)
+            self.assertGreater(async_reader.coalesced, 0)
+
+        for image in images:
+            self.assertTrue(image.data.identical(expected.data))
+
+    def test_aopen_http(self):
+        """Test async reads of a file served with HTTP range requests."""
+        server = subprocess.Popen([ sys.executable, '-c', RANGE_SERVER, self.folder.name ], stdout = subprocess.PIPE, text = True)
+        try:
+            url = f'http://127.0.0.1:{server.stdout.readline().strip()}/scene_1.tif'
+            image = asyncio.run(reader.aopen(url, window = Window(0, 5, 50, 20), bands = ['ndwi']))
+        finally:
+            server.terminate()
+            server.wait()
+
+        np.testing.assert_array_equal(image.select('ndwi'), self.image.select('ndwi')[15:35, :50])
+
+
+if __name__ == '__main__':
+    unittest.main()
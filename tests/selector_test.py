@@ -82,5 +82,71 @@ class Test_Selector(unittest.TestCase):
         with self.assertRaises(ValueError):
             selector.interval_choice(self.array_1, self.size_1, invalid_intervals)
 
+    def test_interval_choice_reproducible(self):
+        """Test samples only depend on the seed or generator."""
+        array = np.random.default_rng(0).uniform(0, 3, (20, 30))
+        first = selector.arginterval_choice(array, 5, self.intervals_1, replace=False, rng=1)
+        second = selector.arginterval_choice(array, 5, self.intervals_1, replace=False, rng=np.random.default_rng(1))
+
+        self.assertTrue(np.array_equal(first, second))
+        self.assertTrue(np.all((array.ravel()[first[:5]] >= 1) & (array.ravel()[first[:5]] < 2)))
+        self.assertTrue(np.all((array.ravel()[first[5:]] >= 2) & (array.ravel()[first[5:]] < 3)))
+
+    def test_interval_choice_underpopulated(self):
+        """Test under-populated intervals can be capped or drawn with replacement."""
+        capped = selector.interval_choice(self.array_3, self.size_2, self.intervals_1, replace=False, on_underpopulated='cap')
+        self.assertTrue(np.array_equal(np.sort(capped), [1, 1, 2, 2]))
+
+        replaced = selector.interval_choice(self.array_3, self.size_2, self.intervals_1, replace=False, on_underpopulated='replace')
+        self.assertEqual(len(replaced), 2 * self.size_2)
+
+        empty = selector.interval_choice(self.array_1, self.size_1, [10, 20, 30], on_underpopulated='cap')
+        self.assertEqual(len(empty), 0)
+        with self.assertRaises(ValueError):
+            selector.interval_choice(self.array_1, self.size_1, self.intervals_1, on_underpopulated='drop')
+
+    def test_reservoir_keeps_size_per_interval(self):
+        """Test the reservoir keeps exactly size samples per populated interval with their coordinates."""
+        values = np.random.default_rng(0).uniform(0, 3, (20, 30))
+        xs, ys = np.arange(30) * 10., np.arange(20) * -10.
+        reservoir = selector.StratifiedReservoir(5, self.intervals_1, seed=0)
+        for start in range(0, 20, 3):
+            reservoir.update(values[start:start + 3], xs, ys[start:start + 3], scene=start)
+
+        sample = reservoir.sample()
+        self.assertTrue(np.array_equal(sample['interval'], np.repeat([0, 1], 5)))
+        self.assertTrue(np.array_equal(reservoir.seen, [np.sum((values >= 1) & (values < 2)), np.sum((values >= 2) & (values < 3))]))
+
+        rows, cols = (-sample['ys'] / 10).astype(int), (sample['xs'] / 10).astype(int)
+        self.assertTrue(np.array_equal(values[rows, cols], sample['values']))
+        self.assertTrue(np.all((rows >= sample['scenes'].astype(int)) & (rows < sample['scenes'].astype(int) + 3)))
+
+    def test_reservoir_merge_and_seed(self):
+        """Test merged reservoirs are reproducible and cap sparse intervals."""
+        def fill(seed):
+            workers = [ selector.StratifiedReservoir(3, [0, 1, 5], seed=(seed, worker)) for worker in range(2) ]
+            workers[0].update(np.linspace(0, 0.9, 10), scene='a')
+            workers[1].update(np.array([2., np.nan, 7.]), scene='b')
+            return workers[0].merge(workers[1]).sample()
+
+        first, second = fill(1), fill(1)
+        self.assertTrue(np.array_equal(first['values'], second['values']))
+        self.assertEqual(len(first['values']), 4)
+        self.assertEqual(first['values'][-1], 2.)
+        self.assertEqual(first['scenes'][-1], 'b')
+        with self.assertRaises(ValueError):
+            selector.StratifiedReservoir(3, [0, 1]).merge(selector.StratifiedReservoir(4, [0, 1]))
+
+    def test_reservoir_is_uniform(self):
+        """Test every value is equally likely to be kept."""
+        counts = np.zeros(10)
+        for seed in range(400):
+            reservoir = selector.StratifiedReservoir(2, [0, 10], seed=seed)
+            for chunk in np.array_split(np.arange(10.), 4):
+                reservoir.update(chunk)
+            counts[reservoir.sample()['values'].astype(int)] += 1
+
+        self.assertTrue(np.all(np.abs(counts - 80) < 30))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+import math
+import unittest
+import numpy as np
+
+from sensingpy.sketch import ExactSum, QuantileSketch
+
+
+class Test_Sketch(unittest.TestCase):
+    def setUp(self):
+        """Set up a sample with negative, zero and positive values."""
+        rng = np.random.default_rng(0)
+        self.values = np.concatenate([rng.normal(0, 2, 10_000), np.zeros(10), [np.nan]])
+        self.quantiles = np.array([0, 0.1, 0.5, 0.9, 1])
+
+    def test_relative_accuracy(self):
+        """Test quantiles are within the relative accuracy of the exact ranks."""
+        sketch = QuantileSketch(relative_accuracy = 0.01).update(self.values)
+        valid = np.sort(self.values[~np.isnan(self.values)])
+        exact = valid[np.floor(self.quantiles * (len(valid) - 1)).astype(int)]
+
+        self.assertEqual(sketch.count, len(valid))
+        self.assertTrue(np.all(np.abs(sketch.quantile(self.quantiles) - exact) <= 0.01 * np.abs(exact)))
+
+    def test_merge_is_chunking_independent(self):
+        """Test merged and chunked sketches give the same quantiles."""
+        whole = QuantileSketch().update(self.values)
+        merged = QuantileSketch()
+        for chunk in np.array_split(self.values, 7):
+            merged.merge(QuantileSketch().update(chunk))
+
+        self.assertTrue(np.array_equal(whole.quantile(self.quantiles), merged.quantile(self.quantiles)))
+
+    def test_bounded_size(self):
+        """Test the number of buckets never exceeds max_bins."""
+        sketch = QuantileSketch(max_bins = 64).update(np.logspace(-8, 8, 1000))
+        self.assertLessEqual(len(sketch._positive.counts), 64)
+        self.assertAlmostEqual(sketch.quantile(1), 1e8)
+
+    def test_empty_and_invalid(self):
+        """Test empty sketches return NaN and parameters are checked on merge."""
+        self.assertTrue(np.isnan(QuantileSketch().quantile(0.5)))
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+    def test_exact_sum(self):
+        """Test exact sums are correctly rounded and independent of the chunking."""
+        values = self.values * 10.0 ** np.random.default_rng(1).integers(-8, 8, len(self.values))
+        whole = ExactSum().update(values)
+        merged = ExactSum()
+        for chunk in np.array_split(values, 5):
+            merged.merge(ExactSum().update(chunk))
+
+        valid = values[np.isfinite(values)]
+        self.assertEqual(whole.count, len(valid))
+        self.assertEqual(float(whole), math.fsum(valid))
+        self.assertEqual(whole.exact(), merged.exact())
+
+
+if __name__ == '__main__':
+    unittest.main()